@@ -1,63 +1,350 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import TypeAdapter, ValidationError
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Set, List
 
+from app.core.config import settings
 from app.db.database import get_db
-from app.schemas import CommentCreate, CommentUpdate, CommentInDB, CommentWSMessage
+from app.models import ModerationLabel
+from app.schemas import (
+    CommentCreate,
+    CommentInDB,
+    CommentThreadPage,
+    CommentUpdate,
+    CommentWSCreate,
+    CommentWSMessage,
+    LessonPresence,
+    TypingWSEvent,
+    WSClientMessage,
+    WSMessage,
+    WSQueueMetrics,
+)
+from app.services.broker import LessonBroker, create_broker, event_id_of
+from app.services.comment_threads import get_comment_replies, get_lesson_threads
+from app.services.comment_writer import comment_writer
+from app.services.moderation import prefilter
+from app.services.pagination import decode_cursor
+from app.services.presence import PresenceTracker
+from app.services.ws_formats import Frame, encode, negotiate
+from app.services.ws_queue import QueuedConnection, SendQueueMetrics, SlowConsumerPolicy
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # WebSocket connection manager
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+    """
+    Tracks this process's sockets per lesson. Broadcasts go through the broker
+    so that sockets held by other workers receive them too; local delivery only
+    enqueues onto each socket's bounded send queue.
+
+    Broadcast messages must be JSON documents, since batched sockets receive
+    them spliced into a JSON array. The wire format and batching are chosen
+    per socket by subprotocol (see ws_formats); replies addressed to a single
+    socket (acks, errors) are never batched.
+    """
+
+    def __init__(
+        self,
+        broker: LessonBroker,
+        queue_size: int = settings.COMMENTS_WS_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy(settings.COMMENTS_WS_SLOW_CONSUMER_POLICY),
+        batch_window: float = settings.COMMENTS_WS_BATCH_WINDOW_MS / 1000
+    ):
+        self.active_connections: Dict[str, Dict[WebSocket, QueuedConnection]] = {}
+        self.broker = broker
+        self.broker.set_handler(self.send_local)
+        self.queue_size = queue_size
+        self.policy = policy
+        self.queue_metrics = SendQueueMetrics()
+        self.batch_window = batch_window
+        self._pending: Dict[str, List[str]] = {}
+        self._flushes: Dict[str, asyncio.Task] = {}
+        # Unregistrations started from connection callbacks, held until done
+        self._disconnects: Set[asyncio.Task] = set()
+        self._subscribed: Set[str] = set()
+        self._subscription_lock = asyncio.Lock()
+
+    async def _sync_subscription(self, lesson_id: str):
+        # Reconcile under a lock so racing connect/disconnect calls can never
+        # leave the broker subscribed to an empty lesson (or the reverse)
+        async with self._subscription_lock:
+            wanted = lesson_id in self.active_connections
+            if wanted and lesson_id not in self._subscribed:
+                await self.broker.subscribe(lesson_id)
+                self._subscribed.add(lesson_id)
+            elif not wanted and lesson_id in self._subscribed:
+                await self.broker.unsubscribe(lesson_id)
+                self._subscribed.discard(lesson_id)
     
-    async def connect(self, websocket: WebSocket, lesson_id: str):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, lesson_id: str, last_event_id: Optional[str] = None):
+        protocol = negotiate(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=protocol.subprotocol)
+        connection = QueuedConnection(
+            websocket,
+            max_size=self.queue_size,
+            policy=self.policy,
+            metrics=self.queue_metrics,
+            # Evicted or failed sockets unregister themselves
+            on_close=lambda _: self._disconnect_later(websocket, lesson_id),
+            batched=protocol.batched,
+            format=protocol.format,
+        )
+        if last_event_id:
+            # Park live traffic until the replay is queued, so nothing is lost
+            # or reordered between reading history and receiving broadcasts
+            connection.held = []
+        connection.start()
         if lesson_id not in self.active_connections:
-            self.active_connections[lesson_id] = set()
-        self.active_connections[lesson_id].add(websocket)
+            self.active_connections[lesson_id] = {}
+        self.active_connections[lesson_id][websocket] = connection
+        await self._sync_subscription(lesson_id)
+        if last_event_id:
+            await self._resume(connection, lesson_id, last_event_id)
+
+    def _disconnect_later(self, websocket: WebSocket, lesson_id: str):
+        task = asyncio.create_task(self.disconnect(websocket, lesson_id))
+        self._disconnects.add(task)
+        task.add_done_callback(self._disconnects.discard)
+
+    async def _resume(self, connection: QueuedConnection, lesson_id: str, last_event_id: str):
+        try:
+            replay = await self.broker.history(lesson_id, last_event_id)
+        except RedisError:
+            logger.warning("Could not read lesson %s history", lesson_id, exc_info=True)
+            replay = None
+
+        held, connection.held = connection.held, None
+        if replay is None:
+            # Too far behind to replay: the client refetches the threads instead
+            self.send_personal(connection.websocket, lesson_id, WSMessage(type="reset", data={}).model_dump_json())
+            messages = held
+        else:
+            replayed = {event_id_of(message) for message in replay}
+            messages = replay + [m for m in held if event_id_of(m) not in replayed]
+
+        if connection.batched:
+            if messages:
+                connection.enqueue(encode(messages, connection.format, batched=True))
+        else:
+            for message in messages:
+                connection.enqueue(encode([message], connection.format, batched=False))
     
-    def disconnect(self, websocket: WebSocket, lesson_id: str):
+    async def disconnect(self, websocket: WebSocket, lesson_id: str):
+        connection = None
         if lesson_id in self.active_connections:
-            self.active_connections[lesson_id].discard(websocket)
+            connection = self.active_connections[lesson_id].pop(websocket, None)
             if not self.active_connections[lesson_id]:
                 del self.active_connections[lesson_id]
+        if connection is not None:
+            await connection.close()
+        await self._sync_subscription(lesson_id)
     
+    def send_personal(self, websocket: WebSocket, lesson_id: str, message: str):
+        """
+        Queue a message for one socket only (acks, errors)
+        """
+        connection = self.active_connections.get(lesson_id, {}).get(websocket)
+        if connection is not None:
+            connection.enqueue(encode([message], connection.format, batched=False))
+
     async def broadcast_to_lesson(self, lesson_id: str, message: str):
-        if lesson_id in self.active_connections:
-            dead_connections = set()
-            for connection in self.active_connections[lesson_id]:
-                try:
-                    await connection.send_text(message)
-                except:
-                    dead_connections.add(connection)
-            
-            # Clean up dead connections
-            for conn in dead_connections:
-                self.disconnect(conn, lesson_id)
+        """
+        Publish once; every worker with sockets on the lesson delivers it
+        """
+        await self.broker.publish(lesson_id, message)
+
+    async def send_local(self, lesson_id: str, message: str):
+        """
+        Queue a message for every socket this process holds for a lesson.
+        Never waits on a client, so one slow socket cannot stall the rest.
+        """
+        batched = False
+        frames: Dict[tuple, Frame] = {}
+        for connection in list(self.active_connections.get(lesson_id, {}).values()):
+            if connection.batched:
+                batched = True
+            elif connection.held is not None:
+                connection.held.append(message)
+            else:
+                connection.enqueue(self._frame(frames, [message], connection))
+
+        if batched:
+            self._pending.setdefault(lesson_id, []).append(message)
+            # The first message of a tick opens the window; idle lessons cost nothing
+            if lesson_id not in self._flushes:
+                self._flushes[lesson_id] = asyncio.create_task(self._flush_after_window(lesson_id))
+
+    async def _flush_after_window(self, lesson_id: str):
+        try:
+            await asyncio.sleep(self.batch_window)
+        finally:
+            self._flushes.pop(lesson_id, None)
+        messages = self._pending.pop(lesson_id, [])
+        if not messages:
+            return
 
+        frames: Dict[tuple, Frame] = {}
+        for connection in list(self.active_connections.get(lesson_id, {}).values()):
+            if connection.batched:
+                if connection.held is not None:
+                    connection.held.extend(messages)
+                else:
+                    connection.enqueue(self._frame(frames, messages, connection))
 
-manager = ConnectionManager()
+    @staticmethod
+    def _frame(frames: Dict[tuple, Frame], messages: List[str], connection: QueuedConnection) -> Frame:
+        # Serialized once per wire format and shared by every socket using it
+        key = (connection.format, connection.batched)
+        frame = frames.get(key)
+        if frame is None:
+            frame = frames[key] = encode(messages, connection.format, connection.batched)
+        return frame
+
+    def viewer_counts(self) -> Dict[str, int]:
+        """
+        Sockets this process holds per lesson
+        """
+        return {lesson_id: len(connections) for lesson_id, connections in self.active_connections.items()}
+
+    def metrics(self) -> WSQueueMetrics:
+        depths = [
+            connection.depth
+            for connections in self.active_connections.values()
+            for connection in connections.values()
+        ]
+        return WSQueueMetrics(
+            lessons=len(self.active_connections),
+            connections=len(depths),
+            queued_messages=sum(depths),
+            max_queue_depth=max(depths, default=0),
+            enqueued=self.queue_metrics.enqueued,
+            sent=self.queue_metrics.sent,
+            dropped=self.queue_metrics.dropped,
+            evicted=self.queue_metrics.evicted,
+            send_failures=self.queue_metrics.send_failures,
+        )
+
+    async def close(self):
+        for task in list(self._flushes.values()):
+            task.cancel()
+        self._flushes.clear()
+        self._pending.clear()
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                await connection.close()
+        self.active_connections.clear()
+        await self.broker.close()
+
+
+manager = ConnectionManager(create_broker())
+presence = PresenceTracker(manager.viewer_counts, manager.send_local)
+
+_client_message = TypeAdapter(WSClientMessage)
+
+
+def _ws_frame(type: str, **data) -> str:
+    return WSMessage(type=type, data=data).model_dump_json()
+
+
+async def _handle_ws_message(websocket: WebSocket, lesson_id: int, data: str):
+    channel = str(lesson_id)
+    try:
+        message = _client_message.validate_json(data)
+    except ValidationError as e:
+        manager.send_personal(websocket, channel, _ws_frame("error", detail=e.errors(include_url=False, include_context=False)))
+        return
+
+    if isinstance(message, TypingWSEvent):
+        presence.typing(channel, message.user_id)
+    else:
+        await _handle_ws_comment(websocket, lesson_id, message)
+
+
+async def _handle_ws_comment(websocket: WebSocket, lesson_id: int, message: CommentWSCreate):
+    channel = str(lesson_id)
+    # Blocklisted content never reaches the room; the rest is classified
+    # in the background and retracted with a "comment_removed" frame if needed
+    verdict = prefilter.check(message.body)
+    if verdict.label == ModerationLabel.BLOCK:
+        manager.send_personal(
+            websocket, channel,
+            _ws_frame("error", client_msg_id=message.client_msg_id, detail=verdict.reasons),
+        )
+        return
+
+    try:
+        comment, is_new = await comment_writer.submit(lesson_id, message)
+    except LookupError as e:
+        manager.send_personal(
+            websocket, channel,
+            _ws_frame("error", client_msg_id=message.client_msg_id, detail=str(e)),
+        )
+        return
+
+    # Broadcast before the row is in the database; the flusher persists it
+    if is_new:
+        await manager.broadcast_to_lesson(channel, CommentWSMessage(data=comment).model_dump_json())
+    manager.send_personal(
+        websocket, channel,
+        _ws_frame("ack", client_msg_id=message.client_msg_id, id=comment.id),
+    )
 
 
 @router.websocket("/ws/lesson/{lesson_id}")
 async def comments_websocket(
     websocket: WebSocket,
-    lesson_id: str,
+    lesson_id: int,
+    last_event_id: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    WebSocket endpoint for real-time comments
+    WebSocket endpoint for real-time comments.
+
+    Broadcasts carry an event_id; reconnect with ?last_event_id=... to have
+    only the missed ones replayed. A "reset" frame means the gap is too old
+    and the client should refetch the comment threads.
+
+    Clients send {"type": "typing"} while composing; viewer counts and who is
+    typing arrive as periodic "presence" frames.
     """
-    await manager.connect(websocket, lesson_id)
+    await manager.connect(websocket, str(lesson_id), last_event_id)
+    current = presence.last(str(lesson_id))
+    if current is not None:
+        manager.send_personal(
+            websocket, str(lesson_id),
+            WSMessage(type="presence", data=current.model_dump()).model_dump_json(),
+        )
     try:
         while True:
             data = await websocket.receive_text()
-            # TODO: Process and broadcast comment
-            await manager.broadcast_to_lesson(lesson_id, data)
+            await _handle_ws_message(websocket, lesson_id, data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, lesson_id)
+        pass
+    finally:
+        await manager.disconnect(websocket, str(lesson_id))
+
+
+@router.get("/ws/metrics", response_model=WSQueueMetrics)
+async def websocket_metrics():
+    """
+    Send queue depth and slow-consumer counters for this worker
+    """
+    return manager.metrics()
+
+
+@router.get("/lesson/{lesson_id}/presence", response_model=LessonPresence)
+async def get_lesson_presence(lesson_id: int):
+    """
+    Viewers and typing users on a lesson, across all workers
+    """
+    return await presence.snapshot(str(lesson_id))
 
 
 @router.get("/lesson/{lesson_id}", response_model=List[CommentInDB])
@@ -72,6 +359,48 @@ async def get_lesson_comments(
     return []
 
 
+def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        ) from None
+
+
+@router.get("/lesson/{lesson_id}/threads", response_model=CommentThreadPage)
+async def get_lesson_comment_threads(
+    lesson_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    depth: int = Query(2, ge=0, le=5),
+    replies_limit: int = Query(3, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Threaded comments for a lesson, newest threads first, in a single query
+    """
+    return await get_lesson_threads(db, lesson_id, _decode_cursor(cursor), limit, depth, replies_limit)
+
+
+@router.get("/{comment_id}/replies", response_model=CommentThreadPage)
+async def get_replies(
+    comment_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    depth: int = Query(2, ge=0, le=5),
+    replies_limit: int = Query(3, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Load more replies to a comment, continuing from its replies_cursor
+    """
+    return await get_comment_replies(db, comment_id, _decode_cursor(cursor), limit, depth, replies_limit)
+
+
 @router.post("/", response_model=CommentInDB)
 async def create_comment(
     comment: CommentCreate,
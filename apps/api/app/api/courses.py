@@ -1,36 +1,209 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from sqlalchemy.orm import selectinload
 
+from app.core.http_cache import compute_etag, etag_matches, json_response, not_modified
 from app.db.database import get_db
+from app.models import Comment, Course, Lesson, Module
 from app.schemas import (
-    CourseCreate, CourseUpdate, CoursePublic, CourseDetail,
-    ModuleCreate, ModuleUpdate, ModuleWithLessons,
-    LessonCreate, LessonUpdate, LessonDetail,
-    PaginatedResponse, PaginationParams
+    CatalogFacets,
+    CourseCreate,
+    CourseDetail,
+    CourseImport,
+    CourseImportResult,
+    CoursePublic,
+    CourseUpdate,
+    CursorPaginatedResponse,
+    LandingPage,
+    LessonCreate,
+    LessonDetail,
+    LessonPublic,
+    ModuleCreate,
+    ModuleUpdate,
+    ModuleWithLessons,
+    MoveRequest,
+    OrderingUpdate,
+    OrderPosition,
+    PaginatedResponse,
 )
+from app.services import ordering
+from app.services.course_cache import course_cache
+from app.services.course_import import import_course, ndjson_lines, parse_ndjson
+from app.services.course_tree import load_course_detail
+from app.services.facets import catalog_filters, get_facets
+from app.services.landing import landing_snapshot
+from app.services.pagination import decode_cursor, encode_cursor, estimate_count
+from app.services.search import search_courses
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Per-route HTTP caching policy; lessons can carry paid content, so only the
+# browser (never a shared cache) may keep them
+CATALOG_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=300"
+COURSE_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=3600"
+LESSON_CACHE_CONTROL = "private, max-age=60, stale-while-revalidate=600"
 
-@router.get("/", response_model=PaginatedResponse)
+
+@router.get("/", response_model=PaginatedResponse | CursorPaginatedResponse)
 async def list_courses(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    tag: Optional[List[str]] = Query(None),
+    difficulty: Optional[str] = Query(None, pattern="^(beginner|intermediate|advanced)$"),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List all published courses with pagination and tag/difficulty/price filters
+
+    `pagination=cursor` (or passing `cursor`) switches to keyset pagination over
+    (created_at, id), so every page costs the same regardless of depth.
+    `search` results are ranked by relevance and always use page/page_size.
+    """
+    # The ETag only depends on the catalog version and the query, so a
+    # revalidation is answered without touching the database
+    etag = None
+    version = await course_cache.catalog_version()
+    if version is not None:
+        query_key = repr(sorted(request.query_params.multi_items())).encode()
+        etag = compute_etag(version.encode(), query_key)
+        if etag_matches(request, etag):
+            return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    filters = catalog_filters(tag, difficulty, min_price, max_price)
+
+    if search and search.strip():
+        items, total = await search_courses(db, search.strip(), page, page_size, filters)
+        body = PaginatedResponse(
+            items=items,
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=(total + page_size - 1) // page_size,
+        )
+        return json_response(body.model_dump_json().encode(), etag, CATALOG_CACHE_CONTROL)
+
+    query = (
+        select(Course)
+        .options(selectinload(Course.owner), selectinload(Course.stats))
+        .where(Course.is_published.is_(True), *filters)
+    )
+
+    if pagination == "cursor" or cursor is not None:
+        body = await _list_courses_by_cursor(db, query, cursor, page_size, include_total)
+        return json_response(body.model_dump_json().encode(), etag, CATALOG_CACHE_CONTROL)
+
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    result = await db.execute(
+        query.order_by(Course.created_at.desc(), Course.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
+    courses = result.scalars().all()
+
+    body = PaginatedResponse(
+        items=[CoursePublic.model_validate(c) for c in courses],
+        total=total,
+        page=page,
+        page_size=page_size,
+        total_pages=(total + page_size - 1) // page_size,
+    )
+    return json_response(body.model_dump_json().encode(), etag, CATALOG_CACHE_CONTROL)
+
+
+@router.get("/landing", response_model=LandingPage)
+async def get_landing_page(request: Request):
+    """
+    Featured and popular courses, served from the per-worker snapshot
+    """
+    cached = await landing_snapshot.get()
+    if etag_matches(request, cached.etag):
+        return not_modified(cached.etag, CATALOG_CACHE_CONTROL)
+    return json_response(cached.payload, cached.etag, CATALOG_CACHE_CONTROL)
+
+
+@router.get("/facets", response_model=CatalogFacets)
+async def list_course_facets(
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    List all published courses with pagination
+    Per-facet counts of published courses (difficulty, price bucket, tag)
+    """
+    etag = None
+    version = await course_cache.catalog_version()
+    if version is not None:
+        etag = compute_etag(b"facets", version.encode())
+        if etag_matches(request, etag):
+            return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    facets = await get_facets(db)
+    return json_response(facets.model_dump_json().encode(), etag, CATALOG_CACHE_CONTROL)
+
+
+async def _list_courses_by_cursor(
+    db: AsyncSession,
+    query: Select,
+    cursor: Optional[str],
+    page_size: int,
+    include_total: bool
+) -> CursorPaginatedResponse:
+    """
+    Keyset page over idx_course_published_created, newest first
     """
-    # TODO: Implement course listing with search and pagination
-    return {
-        "items": [],
-        "total": 0,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": 0
-    }
+    page_query = query
+    if cursor:
+        try:
+            created_at, course_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            ) from None
+        page_query = page_query.where(
+            tuple_(Course.created_at, Course.id) < tuple_(created_at, course_id)
+        )
+
+    # Fetch one extra row to learn whether another page exists
+    result = await db.execute(
+        page_query.order_by(Course.created_at.desc(), Course.id.desc()).limit(page_size + 1)
+    )
+    courses = result.scalars().all()
+    has_more = len(courses) > page_size
+    courses = courses[:page_size]
+
+    next_cursor = None
+    if has_more:
+        last = courses[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    estimated_total = None
+    if include_total:
+        estimated_total = await estimate_count(db, query.with_only_columns(Course.id))
+
+    return CursorPaginatedResponse(
+        items=[CoursePublic.model_validate(c) for c in courses],
+        page_size=page_size,
+        next_cursor=next_cursor,
+        has_more=has_more,
+        estimated_total=estimated_total,
+    )
 
 
 @router.post("/", response_model=CoursePublic)
@@ -45,19 +218,93 @@ async def create_course(
     return {"message": "Course creation - to be implemented"}
 
 
+@router.post("/import", response_model=CourseImportResult, status_code=status.HTTP_201_CREATED)
+async def import_course_tree(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Bulk import a course with all its modules and lessons in one transaction
+
+    Accepts either a nested CourseImport JSON document or, with
+    `Content-Type: application/x-ndjson`, a stream of course/module/lesson records.
+    """
+    # TODO: Take owner from the authenticated instructor
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            # Parsed as it arrives; the raw body is never held in full
+            tree = await parse_ndjson(ndjson_lines(request.stream()))
+        else:
+            tree = CourseImport.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors()) from e
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        ) from e
+
+    try:
+        result = await import_course(db, tree)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Course slug already exists or owner not found"
+        ) from None
+    await course_cache.invalidate(result.course_id, catalog=True)
+    landing_snapshot.invalidate()
+
+    return result
+
+
+async def _load_course_detail(db: AsyncSession, course_id: int) -> Optional[bytes]:
+    detail = await load_course_detail(db, course_id)
+    if detail is None:
+        return None
+    return detail.model_dump_json().encode()
+
+
+async def _get_module_with_lessons(db: AsyncSession, module_id: int) -> Optional[Module]:
+    result = await db.execute(
+        select(Module)
+        .options(selectinload(Module.lessons))
+        .where(Module.id == module_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+def _module_response(module: Module) -> ModuleWithLessons:
+    return ModuleWithLessons.model_validate(module).model_copy(update={
+        "lessons": sorted(
+            (LessonPublic.model_validate(lesson) for lesson in module.lessons),
+            key=lambda lesson: lesson.order_index,
+        )
+    })
+
+
 @router.get("/{course_id}", response_model=CourseDetail)
 async def get_course(
+    request: Request,
     course_id: int,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get course details by ID
     """
-    # TODO: Implement course retrieval
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="Course not found"
+    cached = await course_cache.get_course(
+        course_id, lambda: _load_course_detail(db, course_id)
     )
+    if cached is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    if etag_matches(request, cached.etag):
+        return not_modified(cached.etag, COURSE_CACHE_CONTROL)
+    return json_response(cached.payload, cached.etag, COURSE_CACHE_CONTROL)
 
 
 @router.put("/{course_id}", response_model=CoursePublic)
@@ -69,8 +316,24 @@ async def update_course(
     """
     Update course (owner/admin only)
     """
-    # TODO: Implement course update with auth check
-    return {"message": "Course update - to be implemented"}
+    # TODO: Add auth check
+    result = await db.execute(
+        select(Course).options(selectinload(Course.owner), selectinload(Course.stats)).where(Course.id == course_id)
+    )
+    course = result.scalar_one_or_none()
+    if course is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+
+    for field, value in course_update.model_dump(exclude_unset=True).items():
+        setattr(course, field, value)
+    await db.commit()
+    await course_cache.invalidate(course_id, catalog=True)
+    landing_snapshot.invalidate()
+
+    return CoursePublic.model_validate(course)
 
 
 @router.delete("/{course_id}")
@@ -81,7 +344,19 @@ async def delete_course(
     """
     Delete course (owner/admin only)
     """
-    # TODO: Implement course deletion with auth check
+    # TODO: Add auth check
+    course = await db.get(Course, course_id)
+    if course is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+
+    await db.delete(course)
+    await db.commit()
+    await course_cache.invalidate(course_id, catalog=True)
+    landing_snapshot.invalidate()
+
     return {"message": "Course deleted successfully"}
 
 
@@ -95,8 +370,32 @@ async def create_module(
     """
     Create a new module in a course
     """
-    # TODO: Implement module creation
-    return {"message": "Module creation - to be implemented"}
+    # TODO: Add auth check
+    if await db.get(Course, course_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+
+    db_module = Module(
+        course_id=course_id,
+        title=module.title,
+        description=module.description,
+        order_index=await ordering.append_key(db, Module, course_id),
+    )
+    db.add(db_module)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent create took the same key; the client can simply retry
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ordering changed concurrently, please retry"
+        ) from None
+    await course_cache.invalidate(course_id)
+
+    return _module_response(await _get_module_with_lessons(db, db_module.id))
 
 
 @router.put("/modules/{module_id}", response_model=ModuleWithLessons)
@@ -108,8 +407,127 @@ async def update_module(
     """
     Update module
     """
-    # TODO: Implement module update
-    return {"message": "Module update - to be implemented"}
+    # TODO: Add auth check
+    db_module = await db.get(Module, module_id)
+    if db_module is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Module not found"
+        )
+
+    course_id = db_module.course_id
+    for field, value in module_update.model_dump(exclude_unset=True).items():
+        setattr(db_module, field, value)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A module with this order_index already exists"
+        ) from None
+    await course_cache.invalidate(course_id)
+
+    return _module_response(await _get_module_with_lessons(db, module_id))
+
+
+async def _schedule_rebalance(kind: str, parent_id: int) -> None:
+    # Imported lazily so the API does not need the worker package at startup
+    from app.workers.tasks import rebalance_order
+
+    try:
+        await asyncio.to_thread(rebalance_order.delay, kind, parent_id)
+    except Exception:
+        # Not fatal: a later move rebalances inline once the gap runs out
+        logger.warning("Could not schedule %s rebalance for %s", kind, parent_id, exc_info=True)
+
+
+async def _move(db: AsyncSession, model, item_id: int, move: MoveRequest) -> Tuple[int, int]:
+    try:
+        order_index, needs_rebalance = await ordering.move_item(db, model, item_id, move.after_id)
+        await db.commit()
+    except LookupError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{model.__name__} not found"
+        ) from None
+    except ordering.OrderingError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        ) from e
+    except IntegrityError:
+        # A concurrent move claimed the same key; the client can simply retry
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ordering changed concurrently, please retry"
+        ) from None
+    return order_index, needs_rebalance
+
+
+async def _apply_order(db: AsyncSession, model, parent_id: int, ordering_update: OrderingUpdate) -> None:
+    try:
+        await ordering.apply_order(db, model, parent_id, ordering_update.ids)
+        await db.commit()
+    except ordering.OrderingError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        ) from e
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ordering changed concurrently, please retry"
+        ) from None
+
+
+@router.post("/modules/{module_id}/move", response_model=OrderPosition)
+async def move_module(
+    module_id: int,
+    move: MoveRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Move a module within its course, rewriting only that module's order key
+    """
+    # TODO: Add auth check
+    order_index, needs_rebalance = await _move(db, Module, module_id, move)
+    course_id = await db.scalar(select(Module.course_id).where(Module.id == module_id))
+    await course_cache.invalidate(course_id)
+    if needs_rebalance:
+        await _schedule_rebalance("modules", course_id)
+
+    return OrderPosition(id=module_id, order_index=order_index)
+
+
+@router.put("/{course_id}/modules/order", response_model=List[OrderPosition])
+async def set_module_order(
+    course_id: int,
+    ordering_update: OrderingUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Apply a complete module ordering for a course in one statement
+    """
+    # TODO: Add auth check
+    if await db.get(Course, course_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+
+    await _apply_order(db, Module, course_id, ordering_update)
+    await course_cache.invalidate(course_id)
+
+    return [
+        OrderPosition(id=module_id, order_index=(position + 1) * ordering.ORDER_GAP)
+        for position, module_id in enumerate(ordering_update.ids)
+    ]
 
 
 # Lesson endpoints
@@ -122,20 +540,125 @@ async def create_lesson(
     """
     Create a new lesson in a module
     """
-    # TODO: Implement lesson creation
-    return {"message": "Lesson creation - to be implemented"}
+    # TODO: Add auth check
+    db_module = await db.get(Module, module_id)
+    if db_module is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Module not found"
+        )
+
+    course_id = db_module.course_id
+    db_lesson = Lesson(
+        **lesson.model_dump(exclude={"module_id", "order_index"}),
+        module_id=module_id,
+        order_index=await ordering.append_key(db, Lesson, module_id),
+    )
+    db.add(db_lesson)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent create took the same key; the client can simply retry
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ordering changed concurrently, please retry"
+        ) from None
+    # Lesson count and duration show on catalog cards
+    await course_cache.invalidate(course_id, catalog=True)
+
+    await db.refresh(db_lesson)
+    return LessonDetail.model_validate(db_lesson)
+
+
+@router.post("/lessons/{lesson_id}/move", response_model=OrderPosition)
+async def move_lesson(
+    lesson_id: int,
+    move: MoveRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Move a lesson within its module, rewriting only that lesson's order key
+    """
+    # TODO: Add auth check
+    order_index, needs_rebalance = await _move(db, Lesson, lesson_id, move)
+    row = (await db.execute(
+        select(Lesson.module_id, Module.course_id)
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Lesson.id == lesson_id)
+    )).one()
+    await course_cache.invalidate(row.course_id)
+    if needs_rebalance:
+        await _schedule_rebalance("lessons", row.module_id)
+
+    return OrderPosition(id=lesson_id, order_index=order_index)
+
+
+@router.put("/modules/{module_id}/lessons/order", response_model=List[OrderPosition])
+async def set_lesson_order(
+    module_id: int,
+    ordering_update: OrderingUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Apply a complete lesson ordering for a module in one statement
+    """
+    # TODO: Add auth check
+    course_id = await db.scalar(select(Module.course_id).where(Module.id == module_id))
+    if course_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Module not found"
+        )
+
+    await _apply_order(db, Lesson, module_id, ordering_update)
+    await course_cache.invalidate(course_id)
+
+    return [
+        OrderPosition(id=lesson_id, order_index=(position + 1) * ordering.ORDER_GAP)
+        for position, lesson_id in enumerate(ordering_update.ids)
+    ]
+
+
+async def _load_lesson_detail(db: AsyncSession, lesson_id: int) -> Optional[Tuple[int, bytes]]:
+    result = await db.execute(
+        select(Lesson, Module.course_id)
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Lesson.id == lesson_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    lesson, course_id = row
+    comments_count = await db.scalar(
+        select(func.count())
+        .where(Comment.lesson_id == lesson_id)
+        .where(Comment.is_deleted.is_(False))
+    )
+    detail = LessonDetail.model_validate(lesson).model_copy(
+        update={"comments_count": comments_count}
+    )
+    return course_id, detail.model_dump_json().encode()
 
 
 @router.get("/lessons/{lesson_id}", response_model=LessonDetail)
 async def get_lesson(
+    request: Request,
     lesson_id: int,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get lesson details
     """
-    # TODO: Implement lesson retrieval
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="Lesson not found"
-    )
\ No newline at end of file
+    cached = await course_cache.get_lesson(
+        lesson_id, lambda: _load_lesson_detail(db, lesson_id)
+    )
+    if cached is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lesson not found"
+        )
+    if etag_matches(request, cached.etag):
+        return not_modified(cached.etag, LESSON_CACHE_CONTROL)
+    return json_response(cached.payload, cached.etag, LESSON_CACHE_CONTROL)
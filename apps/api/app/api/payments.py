@@ -1,5 +1,8 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, status, Header
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 import hmac
 import hashlib
 import httpx
@@ -7,58 +10,138 @@ from typing import Optional, Dict, Any
 
 from app.core.config import settings
 from app.db.database import get_db
-from app.schemas import OrderCreate, OrderInDB, PaymentInDB, RazorpayWebhookEvent
+from app.models import Course, Order, OrderStatus, PaymentProvider, User
+from app.schemas import OrderCreate, OrderInDB, PaymentInDB
+from app.services.ids import LeaseLapsed, id_generator
+from app.services.payment_gateway import ProviderError, ProviderUnavailable, razorpay
+from app.services.webhook_inbox import record_razorpay_event
 
 router = APIRouter()
 
 
-@router.post("/razorpay/orders", response_model=OrderInDB)
+@router.post("/razorpay/orders", response_model=OrderInDB, status_code=status.HTTP_201_CREATED)
 async def create_razorpay_order(
     order: OrderCreate,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Create a Razorpay order for course purchase
+    Create a Razorpay order for course purchase.
+
+    The receipt number comes from the in-process id generator, so the
+    order is written with a single insert: no read-back of a database id
+    and no retry on a receipt collision. While the generator's worker id
+    lease has lapsed, checkouts get a 503 instead of a possibly reused id.
     """
-    # TODO: Implement Razorpay order creation
-    # 1. Create order in database
-    # 2. Call Razorpay API to create order
-    # 3. Return order details
-    return {"message": "Razorpay order creation - to be implemented"}
+    course = await db.scalar(
+        select(Course)
+        .options(selectinload(Course.owner), selectinload(Course.stats))
+        .where(Course.id == order.course_id, Course.is_published.is_(True))
+    )
+    if not course:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    if order.amount_inr != course.price_inr:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Course price has changed"
+        )
+    buyer = await db.get(User, order.user_id)
+    if not buyer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+    try:
+        receipt_number = id_generator.receipt()
+    except LeaseLapsed as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Checkout temporarily unavailable, please retry shortly"
+        ) from e
+    try:
+        provider_order = await razorpay.create_order(
+            course.price_inr * 100,
+            receipt_number,
+            notes={"course_id": str(course.id), "user_id": str(buyer.id)},
+        )
+    except ProviderUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payment provider unavailable, please retry shortly"
+        ) from e
+    except ProviderError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Payment provider error"
+        ) from e
+
+    db_order = await db.scalar(
+        insert(Order)
+        .values(
+            user_id=buyer.id,
+            course_id=course.id,
+            provider=PaymentProvider.RAZORPAY,
+            amount_inr=course.price_inr,
+            status=OrderStatus.CREATED,
+            provider_order_id=provider_order["id"],
+            receipt_number=receipt_number,
+            notes=order.notes,
+        )
+        .returning(Order)
+    )
+    # Already loaded above; attach them so the response needs no lazy loads
+    set_committed_value(db_order, "user", buyer)
+    set_committed_value(db_order, "course", course)
+    await db.commit()
+    return db_order
 
 
 @router.post("/razorpay/webhook")
 async def razorpay_webhook(
     request: Request,
     x_razorpay_signature: Optional[str] = Header(None),
+    x_razorpay_event_id: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Handle Razorpay webhook events
+    Handle Razorpay webhook events.
+
+    Verified events are stored in the webhook inbox and acknowledged right
+    away; inbox workers apply them to orders, payments and enrollments.
+    Redeliveries are acknowledged without being stored again.
     """
-    # TODO: Implement webhook handling
-    # 1. Verify webhook signature
-    # 2. Process payment event
-    # 3. Update order and enrollment status
-    
     body = await request.body()
     
     # Verify signature
-    if x_razorpay_signature:
-        secret = settings.RAZORPAY_WEBHOOK_SECRET.encode()
-        expected_signature = hmac.new(
-            secret,
-            body,
-            hashlib.sha256
-        ).hexdigest()
-        
-        if not hmac.compare_digest(expected_signature, x_razorpay_signature):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid webhook signature"
-            )
+    if not x_razorpay_signature:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing webhook signature"
+        )
+    secret = settings.RAZORPAY_WEBHOOK_SECRET.encode()
+    expected_signature = hmac.new(
+        secret,
+        body,
+        hashlib.sha256
+    ).hexdigest()
+
+    if not hmac.compare_digest(expected_signature, x_razorpay_signature):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook signature"
+        )
     
-    # TODO: Process webhook event
+    try:
+        await record_razorpay_event(db, body, x_razorpay_event_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Malformed webhook payload"
+        ) from e
+    await db.commit()
     return {"status": "ok"}
 
 
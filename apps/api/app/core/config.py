@@ -34,6 +34,39 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
     
+    # Course Cache
+    COURSE_CACHE_TTL: int = 86400  # Redis TTL for serialized course trees
+    COURSE_CACHE_LOCAL_SIZE: int = 512  # In-process LRU entries per worker
+    COURSE_CACHE_LOCAL_TTL: float = 5.0  # Seconds before re-checking the Redis version
+
+    # Course Stats
+    COURSE_STATS_FLUSH_INTERVAL: int = 5  # Seconds between buffered counter flushes
+
+    # Landing Snapshot
+    LANDING_REFRESH_INTERVAL: int = 60  # Max age before the snapshot is rebuilt
+    LANDING_POLL_INTERVAL: float = 5.0  # Seconds between catalog version checks
+    LANDING_SECTION_SIZE: int = 8  # Courses per featured/popular section
+
+    # Comments WebSocket
+    COMMENTS_BROKER: str = "redis"  # Cross-worker fan-out backend: "redis" or "memory"
+    COMMENTS_WS_QUEUE_SIZE: int = 256  # Pending messages per socket before the policy applies
+    COMMENTS_WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # "drop_oldest" or "disconnect"
+    COMMENTS_WS_BATCH_WINDOW_MS: int = 50  # Coalescing window for clients speaking comments.v2
+    COMMENTS_HISTORY_SIZE: int = 200  # Broadcasts kept per lesson for reconnect replay
+    COMMENTS_HISTORY_TTL: int = 86400  # Seconds an idle lesson's history is kept
+    COMMENTS_ID_BLOCK_SIZE: int = 100  # Comment ids reserved per sequence round trip
+    COMMENTS_FLUSH_BATCH_SIZE: int = 500  # Max buffered comments per bulk insert
+    COMMENTS_FLUSH_BLOCK_MS: int = 100  # How long the flusher waits for new comments
+    COMMENTS_PRESENCE_INTERVAL: float = 2.0  # Seconds between viewer/typing snapshots
+    COMMENTS_PRESENCE_TTL: int = 10  # Seconds before a silent worker's viewers expire
+    COMMENTS_TYPING_TTL: int = 5  # Seconds a typing indicator lasts without a refresh
+
+    # Comment Moderation
+    MODERATION_BLOCKLIST_PATH: str = ""  # Extra prefilter terms, one per line
+    MODERATION_CLASSIFIER: str = "local"  # Second-stage backend; "local" is the heuristic stand-in
+    MODERATION_BATCH_SIZE: int = 64  # Comments per classifier call
+    MODERATION_INTERVAL: int = 2  # Seconds between classifier sweeps
+
     # Cloudflare R2 Storage
     R2_ACCOUNT_ID: str = ""
     R2_ACCESS_KEY_ID: str = ""
@@ -46,11 +79,40 @@ class Settings(BaseSettings):
     RAZORPAY_KEY_ID: str = ""
     RAZORPAY_KEY_SECRET: str = ""
     RAZORPAY_WEBHOOK_SECRET: str = ""
+    RAZORPAY_API_URL: str = "https://api.razorpay.com/v1"
     
+    # Webhook Inbox
+    WEBHOOK_WORKERS: int = 4  # Concurrent batch loops per inbox sweep
+    WEBHOOK_BATCH_SIZE: int = 100  # Events claimed per batch
+    WEBHOOK_POLL_INTERVAL: int = 1  # Seconds between inbox sweeps
+    WEBHOOK_MAX_ATTEMPTS: int = 5  # Failures before an event is parked as failed
+
+    # ID Generation
+    IDGEN_WORKER_ID: Optional[int] = None  # Pin this process's worker id (0-1023) instead of leasing one from Redis
+    IDGEN_LEASE_TTL: int = 60  # Seconds a leased worker id survives without renewal
+
+    # Settlement Reconciliation
+    RECONCILIATION_CHUNK_SIZE: int = 5000  # Settlement rows matched per query
+
     # PhonePe Payment Gateway
     PHONEPE_MERCHANT_ID: str = ""
     PHONEPE_SALT_KEY: str = ""
     PHONEPE_SALT_INDEX: int = 1
+    PHONEPE_API_URL: str = "https://api.phonepe.com/apis/hermes"
+
+    # Payment Provider HTTP
+    PROVIDER_HTTP2: bool = True  # Multiplex provider calls over one connection where supported
+    PROVIDER_CONNECT_TIMEOUT: float = 3.0  # Seconds to establish a connection
+    PROVIDER_READ_TIMEOUT: float = 10.0  # Seconds to wait for a response
+    PROVIDER_POOL_TIMEOUT: float = 2.0  # Seconds to wait for a free pooled connection
+    PROVIDER_MAX_CONNECTIONS: int = 50  # Per provider
+    PROVIDER_MAX_KEEPALIVE: int = 20  # Idle connections kept open per provider
+    PROVIDER_KEEPALIVE_EXPIRY: float = 60.0  # Seconds an idle connection is kept
+    PROVIDER_MAX_RETRIES: int = 3  # Retries for idempotent calls
+    PROVIDER_RETRY_BACKOFF: float = 0.2  # Base of the jittered exponential backoff, seconds
+    PROVIDER_RETRY_BACKOFF_MAX: float = 2.0  # Cap on a single backoff, seconds
+    PROVIDER_BREAKER_THRESHOLD: int = 5  # Consecutive failures that open the circuit
+    PROVIDER_BREAKER_RESET: float = 30.0  # Seconds before an open circuit lets a probe through
     
     # LiveKit Video Conferencing
     LIVEKIT_API_KEY: str = ""
@@ -82,6 +144,11 @@ class Settings(BaseSettings):
     CORS_ALLOW_METHODS: List[str] = ["*"]
     CORS_ALLOW_HEADERS: List[str] = ["*"]
     
+    # Idempotency Keys
+    IDEMPOTENCY_TTL: int = 86400  # Seconds a stored response is replayed for
+    IDEMPOTENCY_LOCK_TTL: int = 60  # Seconds a running request holds its key; duplicates wait this long
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1048576  # Larger requests/responses are not made idempotent
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     RATE_LIMIT_PER_HOUR: int = 1000
@@ -0,0 +1,41 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def compute_etag(*parts: bytes) -> str:
+    """
+    Strong ETag over the given byte strings
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """
+    Evaluate If-None-Match against an ETag (weak comparison, as RFC 9110 requires)
+    """
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+def json_response(payload: bytes, etag: Optional[str], cache_control: str) -> Response:
+    headers = {"Cache-Control": cache_control}
+    if etag is not None:
+        headers["ETag"] = etag
+    return Response(content=payload, media_type="application/json", headers=headers)
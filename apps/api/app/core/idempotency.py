@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import logging
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import msgpack
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+
+# Stored per key while the first request runs, then replaced by the response
+_PENDING = "pending"
+_DONE = "done"
+
+# The pending record carries a per-request token, so comparing the whole
+# value tells whether this request still holds the key; a request that
+# outlived its lease must not touch a key another request has since claimed.
+
+# KEYS[1] = key, ARGV = our pending record, ttl ms
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] = key, ARGV = our pending record, response record, ttl ms
+_STORE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] = key, ARGV[1] = our pending record
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _error(status: int, detail: str) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    body = b'{"detail":"' + detail.encode() + b'"}'
+    return status, [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())], body
+
+
+class IdempotencyMiddleware:
+    """
+    Honours the Idempotency-Key header on mutating requests.
+
+    The first request with a given key (per user) runs normally and its
+    response is stored in Redis for `ttl` seconds; repeats get that response
+    back without reaching the handler or the database. Duplicates that
+    arrive while the first is still running wait for its response instead
+    of running again: in-process ones on a shared future, ones on other
+    workers by polling the key. The running request renews its hold on the
+    key every third of `lock_ttl`. Reusing a key for a different request is
+    a 422. Server errors are not stored, so the client can retry them.
+
+    Keys are scoped to the caller, so unauthenticated requests (nothing to
+    scope by) and requests made while Redis is unavailable run without
+    idempotency.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        ttl: int = settings.IDEMPOTENCY_TTL,
+        lock_ttl: int = settings.IDEMPOTENCY_LOCK_TTL,
+        max_body_bytes: int = settings.IDEMPOTENCY_MAX_BODY_BYTES,
+        redis_factory: Callable = get_redis
+    ):
+        self.app = app
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.max_body_bytes = max_body_bytes
+        self._redis_factory = redis_factory
+        # Keys this process is executing -> stored record, or None if not stored
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._renew_script = None
+        self._store_script = None
+        self._release_script = None
+
+    @staticmethod
+    def _user_scope(scope: Scope) -> Optional[str]:
+        # TODO: Use the authenticated user id once auth is implemented
+        user_id = (scope.get("session") or {}).get("user_id")
+        if user_id is not None:
+            return f"user:{user_id}"
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value.strip():
+                return "token:" + hashlib.sha256(value).hexdigest()
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        key = next((value for name, value in scope["headers"] if name == b"idempotency-key"), None)
+        user_scope = self._user_scope(scope)
+        if key is None or user_scope is None:
+            # Anonymous callers would all share one key space and could
+            # replay each other's responses
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            await self._send(send, *_error(400, "Invalid Idempotency-Key header"))
+            return
+
+        body, more = await self._read_body(receive)
+        if more:
+            logger.warning("Body over %s bytes, ignoring Idempotency-Key", self.max_body_bytes)
+            await self.app(scope, self._replay_receive(body, receive, more), send)
+            return
+
+        fingerprint = hashlib.sha256(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+        redis_key = f"idem:{user_scope}:{hashlib.sha256(key).hexdigest()}"
+        pending = msgpack.packb({"state": _PENDING, "fingerprint": fingerprint, "token": uuid.uuid4().hex})
+        try:
+            record = await self._claim_or_wait(redis_key, fingerprint, pending)
+        except RedisError:
+            logger.warning("Idempotency store unavailable, running request as-is", exc_info=True)
+            await self.app(scope, self._replay_receive(body, receive), send)
+            return
+
+        if record is None:
+            await self._execute(scope, receive, send, body, redis_key, fingerprint, pending)
+        elif record["fingerprint"] != fingerprint:
+            await self._send(send, *_error(422, "Idempotency-Key was already used for a different request"))
+        elif record["state"] == _PENDING:
+            await self._send(send, *_error(409, "A request with this Idempotency-Key is still in progress"))
+        else:
+            await self._send(send, record["status"], [*map(tuple, record["headers"]), REPLAYED_HEADER], record["body"])
+
+    async def _read_body(self, receive: Receive) -> Tuple[bytes, bool]:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Disconnected before the body arrived; let the app see it
+                return b"".join(chunks), False
+            chunk = message.get("body", b"")
+            chunks.append(chunk)
+            size += len(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks), False
+            if size > self.max_body_bytes:
+                return b"".join(chunks), True
+
+    @staticmethod
+    def _replay_receive(body: bytes, receive: Receive, more: bool = False) -> Receive:
+        sent = False
+
+        async def replay() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": more}
+            return await receive()
+
+        return replay
+
+    async def _claim_or_wait(self, redis_key: str, fingerprint: str, pending: bytes) -> Optional[dict]:
+        """
+        None if this request should execute (it holds the key now, under
+        `pending`); otherwise the stored record: a finished response, a
+        mismatched fingerprint, or a pending record that outlived the wait
+        """
+        redis = self._redis_factory()
+        deadline = asyncio.get_running_loop().time() + self.lock_ttl
+        delay = 0.05
+        while True:
+            local = self._inflight.get(redis_key)
+            if local is not None:
+                record = await asyncio.shield(local)
+                if record is not None:
+                    return record
+                # The first attempt failed without storing anything: take over
+                continue
+
+            if await redis.set(redis_key, pending, nx=True, px=int(self.lock_ttl * 1000)):
+                self._inflight[redis_key] = asyncio.get_running_loop().create_future()
+                return None
+            raw = await redis.get(redis_key)
+            if raw is None:
+                continue
+            record = msgpack.unpackb(raw)
+            if record["state"] == _DONE or record["fingerprint"] != fingerprint:
+                return record
+            # Running on another worker; poll until it finishes or gives up
+            if asyncio.get_running_loop().time() >= deadline:
+                return record
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def _renew(self, redis_key: str, pending: bytes) -> None:
+        # Keep the key while the handler runs, however long that takes
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                if self._renew_script is None:
+                    self._renew_script = self._redis_factory().register_script(_RENEW_SCRIPT)
+                if not await self._renew_script(keys=[redis_key], args=[pending, int(self.lock_ttl * 1000)]):
+                    logger.warning("Lost the idempotency lease on %s", redis_key)
+                    return
+            except RedisError:
+                logger.warning("Could not renew the idempotency lease on %s", redis_key, exc_info=True)
+
+    async def _execute(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        body: bytes,
+        redis_key: str,
+        fingerprint: str,
+        pending: bytes
+    ) -> None:
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [tuple(header) for header in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        record = None
+        renewer = asyncio.create_task(self._renew(redis_key, pending))
+        try:
+            await self.app(scope, self._replay_receive(body, receive), capture)
+            response = b"".join(chunks)
+            if status < 500 and len(response) <= self.max_body_bytes:
+                record = {
+                    "state": _DONE, "fingerprint": fingerprint, "status": status,
+                    "headers": headers, "body": response,
+                }
+        finally:
+            renewer.cancel()
+            try:
+                redis = self._redis_factory()
+                if record is not None:
+                    if self._store_script is None:
+                        self._store_script = redis.register_script(_STORE_SCRIPT)
+                    stored = await self._store_script(
+                        keys=[redis_key], args=[pending, msgpack.packb(record), self.ttl * 1000]
+                    )
+                    if not stored:
+                        logger.warning("Idempotency key %s was claimed by another request", redis_key)
+                else:
+                    # Nothing worth replaying; let a retry run the request again
+                    if self._release_script is None:
+                        self._release_script = redis.register_script(_RELEASE_SCRIPT)
+                    await self._release_script(keys=[redis_key], args=[pending])
+            except RedisError:
+                logger.warning("Could not store idempotent response for %s", redis_key, exc_info=True)
+            finally:
+                self._inflight.pop(redis_key).set_result(record)
+
+    @staticmethod
+    async def _send(send: Send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
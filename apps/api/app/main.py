@@ -9,9 +9,15 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
 from app.core.config import settings
+from app.core.idempotency import IdempotencyMiddleware
 from app.core.limiter import limiter
+from app.core.redis import close_redis
 from app.api import auth, courses, comments, payments, uploads, live, health
 from app.db.database import engine
+from app.services.comment_writer import comment_writer
+from app.services.ids import id_generator
+from app.services.landing import landing_snapshot
+from app.services.payment_gateway import phonepe, razorpay
 from app.models import Base
 
 
@@ -37,10 +43,30 @@ async def lifespan(app: FastAPI):
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
     
+    # Keep the landing snapshot warm in the background
+    landing_snapshot.start()
+    # Persist WebSocket comments buffered in Redis
+    comment_writer.start()
+    # Share lesson viewer counts and typing indicators across workers
+    comments.presence.start()
+    # Lease a worker id for receipt numbers
+    await id_generator.start()
+    # Pooled, long-lived HTTP clients for payment provider APIs
+    razorpay.start()
+    phonepe.start()
+
     yield
     
     # Shutdown
     print(f"Shutting down {settings.APP_NAME}")
+    await landing_snapshot.stop()
+    await comment_writer.stop()
+    await comments.presence.stop()
+    await comments.manager.close()
+    await razorpay.stop()
+    await phonepe.stop()
+    await id_generator.stop()
+    await close_redis()
 
 
 app = FastAPI(
@@ -53,6 +79,9 @@ app = FastAPI(
 )
 
 # Middleware
+# Innermost, so it sees the session and replays skip everything below it
+app.add_middleware(IdempotencyMiddleware)
+
 app.add_middleware(
     SessionMiddleware,
     secret_key=settings.SECRET_KEY,
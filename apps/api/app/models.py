@@ -3,8 +3,9 @@ from typing import Optional, List
 from enum import Enum as PyEnum
 from sqlalchemy import (
     Integer, String, Text, Boolean, Float, DateTime, ForeignKey, 
-    JSON, Enum, UniqueConstraint, Index, CheckConstraint, func
+    JSON, Enum, UniqueConstraint, Index, CheckConstraint, DDL, event, func, text
 )
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 
@@ -57,6 +58,19 @@ class SFUProvider(str, PyEnum):
     CUSTOM = "custom"
 
 
+class WebhookEventStatus(str, PyEnum):
+    RECEIVED = "received"
+    PROCESSED = "processed"
+    IGNORED = "ignored"
+    FAILED = "failed"
+
+
+class ModerationLabel(str, PyEnum):
+    ALLOW = "allow"
+    REVIEW = "review"
+    BLOCK = "block"
+
+
 # Base Mixin for common fields
 class TimestampMixin:
     created_at: Mapped[datetime] = mapped_column(
@@ -157,7 +171,9 @@ class Course(Base, TimestampMixin):
     preview_video_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     duration_hours: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     difficulty_level: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
-    tags: Mapped[Optional[List[str]]] = mapped_column(JSON, nullable=True)
+    tags: Mapped[Optional[List[str]]] = mapped_column(JSONB, nullable=True)
+    # Weighted full-text document, maintained by the courses_search_vector trigger
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
     
     # Relationships
     owner: Mapped["User"] = relationship(back_populates="owned_courses")
@@ -173,15 +189,127 @@ class Course(Base, TimestampMixin):
     live_rooms: Mapped[List["LiveRoom"]] = relationship(
         back_populates="course", cascade="all, delete-orphan"
     )
+    stats: Mapped[Optional["CourseStats"]] = relationship(viewonly=True)
     
     __table_args__ = (
         Index("idx_course_slug", "slug"),
         Index("idx_course_owner", "owner_id"),
         Index("idx_course_published", "is_published"),
+        Index("idx_course_published_created", "is_published", "created_at", "id"),
+        Index("idx_course_published_difficulty", "is_published", "difficulty_level"),
+        Index("idx_course_published_price", "is_published", "price_inr"),
+        Index(
+            "idx_course_tags", "tags",
+            postgresql_using="gin",
+            postgresql_ops={"tags": "jsonb_path_ops"},
+        ),
+        Index("idx_course_search", "search_vector", postgresql_using="gin"),
+        Index(
+            "idx_course_title_trgm", "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
         CheckConstraint("price_inr >= 0", name="check_price_positive"),
     )
 
 
+# Full-text search support (title > summary > description > tags)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+event.listen(
+    Course.__table__,
+    "after_create",
+    DDL("""
+        CREATE OR REPLACE FUNCTION courses_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(NEW.summary, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C') ||
+                setweight(to_tsvector('english', coalesce(NEW.tags::text, '')), 'D');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER courses_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, summary, description, tags ON courses
+        FOR EACH ROW EXECUTE FUNCTION courses_search_vector_update();
+    """).execute_if(dialect="postgresql"),
+)
+
+
+# Catalog Facet Count Model
+class CourseFacetCount(Base):
+    __tablename__ = "course_facet_counts"
+
+    facet: Mapped[str] = mapped_column(String(20), primary_key=True)
+    value: Mapped[str] = mapped_column(Text, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+# Facet counts over published courses, kept current by a trigger on courses
+event.listen(
+    Course.__table__,
+    "after_create",
+    DDL("""
+        CREATE OR REPLACE FUNCTION course_price_bucket(price integer) RETURNS text AS $$
+            SELECT CASE
+                WHEN price = 0 THEN 'free'
+                WHEN price < 500 THEN 'under_500'
+                WHEN price < 2000 THEN '500_to_1999'
+                ELSE '2000_plus'
+            END
+        $$ LANGUAGE sql IMMUTABLE;
+
+        CREATE OR REPLACE FUNCTION course_facets_apply(c courses, delta integer) RETURNS void AS $$
+        BEGIN
+            IF NOT c.is_published THEN
+                RETURN;
+            END IF;
+            INSERT INTO course_facet_counts (facet, value, count)
+            SELECT f.facet, f.value, delta FROM (
+                SELECT 'difficulty' AS facet, c.difficulty_level AS value
+                WHERE c.difficulty_level IS NOT NULL
+                UNION ALL
+                SELECT 'price', course_price_bucket(c.price_inr)
+                UNION ALL
+                SELECT DISTINCT 'tag', jsonb_array_elements_text(coalesce(c.tags, '[]'::jsonb))
+            ) f
+            ON CONFLICT (facet, value)
+            DO UPDATE SET count = course_facet_counts.count + EXCLUDED.count;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION course_facets_update() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM course_facets_apply(OLD, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM course_facets_apply(NEW, 1);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER course_facets_trigger
+        AFTER INSERT OR DELETE OR UPDATE OF is_published, difficulty_level, price_inr, tags
+        ON courses
+        FOR EACH ROW EXECUTE FUNCTION course_facets_update();
+    """).execute_if(dialect="postgresql"),
+)
+# Takes a courses row, so it has to go before the table can
+event.listen(
+    Course.__table__,
+    "before_drop",
+    DDL("DROP FUNCTION IF EXISTS course_facets_apply(courses, integer)").execute_if(dialect="postgresql"),
+)
+
+
 # Module Model
 class Module(Base, TimestampMixin):
     __tablename__ = "modules"
@@ -199,7 +327,11 @@ class Module(Base, TimestampMixin):
     )
     
     __table_args__ = (
-        UniqueConstraint("course_id", "order_index", name="uq_module_order"),
+        # Deferrable so a single UPDATE can renumber siblings without collisions
+        UniqueConstraint(
+            "course_id", "order_index", name="uq_module_order",
+            deferrable=True, initially="IMMEDIATE",
+        ),
         Index("idx_module_course", "course_id"),
         Index("idx_module_order", "course_id", "order_index"),
     )
@@ -227,7 +359,11 @@ class Lesson(Base, TimestampMixin):
     )
     
     __table_args__ = (
-        UniqueConstraint("module_id", "order_index", name="uq_lesson_order"),
+        # Deferrable so a single UPDATE can renumber siblings without collisions
+        UniqueConstraint(
+            "module_id", "order_index", name="uq_lesson_order",
+            deferrable=True, initially="IMMEDIATE",
+        ),
         Index("idx_lesson_module", "module_id"),
         Index("idx_lesson_order", "module_id", "order_index"),
     )
@@ -246,6 +382,12 @@ class Comment(Base, TimestampMixin):
     )
     is_edited: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Client-generated id for WebSocket comments, so retries are stored once
+    client_msg_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # Set by the background classifier; NULL until the comment has been checked
+    moderation_label: Mapped[Optional[ModerationLabel]] = mapped_column(
+        Enum(ModerationLabel), nullable=True
+    )
     
     # Relationships
     user: Mapped["User"] = relationship(back_populates="comments")
@@ -258,6 +400,13 @@ class Comment(Base, TimestampMixin):
         Index("idx_comment_lesson", "lesson_id"),
         Index("idx_comment_user", "user_id"),
         Index("idx_comment_created", "lesson_id", "created_at"),
+        Index("idx_comment_parent", "parent_id", "created_at"),
+        # The classifier's work queue: only comments not yet moderated
+        Index(
+            "idx_comment_unmoderated", "id",
+            postgresql_where=text("moderation_label IS NULL"),
+        ),
+        UniqueConstraint("user_id", "client_msg_id", name="uq_comment_client_msg"),
     )
 
 
@@ -355,6 +504,48 @@ class Payment(Base, TimestampMixin):
     )
 
 
+# Webhook Inbox Model: events as received, acknowledged before the inbox
+# workers apply them to orders and payments
+class WebhookEvent(Base, TimestampMixin):
+    __tablename__ = "webhook_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    provider: Mapped[PaymentProvider] = mapped_column(Enum(PaymentProvider), nullable=False)
+    event_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    event_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    provider_order_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    provider_payment_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    status: Mapped[WebhookEventStatus] = mapped_column(
+        Enum(WebhookEventStatus),
+        default=WebhookEventStatus.RECEIVED,
+        nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Provider retries resend the same event id
+        UniqueConstraint("provider", "event_id", name="uq_webhook_event_id"),
+        # A payment passes through each state once, whatever the event id
+        # (refunds are excluded: one payment can be refunded in several parts)
+        Index(
+            "uq_webhook_payment_event", "provider", "provider_payment_id", "event_type",
+            unique=True,
+            postgresql_where=text("provider_payment_id IS NOT NULL AND event_type LIKE 'payment.%'"),
+        ),
+        # Pending events, and the per-order "is anything earlier still pending" check
+        Index(
+            "idx_webhook_pending", "provider_order_id", "id",
+            postgresql_where=text("status = 'RECEIVED'"),
+        ),
+    )
+
+
 # Live Room Model
 class LiveRoom(Base, TimestampMixin):
     __tablename__ = "live_rooms"
@@ -437,4 +628,139 @@ class AuditLog(Base):
         Index("idx_audit_action", "action"),
         Index("idx_audit_target", "target"),
         Index("idx_audit_created", "created_at"),
-    )
\ No newline at end of file
+    )
+
+# Course Stats Model
+class CourseStats(Base):
+    __tablename__ = "course_stats"
+
+    course_id: Mapped[int] = mapped_column(
+        ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Server defaults too: the trigger upserts only insert their own counter
+    enrollments_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    lessons_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    total_duration_sec: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    comments_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+
+# Lesson and enrollment counters are maintained by statement-level triggers, so
+# a bulk insert of thousands of lessons costs one upsert per affected course.
+# Comment counts are buffered in Redis instead (see services/course_stats.py).
+event.listen(
+    Lesson.__table__,
+    "after_create",
+    DDL("""
+        CREATE OR REPLACE FUNCTION course_stats_apply_lessons(
+            deltas_module_id integer[], deltas_lessons integer[], deltas_duration integer[]
+        ) RETURNS void AS $$
+        BEGIN
+            INSERT INTO course_stats (course_id, lessons_count, total_duration_sec)
+            SELECT m.course_id, sum(d.lessons), sum(d.duration)
+            FROM unnest(deltas_module_id, deltas_lessons, deltas_duration)
+                AS d(module_id, lessons, duration)
+            JOIN modules m ON m.id = d.module_id
+            GROUP BY m.course_id
+            HAVING sum(d.lessons) <> 0 OR sum(d.duration) <> 0
+            ON CONFLICT (course_id) DO UPDATE SET
+                lessons_count = course_stats.lessons_count + EXCLUDED.lessons_count,
+                total_duration_sec = course_stats.total_duration_sec + EXCLUDED.total_duration_sec,
+                updated_at = now();
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION course_stats_lessons() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM course_stats_apply_lessons(
+                    array_agg(module_id), array_agg(1), array_agg(coalesce(duration_sec, 0))
+                ) FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM course_stats_apply_lessons(
+                    array_agg(module_id), array_agg(-1), array_agg(-coalesce(duration_sec, 0))
+                ) FROM old_rows;
+            ELSE
+                PERFORM course_stats_apply_lessons(
+                    array_agg(n.module_id),
+                    array_agg(0),
+                    array_agg(coalesce(n.duration_sec, 0) - coalesce(o.duration_sec, 0))
+                ) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER course_stats_lessons_insert
+        AFTER INSERT ON lessons REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION course_stats_lessons();
+
+        CREATE TRIGGER course_stats_lessons_delete
+        AFTER DELETE ON lessons REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION course_stats_lessons();
+
+        CREATE TRIGGER course_stats_lessons_update
+        AFTER UPDATE ON lessons REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION course_stats_lessons();
+    """).execute_if(dialect="postgresql"),
+)
+
+event.listen(
+    Enrollment.__table__,
+    "after_create",
+    DDL("""
+        CREATE OR REPLACE FUNCTION course_stats_apply_enrollments(
+            deltas_course_id integer[], deltas_count integer[]
+        ) RETURNS void AS $$
+        BEGIN
+            INSERT INTO course_stats (course_id, enrollments_count)
+            SELECT d.course_id, sum(d.delta)
+            FROM unnest(deltas_course_id, deltas_count) AS d(course_id, delta)
+            GROUP BY d.course_id
+            HAVING sum(d.delta) <> 0
+            ON CONFLICT (course_id) DO UPDATE SET
+                enrollments_count = course_stats.enrollments_count + EXCLUDED.enrollments_count,
+                updated_at = now();
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION course_stats_enrollments() RETURNS trigger AS $$
+        BEGIN
+            -- Only paid-up enrollments count; enum columns store member names
+            IF TG_OP = 'INSERT' THEN
+                PERFORM course_stats_apply_enrollments(array_agg(course_id), array_agg(1))
+                FROM new_rows WHERE status IN ('ACTIVE', 'COMPLETED');
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM course_stats_apply_enrollments(array_agg(course_id), array_agg(-1))
+                FROM old_rows WHERE status IN ('ACTIVE', 'COMPLETED');
+            ELSE
+                PERFORM course_stats_apply_enrollments(
+                    array_agg(n.course_id),
+                    array_agg(
+                        (n.status IN ('ACTIVE', 'COMPLETED'))::integer
+                        - (o.status IN ('ACTIVE', 'COMPLETED'))::integer
+                    )
+                ) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER course_stats_enrollments_insert
+        AFTER INSERT ON enrollments REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION course_stats_enrollments();
+
+        CREATE TRIGGER course_stats_enrollments_delete
+        AFTER DELETE ON enrollments REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION course_stats_enrollments();
+
+        CREATE TRIGGER course_stats_enrollments_update
+        AFTER UPDATE ON enrollments REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION course_stats_enrollments();
+    """).execute_if(dialect="postgresql"),
+)
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator
+from typing import Optional, List, Dict, Any, Literal, Annotated
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, Discriminator, Tag, field_validator
 from enum import Enum
 
 from app.models import (
@@ -107,6 +107,17 @@ class CourseInDB(CourseBase, TimestampSchema):
     owner: UserPublic
 
 
+class CourseCardStats(BaseSchema):
+    enrollments_count: int = 0
+    lessons_count: int = 0
+    total_duration_sec: int = 0
+
+
+class CourseStatsPublic(CourseCardStats):
+    # Detail only: comment counts move too often to version the catalog on
+    comments_count: int = 0
+
+
 class CoursePublic(BaseSchema):
     id: int
     title: str
@@ -118,11 +129,35 @@ class CoursePublic(BaseSchema):
     difficulty_level: Optional[str] = None
     tags: Optional[List[str]] = None
     owner: UserPublic
+    stats: Optional[CourseCardStats] = None
+
+
+class CourseSearchResult(CoursePublic):
+    rank: float = 0.0
+    headline: Optional[str] = None
+
+
+class LandingPage(BaseSchema):
+    featured: List[CoursePublic] = []
+    popular: List[CoursePublic] = []
+    generated_at: datetime
+
+
+class FacetCount(BaseSchema):
+    value: str
+    count: int
+
+
+class CatalogFacets(BaseSchema):
+    difficulty: List[FacetCount] = []
+    price: List[FacetCount] = []
+    tags: List[FacetCount] = []
 
 
 class CourseDetail(CourseInDB):
     modules: List["ModuleWithLessons"] = []
     enrollments_count: int = 0
+    stats: Optional[CourseStatsPublic] = None
 
 
 # Module Schemas
@@ -134,6 +169,8 @@ class ModuleBase(BaseSchema):
 
 class ModuleCreate(ModuleBase):
     course_id: int
+    # Ignored: new modules are appended; place them with the move endpoint
+    order_index: Optional[int] = Field(None, ge=0)
 
 
 class ModuleUpdate(BaseSchema):
@@ -163,6 +200,8 @@ class LessonBase(BaseSchema):
 
 class LessonCreate(LessonBase):
     module_id: int
+    # Ignored: new lessons are appended; place them with the move endpoint
+    order_index: Optional[int] = Field(None, ge=0)
     video_key: Optional[str] = None
     video_url: Optional[str] = None
 
@@ -197,6 +236,67 @@ class LessonDetail(LessonInDB):
     comments_count: int = 0
 
 
+# Ordering Schemas
+class MoveRequest(BaseSchema):
+    # Sibling to place the item directly after; None moves it to the front
+    after_id: Optional[int] = None
+
+
+class OrderPosition(BaseSchema):
+    id: int
+    order_index: int
+
+
+class OrderingUpdate(BaseSchema):
+    ids: List[int] = Field(..., min_length=1, max_length=5000)
+
+
+# Bulk Import Schemas
+def _ensure_unique_order(items: list, label: str) -> list:
+    seen = set()
+    for item in items:
+        if item.order_index in seen:
+            raise ValueError(f"duplicate {label} order_index {item.order_index}")
+        seen.add(item.order_index)
+    return items
+
+
+class LessonImport(LessonBase):
+    video_key: Optional[str] = None
+    video_url: Optional[str] = None
+
+
+class ModuleImport(ModuleBase):
+    lessons: List[LessonImport] = Field(default_factory=list, max_length=5000)
+
+    @field_validator("lessons")
+    @classmethod
+    def validate_lesson_order(cls, v):
+        return _ensure_unique_order(v, "lesson")
+
+
+class CourseImport(CourseCreate):
+    owner_id: int
+    is_published: bool = False
+    modules: List[ModuleImport] = Field(default_factory=list, max_length=1000)
+
+    @field_validator("modules")
+    @classmethod
+    def validate_module_order(cls, v):
+        return _ensure_unique_order(v, "module")
+
+
+class ModuleImportResult(BaseSchema):
+    id: int
+    order_index: int
+    lesson_ids: List[int] = []
+
+
+class CourseImportResult(BaseSchema):
+    course_id: int
+    modules: List[ModuleImportResult] = []
+
+
 # Comment Schemas
 class CommentBase(BaseSchema):
     body: str = Field(..., min_length=1)
@@ -218,6 +318,7 @@ class CommentInDB(CommentBase, TimestampSchema):
     parent_id: Optional[int] = None
     is_edited: bool
     is_deleted: bool
+    client_msg_id: Optional[str] = None
     user: UserPublic
 
 
@@ -225,6 +326,21 @@ class CommentWithReplies(CommentInDB):
     replies: List["CommentInDB"] = []
 
 
+class CommentThread(CommentInDB):
+    depth: int = 0
+    replies: List["CommentThread"] = []
+    # More replies exist than were returned; fetch them from
+    # /comments/{id}/replies, passing replies_cursor when it is set
+    has_more_replies: bool = False
+    replies_cursor: Optional[str] = None
+
+
+class CommentThreadPage(BaseSchema):
+    items: List[CommentThread]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
 # Enrollment Schemas
 class EnrollmentCreate(BaseSchema):
     course_id: int
@@ -256,6 +372,8 @@ class OrderCreate(BaseSchema):
     provider: PaymentProvider
     amount_inr: int = Field(..., gt=0)
     notes: Optional[Dict[str, Any]] = None
+    # TODO: Take the buyer from the authenticated session
+    user_id: int
 
 
 class OrderUpdate(BaseSchema):
@@ -301,6 +419,17 @@ class PaymentInDB(TimestampSchema):
     meta_json: Optional[Dict[str, Any]] = None
 
 
+class ReconciliationSummary(BaseSchema):
+    rows_read: int = 0
+    # Non-payment rows (refunds, adjustments) are not matched
+    rows_skipped: int = 0
+    matched: int = 0
+    # Mismatch kind -> rows written to the report
+    mismatches: Dict[str, int] = {}
+    report_path: str
+    elapsed_sec: float = 0.0
+
+
 # Live Room Schemas
 class LiveRoomBase(BaseSchema):
     title: str = Field(..., min_length=1, max_length=200)
@@ -436,6 +565,63 @@ class CommentWSMessage(WSMessage):
     data: CommentInDB
 
 
+class CommentWSCreate(BaseSchema):
+    type: Literal["comment"] = "comment"
+    body: str = Field(..., min_length=1, max_length=5000)
+    parent_id: Optional[int] = None
+    # Generated by the client and reused on retry; duplicates are acked, not re-posted
+    client_msg_id: str = Field(..., min_length=1, max_length=64)
+    # TODO: Take the author from the authenticated session
+    user_id: int
+
+    @field_validator("body")
+    @classmethod
+    def validate_body(cls, v):
+        # Postgres text cannot hold NUL; catch it before the comment is acked
+        if "\x00" in v:
+            raise ValueError("body must not contain NUL characters")
+        return v
+
+
+class TypingWSEvent(BaseSchema):
+    type: Literal["typing"]
+    # TODO: Take the user from the authenticated session
+    user_id: int
+
+
+def _ws_client_message_type(value: Any) -> str:
+    # Frames without a type predate the typing channel and are comments
+    if isinstance(value, dict):
+        return value.get("type", "comment")
+    return getattr(value, "type", "comment")
+
+
+WSClientMessage = Annotated[
+    Annotated[CommentWSCreate, Tag("comment")] | Annotated[TypingWSEvent, Tag("typing")],
+    Discriminator(_ws_client_message_type),
+]
+
+
+class LessonPresence(BaseSchema):
+    lesson_id: int
+    # Open sockets on the lesson across all workers
+    viewers: int
+    # Users who sent a typing event within COMMENTS_TYPING_TTL
+    typing: List[int] = []
+
+
+class WSQueueMetrics(BaseSchema):
+    lessons: int
+    connections: int
+    queued_messages: int
+    max_queue_depth: int
+    enqueued: int
+    sent: int
+    dropped: int
+    evicted: int
+    send_failures: int
+
+
 # Pagination Schemas
 class PaginationParams(BaseSchema):
     page: int = Field(1, ge=1)
@@ -450,6 +636,14 @@ class PaginatedResponse(BaseSchema):
     total_pages: int
 
 
+class CursorPaginatedResponse(BaseSchema):
+    items: List[Any]
+    page_size: int
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+    estimated_total: Optional[int] = None
+
+
 # Health Check Schema
 class HealthCheck(BaseSchema):
     status: str = "healthy"
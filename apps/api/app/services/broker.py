@@ -0,0 +1,271 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Called with (lesson_id, message) for every message that reaches this process
+MessageHandler = Callable[[str, str], Awaitable[None]]
+
+_EVENT_ID_PREFIX = '{"event_id":"'
+
+
+def with_event_id(event_id: str, message: str) -> str:
+    """
+    Stamp a JSON object message with its event id, as its first key
+    """
+    rest = message[1:]
+    separator = "" if rest.lstrip().startswith("}") else ","
+    return f'{_EVENT_ID_PREFIX}{event_id}"{separator}{rest}'
+
+
+def event_id_of(message: str) -> Optional[str]:
+    """
+    Event id stamped by with_event_id, read without parsing the message
+    """
+    if not message.startswith(_EVENT_ID_PREFIX):
+        return None
+    return message[len(_EVENT_ID_PREFIX):message.index('"', len(_EVENT_ID_PREFIX))]
+
+
+class LessonBroker(ABC):
+    """
+    Fans lesson messages out across processes. Each process subscribes only
+    to lessons it holds sockets for, and delivers what it receives locally.
+
+    The last `history_size` messages per lesson are retained, each stamped with
+    an event id, so a reconnecting client can replay only what it missed.
+    """
+
+    def __init__(self, history_size: int = settings.COMMENTS_HISTORY_SIZE):
+        self.history_size = history_size
+        self._handler: Optional[MessageHandler] = None
+
+    def set_handler(self, handler: MessageHandler) -> None:
+        self._handler = handler
+
+    @abstractmethod
+    async def publish(self, lesson_id: str, message: str) -> None:
+        ...
+
+    @abstractmethod
+    async def history(self, lesson_id: str, after: str) -> Optional[List[str]]:
+        """
+        Messages published after event id `after`, oldest first, or None if
+        that position is no longer retained (the client must refetch)
+        """
+
+    @abstractmethod
+    async def subscribe(self, lesson_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, lesson_id: str) -> None:
+        ...
+
+    async def close(self) -> None:  # noqa: B027
+        """
+        Release connections and background tasks. A no-op by default, since
+        not every backend holds any.
+        """
+
+
+class InMemoryBroker(LessonBroker):
+    """
+    Single-process broker: publishing delivers straight to the local handler.
+    Used in tests and single-worker deployments.
+    """
+
+    def __init__(self, history_size: int = settings.COMMENTS_HISTORY_SIZE):
+        super().__init__(history_size)
+        self.subscriptions: Set[str] = set()
+        self._sequences: Dict[str, int] = {}
+        self._history: Dict[str, Deque[Tuple[int, str]]] = {}
+
+    async def publish(self, lesson_id: str, message: str) -> None:
+        sequence = self._sequences.get(lesson_id, 0) + 1
+        self._sequences[lesson_id] = sequence
+        message = with_event_id(str(sequence), message)
+        if lesson_id not in self._history:
+            self._history[lesson_id] = deque(maxlen=self.history_size)
+        self._history[lesson_id].append((sequence, message))
+
+        if lesson_id in self.subscriptions and self._handler is not None:
+            await self._handler(lesson_id, message)
+
+    async def history(self, lesson_id: str, after: str) -> Optional[List[str]]:
+        try:
+            after_sequence = int(after)
+        except ValueError:
+            return None
+        ring = self._history.get(lesson_id)
+        last = self._sequences.get(lesson_id, 0)
+        # Unknown position: ahead of us (process restarted) or already evicted
+        if after_sequence > last or (ring and after_sequence < ring[0][0] - 1):
+            return None
+        return [message for sequence, message in (ring or ()) if sequence > after_sequence]
+
+    async def subscribe(self, lesson_id: str) -> None:
+        self.subscriptions.add(lesson_id)
+
+    async def unsubscribe(self, lesson_id: str) -> None:
+        self.subscriptions.discard(lesson_id)
+
+
+def _stream_position(event_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+class RedisBroker(LessonBroker):
+    """
+    Redis pub/sub with one channel per lesson. A message is published once,
+    and every process with sockets on that lesson (including this one)
+    receives it on its single shared pub/sub connection.
+
+    History lives in a capped Redis Stream per lesson; the stream entry id is
+    the event id, and appending + publishing happen in one script. Each entry
+    also records the id before it, so a client positioned on the entry just
+    trimmed away can still be replayed in full.
+    """
+
+    CHANNEL_PREFIX = "comments:lesson:"
+
+    # KEYS[1] = history stream, ARGV = channel, message, history size, ttl
+    _PUBLISH_SCRIPT = """
+local last = redis.call('XREVRANGE', KEYS[1], '+', '-', 'COUNT', 1)
+local previous = ''
+if last[1] then
+    previous = last[1][1]
+end
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'm', ARGV[2], 'p', previous)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+local rest = string.sub(ARGV[2], 2)
+local separator = ','
+if string.match(rest, '^%s*}') then
+    separator = ''
+end
+redis.call('PUBLISH', ARGV[1], '{"event_id":"' .. id .. '"' .. separator .. rest)
+return id
+"""
+
+    def __init__(
+        self,
+        redis_factory: Callable = get_redis,
+        history_size: int = settings.COMMENTS_HISTORY_SIZE,
+        history_ttl: int = settings.COMMENTS_HISTORY_TTL
+    ):
+        super().__init__(history_size)
+        self.history_ttl = history_ttl
+        self._redis_factory = redis_factory
+        self._publish_script = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._has_channels = asyncio.Event()
+
+    def _channel(self, lesson_id: str) -> str:
+        return f"{self.CHANNEL_PREFIX}{lesson_id}"
+
+    def _history_key(self, lesson_id: str) -> str:
+        return f"{{lesson:{lesson_id}}}:events"
+
+    def _ensure_reader(self):
+        if self._pubsub is None:
+            self._pubsub = self._redis_factory().pubsub(ignore_subscribe_messages=True)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        return self._pubsub
+
+    async def publish(self, lesson_id: str, message: str) -> None:
+        if self._publish_script is None:
+            self._publish_script = self._redis_factory().register_script(self._PUBLISH_SCRIPT)
+        await self._publish_script(
+            keys=[self._history_key(lesson_id)],
+            args=[self._channel(lesson_id), message, self.history_size, self.history_ttl],
+        )
+
+    async def history(self, lesson_id: str, after: str) -> Optional[List[str]]:
+        try:
+            after_position = _stream_position(after)
+        except ValueError:
+            return None
+        key = self._history_key(lesson_id)
+        async with self._redis_factory().pipeline(transaction=False) as pipe:
+            pipe.xrange(key, "-", "+", count=1)
+            pipe.xrange(key, f"({after}", "+")
+            oldest, entries = await pipe.execute()
+        # Expired entirely
+        if not oldest:
+            return None
+        # Trimmed past the client's position. Replayable from the entry before
+        # the oldest retained one, when known (a new stream has no predecessor)
+        oldest_id, oldest_fields = oldest[0]
+        previous = oldest_fields.get(b"p") or oldest_id
+        if after_position < _stream_position(previous.decode()):
+            return None
+        return [with_event_id(entry_id.decode(), fields[b"m"].decode()) for entry_id, fields in entries]
+
+    async def subscribe(self, lesson_id: str) -> None:
+        pubsub = self._ensure_reader()
+        await pubsub.subscribe(self._channel(lesson_id))
+        self._has_channels.set()
+
+    async def unsubscribe(self, lesson_id: str) -> None:
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self._channel(lesson_id))
+
+    async def _read(self) -> None:
+        while True:
+            # Only check-and-wait without awaiting in between, so a concurrent
+            # subscribe() can never be missed
+            if not self._pubsub.subscribed:
+                self._has_channels.clear()
+                await self._has_channels.wait()
+                continue
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except RedisError:
+                # The pub/sub connection re-subscribes on reconnect
+                logger.warning("Lesson broker connection lost, retrying", exc_info=True)
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message" or self._handler is None:
+                continue
+
+            lesson_id = message["channel"].decode().removeprefix(self.CHANNEL_PREFIX)
+            try:
+                await self._handler(lesson_id, message["data"].decode())
+            except Exception:
+                logger.exception("Lesson broker handler failed for lesson %s", lesson_id)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+def create_broker(backend: str = settings.COMMENTS_BROKER) -> LessonBroker:
+    """
+    Broker for the configured backend ("redis" or "memory")
+    """
+    if backend == "memory":
+        return InMemoryBroker()
+    if backend == "redis":
+        return RedisBroker()
+    raise ValueError(f"Unknown comments broker backend: {backend}")
@@ -0,0 +1,177 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+from app.schemas import CommentThread, CommentThreadPage
+from app.services.pagination import encode_cursor
+
+DELETED_BODY = "[deleted]"
+
+# Top-level threads, newest first, walked via idx_comment_created
+_LESSON_SEED = """
+    SELECT c.*, row_number() OVER (ORDER BY c.created_at DESC, c.id DESC) <= :limit AS keep
+    FROM comments c
+    WHERE c.lesson_id = :anchor_id AND c.parent_id IS NULL
+      AND (CAST(:cursor_at AS timestamptz) IS NULL
+           OR (c.created_at, c.id) < (CAST(:cursor_at AS timestamptz), :cursor_id))
+    ORDER BY c.created_at DESC, c.id DESC
+    LIMIT :limit + 1
+"""
+
+# Direct replies to one comment, oldest first, walked via idx_comment_parent
+_REPLIES_SEED = """
+    SELECT c.*, row_number() OVER (ORDER BY c.created_at, c.id) <= :limit AS keep
+    FROM comments c
+    WHERE c.parent_id = :anchor_id
+      AND (CAST(:cursor_at AS timestamptz) IS NULL
+           OR (c.created_at, c.id) > (CAST(:cursor_at AS timestamptz), :cursor_id))
+    ORDER BY c.created_at, c.id
+    LIMIT :limit + 1
+"""
+
+# Every level fetches one row more than it keeps; the extra row only tells us
+# more exist and is never expanded. Replies are pulled per parent with a
+# LATERAL LIMIT, so a hot thread cannot blow up the page.
+_THREAD = """
+    WITH RECURSIVE seed AS ({seed}),
+    thread AS (
+        SELECT seed.*, 0 AS depth FROM seed
+        UNION ALL
+        SELECT r.*, t.depth + 1
+        FROM thread t
+        CROSS JOIN LATERAL (
+            SELECT c.*, row_number() OVER (ORDER BY c.created_at, c.id) <= :replies_limit AS keep
+            FROM comments c
+            WHERE c.parent_id = t.id
+            ORDER BY c.created_at, c.id
+            LIMIT :replies_limit + 1
+        ) r
+        WHERE t.keep AND t.depth < :depth
+    )
+    SELECT
+        thread.id, thread.user_id, thread.lesson_id, thread.parent_id, thread.body,
+        thread.is_edited, thread.is_deleted, thread.created_at, thread.updated_at,
+        thread.depth, thread.keep,
+        EXISTS (SELECT 1 FROM comments x WHERE x.parent_id = thread.id) AS has_replies,
+        u.name AS user_name, u.picture_url AS user_picture_url, u.role AS user_role
+    FROM thread
+    JOIN users u ON u.id = thread.user_id
+    ORDER BY thread.depth, thread.created_at, thread.id
+"""
+
+
+def _thread_query(seed: str):
+    return text(_THREAD.format(seed=seed)).columns(user_role=User.__table__.c.role.type)
+
+
+_LESSON_THREADS = _thread_query(_LESSON_SEED)
+_REPLY_THREADS = _thread_query(_REPLIES_SEED)
+
+
+async def _load(
+    db: AsyncSession,
+    query,
+    anchor_id: int,
+    cursor: Optional[Tuple[datetime, int]],
+    limit: int,
+    depth: int,
+    replies_limit: int,
+    newest_first: bool
+) -> CommentThreadPage:
+    cursor_at, cursor_id = cursor or (None, None)
+    result = await db.execute(query, {
+        "anchor_id": anchor_id,
+        "cursor_at": cursor_at,
+        "cursor_id": cursor_id,
+        "limit": limit,
+        "depth": depth,
+        "replies_limit": replies_limit,
+    })
+
+    nodes: Dict[int, CommentThread] = {}
+    roots: List[CommentThread] = []
+    has_more = False
+    for row in result.mappings():
+        # Rows arrive parents-first (ordered by depth), so a parent is always known
+        parent = nodes.get(row["parent_id"]) if row["depth"] > 0 else None
+        if not row["keep"]:
+            if parent is not None:
+                parent.has_more_replies = True
+            elif row["depth"] == 0:
+                has_more = True
+            continue
+
+        node = CommentThread.model_validate({
+            "id": row["id"],
+            "user_id": row["user_id"],
+            "lesson_id": row["lesson_id"],
+            "parent_id": row["parent_id"],
+            "body": DELETED_BODY if row["is_deleted"] else row["body"],
+            "is_edited": row["is_edited"],
+            "is_deleted": row["is_deleted"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "user": {
+                "id": row["user_id"],
+                "name": row["user_name"],
+                "picture_url": row["user_picture_url"],
+                "role": row["user_role"],
+            },
+            "depth": row["depth"],
+            # Replies below the depth limit were not fetched at all
+            "has_more_replies": row["has_replies"] and row["depth"] >= depth,
+        })
+        nodes[node.id] = node
+        if parent is not None:
+            parent.replies.append(node)
+        else:
+            roots.append(node)
+
+    for node in nodes.values():
+        if node.has_more_replies and node.replies:
+            last = node.replies[-1]
+            node.replies_cursor = encode_cursor(last.created_at, last.id)
+
+    if newest_first:
+        roots.reverse()
+    next_cursor = None
+    if has_more and roots:
+        next_cursor = encode_cursor(roots[-1].created_at, roots[-1].id)
+    return CommentThreadPage(items=roots, next_cursor=next_cursor, has_more=has_more)
+
+
+async def get_lesson_threads(
+    db: AsyncSession,
+    lesson_id: int,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    limit: int = 20,
+    depth: int = 2,
+    replies_limit: int = 3
+) -> CommentThreadPage:
+    """
+    One page of a lesson's top-level comments (newest first) with up to
+    `depth` levels of replies, `replies_limit` per comment, in one query
+    """
+    return await _load(
+        db, _LESSON_THREADS, lesson_id, cursor, limit, depth, replies_limit, newest_first=True
+    )
+
+
+async def get_comment_replies(
+    db: AsyncSession,
+    comment_id: int,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    limit: int = 20,
+    depth: int = 2,
+    replies_limit: int = 3
+) -> CommentThreadPage:
+    """
+    Load more replies under a comment (oldest first), continuing from a
+    replies_cursor returned with the thread; depth is relative to the comment
+    """
+    return await _load(
+        db, _REPLY_THREADS, comment_id, cursor, limit, depth, replies_limit, newest_first=False
+    )
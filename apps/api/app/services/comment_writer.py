@@ -0,0 +1,405 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from collections import Counter, deque
+from datetime import UTC, datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.db.database import AsyncSessionLocal
+from app.models import Comment, Lesson, Module, User
+from app.schemas import CommentInDB, CommentWSCreate, UserPublic
+from app.services.course_stats import record_comment_delta
+
+logger = logging.getLogger(__name__)
+
+# WebSocket comments are acknowledged and broadcast as soon as they are in this
+# stream; a flusher bulk-inserts them into `comments` in the background
+STREAM_KEY = "{comments}:pending"
+DEAD_LETTER_KEY = "{comments}:dead"
+FLUSH_GROUP = "comment-flushers"
+# Remembers client_msg_id -> comment id so a retried message is acked, not re-posted
+CLIENT_MSG_TTL = 24 * 60 * 60
+MAX_ATTEMPTS = 3
+# Rows that failed to insert wait here (scored by due time) before going back
+# to the stream, RETRY_BACKOFF_MS * 2 ** attempt later
+RETRY_KEY = "{comments}:retry"
+RETRY_BACKOFF_MS = 1_000
+# Entries a crashed flusher left unacknowledged are taken over after this long
+RECLAIM_IDLE_MS = 30_000
+# Buffered comments remember their lesson, so replies to them can be checked
+# before the row is written; far longer than any entry waits for the flusher
+COMMENT_LESSON_TTL = 60 * 60
+
+# Dedupe and buffer in one step: a message is either already known (returns
+# its id) or both remembered and appended, never just one of the two.
+# KEYS = client msg key, stream, comment lesson key; ARGV = id, ttl, row,
+# lesson id, lesson ttl
+_SUBMIT_SCRIPT = """
+local existing = redis.call('GET', KEYS[1])
+if existing then
+    return existing
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SET', KEYS[3], ARGV[4], 'EX', ARGV[5])
+redis.call('XADD', KEYS[2], '*', 'comment', ARGV[3], 'attempt', '0')
+return false
+"""
+
+# KEYS = retry set, stream; ARGV = now (ms), max entries.
+# Moves retries that are due back into the stream.
+_REQUEUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local entry = cjson.decode(member)
+    redis.call('XADD', KEYS[2], '*', 'comment', entry.comment, 'attempt', entry.attempt)
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+comments = Comment.__table__
+
+
+def _client_msg_key(user_id: int, client_msg_id: str) -> str:
+    return f"{{comments}}:client:{user_id}:{client_msg_id}"
+
+
+def _comment_lesson_key(comment_id: int) -> str:
+    return f"{{comments}}:lesson-of:{comment_id}"
+
+
+class CommentIdAllocator:
+    """
+    Hands out comment ids from blocks reserved on the table's sequence, so
+    ids are known before the row is written and cost one round trip per block
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._ids: Deque[int] = deque()
+        self._lock = asyncio.Lock()
+
+    async def next_id(self) -> int:
+        if not self._ids:
+            async with self._lock:
+                if not self._ids:
+                    async with AsyncSessionLocal() as db:
+                        result = await db.execute(
+                            text(
+                                "SELECT nextval(pg_get_serial_sequence('comments', 'id')) "
+                                "FROM generate_series(1, :n)"
+                            ),
+                            {"n": self.block_size},
+                        )
+                        self._ids.extend(result.scalars())
+        return self._ids.popleft()
+
+
+class CommentWriter:
+    """
+    Write-behind pipeline for WebSocket comments.
+
+    submit() assigns an id, appends the comment to a Redis Stream (deduped on
+    the client message id) and returns the message to broadcast right away.
+    A flusher per worker drains the stream through a consumer group with bulk
+    inserts. Delivery is at-least-once; ON CONFLICT DO NOTHING makes replays
+    harmless. Rows that fail on their own are retried with backoff and
+    dead-lettered after MAX_ATTEMPTS.
+    """
+
+    def __init__(self, id_block_size: int, batch_size: int, block_ms: int):
+        self.ids = CommentIdAllocator(id_block_size)
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+        self._users: Dict[int, UserPublic] = {}
+        self._lesson_courses: Dict[int, int] = {}
+        self._comment_lessons: Dict[int, int] = {}
+        self._script = None
+        self._requeue_script = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def _user(self, user_id: int) -> Optional[UserPublic]:
+        user = self._users.get(user_id)
+        if user is None:
+            async with AsyncSessionLocal() as db:
+                row = await db.get(User, user_id)
+                if row is None:
+                    return None
+                user = UserPublic.model_validate(row)
+            if len(self._users) > 10_000:
+                self._users.clear()
+            self._users[user_id] = user
+        return user
+
+    async def _lesson_course(self, lesson_id: int) -> Optional[int]:
+        course_id = self._lesson_courses.get(lesson_id)
+        if course_id is None:
+            async with AsyncSessionLocal() as db:
+                course_id = await db.scalar(
+                    select(Module.course_id)
+                    .join(Lesson, Lesson.module_id == Module.id)
+                    .where(Lesson.id == lesson_id)
+                )
+            if course_id is None:
+                return None
+            if len(self._lesson_courses) > 10_000:
+                self._lesson_courses.clear()
+            self._lesson_courses[lesson_id] = course_id
+        return course_id
+
+    async def _comment_lesson(self, comment_id: int) -> Optional[int]:
+        lesson_id = self._comment_lessons.get(comment_id)
+        if lesson_id is None:
+            # Possibly still buffered (and submitted on another worker)
+            try:
+                cached = await get_redis().get(_comment_lesson_key(comment_id))
+            except RedisError:
+                cached = None
+            if cached is not None:
+                lesson_id = int(cached)
+            else:
+                async with AsyncSessionLocal() as db:
+                    lesson_id = await db.scalar(
+                        select(Comment.lesson_id).where(Comment.id == comment_id)
+                    )
+                if lesson_id is None:
+                    return None
+            self._remember_comment(comment_id, lesson_id)
+        return lesson_id
+
+    def _remember_comment(self, comment_id: int, lesson_id: int) -> None:
+        if len(self._comment_lessons) > 10_000:
+            self._comment_lessons.clear()
+        self._comment_lessons[comment_id] = lesson_id
+
+    async def submit(self, lesson_id: int, message: CommentWSCreate) -> Tuple[CommentInDB, bool]:
+        """
+        Accept a comment; returns (comment, is_new). Duplicates come back with
+        their original id and is_new=False and must not be broadcast again.
+        Raises LookupError for an unknown author or lesson, or a parent that
+        is not a comment on the same lesson.
+        """
+        user = await self._user(message.user_id)
+        if user is None:
+            raise LookupError("Unknown user")
+        if await self._lesson_course(lesson_id) is None:
+            raise LookupError("Unknown lesson")
+        if message.parent_id is not None and await self._comment_lesson(message.parent_id) != lesson_id:
+            raise LookupError("Unknown parent comment")
+
+        now = datetime.now(UTC)
+        comment = CommentInDB(
+            id=await self.ids.next_id(),
+            user_id=message.user_id,
+            lesson_id=lesson_id,
+            parent_id=message.parent_id,
+            body=message.body,
+            is_edited=False,
+            is_deleted=False,
+            client_msg_id=message.client_msg_id,
+            created_at=now,
+            updated_at=now,
+            user=user,
+        )
+        row = comment.model_dump_json(exclude={"user"})
+
+        try:
+            redis = get_redis()
+            if self._script is None:
+                self._script = redis.register_script(_SUBMIT_SCRIPT)
+            existing = await self._script(
+                keys=[
+                    _client_msg_key(message.user_id, message.client_msg_id),
+                    STREAM_KEY,
+                    _comment_lesson_key(comment.id),
+                ],
+                args=[comment.id, CLIENT_MSG_TTL, row, lesson_id, COMMENT_LESSON_TTL],
+            )
+        except RedisError:
+            # No buffer available: write through so the comment is not lost
+            logger.warning("Comment stream unavailable, writing through", exc_info=True)
+            async with AsyncSessionLocal() as db:
+                inserted = await self._insert(db, [json.loads(row)])
+                await db.commit()
+                if not inserted:
+                    # uq_comment_client_msg: a retry of a comment already written
+                    existing = await db.scalar(
+                        select(Comment.id).where(
+                            Comment.user_id == message.user_id,
+                            Comment.client_msg_id == message.client_msg_id,
+                        )
+                    )
+                    if existing is not None:
+                        return comment.model_copy(update={"id": existing}), False
+                    raise LookupError("Comment could not be stored") from None
+                await self._record_counts(db, inserted)
+            self._remember_comment(comment.id, lesson_id)
+            return comment, True
+
+        if existing is not None:
+            return comment.model_copy(update={"id": int(existing)}), False
+        self._remember_comment(comment.id, lesson_id)
+        return comment, True
+
+    async def _insert(self, db: AsyncSession, rows: List[dict]) -> List[Tuple[int, int]]:
+        for row in rows:
+            row.pop("user", None)
+            for key in ("created_at", "updated_at"):
+                row[key] = datetime.fromisoformat(row[key])
+        result = await db.execute(
+            insert(comments)
+            .values(rows)
+            .on_conflict_do_nothing()
+            .returning(comments.c.id, comments.c.lesson_id)
+        )
+        return [tuple(r) for r in result]
+
+    async def _record_counts(self, db: AsyncSession, inserted: List[Tuple[int, int]]) -> None:
+        per_lesson = Counter(lesson_id for _, lesson_id in inserted)
+        unknown = [lesson_id for lesson_id in per_lesson if lesson_id not in self._lesson_courses]
+        if unknown:
+            result = await db.execute(
+                select(Lesson.id, Module.course_id)
+                .join(Module, Lesson.module_id == Module.id)
+                .where(Lesson.id.in_(unknown))
+            )
+            if len(self._lesson_courses) > 10_000:
+                self._lesson_courses.clear()
+            self._lesson_courses.update(dict(result.all()))
+
+        per_course = Counter()
+        for lesson_id, count in per_lesson.items():
+            per_course[self._lesson_courses[lesson_id]] += count
+        for course_id, count in per_course.items():
+            await record_comment_delta(db, course_id, count)
+
+    async def _insert_individually(
+        self,
+        db: AsyncSession,
+        entries: List[Tuple[bytes, dict, int]]
+    ) -> List[Tuple[int, int]]:
+        # A bad row (a parent another flusher has not written yet, a lesson
+        # deleted meanwhile, ...) must not hold back the rest of the batch
+        inserted = []
+        redis = get_redis()
+        for _, row, attempt in entries:
+            try:
+                async with db.begin_nested():
+                    inserted += await self._insert(db, [dict(row)])
+            except (IntegrityError, DataError) as e:
+                attempt += 1
+                comment = json.dumps(row)
+                if attempt >= MAX_ATTEMPTS:
+                    logger.error("Dead-lettering comment %s after %s attempts: %r", row["id"], attempt, e)
+                    await redis.xadd(DEAD_LETTER_KEY, {"comment": comment, "attempt": str(attempt)})
+                    continue
+                due_ms = int(time.time() * 1000) + RETRY_BACKOFF_MS * 2 ** (attempt - 1)
+                await redis.zadd(RETRY_KEY, {json.dumps({"comment": comment, "attempt": str(attempt)}): due_ms})
+        return inserted
+
+    async def _requeue_due(self) -> int:
+        redis = get_redis()
+        if self._requeue_script is None:
+            self._requeue_script = redis.register_script(_REQUEUE_SCRIPT)
+        return await self._requeue_script(
+            keys=[RETRY_KEY, STREAM_KEY], args=[int(time.time() * 1000), self.batch_size]
+        )
+
+    async def flush(self, entries: List[Tuple[bytes, Dict[bytes, bytes]]]) -> int:
+        """
+        Bulk-insert one batch of stream entries, then acknowledge them.
+        Returns the number of comments written.
+        """
+        if not entries:
+            return 0
+        parsed = [
+            (entry_id, json.loads(fields[b"comment"]), int(fields.get(b"attempt", b"0")))
+            for entry_id, fields in entries
+        ]
+
+        async with AsyncSessionLocal() as db:
+            try:
+                inserted = await self._insert(db, [dict(row) for _, row, _ in parsed])
+                await db.commit()
+            except (IntegrityError, DataError):
+                # One bad row fails the whole statement; find it row by row
+                await db.rollback()
+                inserted = await self._insert_individually(db, parsed)
+                await db.commit()
+
+            redis = get_redis()
+            entry_ids = [entry_id for entry_id, _, _ in parsed]
+            await redis.xack(STREAM_KEY, FLUSH_GROUP, *entry_ids)
+            await redis.xdel(STREAM_KEY, *entry_ids)
+            await self._record_counts(db, inserted)
+        return len(inserted)
+
+    async def _ensure_group(self) -> None:
+        try:
+            await get_redis().xgroup_create(STREAM_KEY, FLUSH_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _run(self) -> None:
+        await self._ensure_group()
+        last_reclaim = 0.0
+        while True:
+            try:
+                redis = get_redis()
+                if time.monotonic() - last_reclaim > RECLAIM_IDLE_MS / 1000:
+                    last_reclaim = time.monotonic()
+                    claimed = await redis.xautoclaim(
+                        STREAM_KEY, FLUSH_GROUP, self.consumer,
+                        min_idle_time=RECLAIM_IDLE_MS, count=self.batch_size,
+                    )
+                    await self.flush(claimed[1])
+
+                await self._requeue_due()
+                response = await redis.xreadgroup(
+                    FLUSH_GROUP, self.consumer, {STREAM_KEY: ">"},
+                    count=self.batch_size, block=self.block_ms,
+                )
+                for _, entries in response:
+                    await self.flush(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Unacked entries stay pending and are retried or reclaimed
+                logger.exception("Comment flush failed")
+                await asyncio.sleep(1.0)
+
+    def start(self) -> None:
+        """
+        Start this worker's flusher; call from the app lifespan
+        """
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+
+comment_writer = CommentWriter(
+    id_block_size=settings.COMMENTS_ID_BLOCK_SIZE,
+    batch_size=settings.COMMENTS_FLUSH_BATCH_SIZE,
+    block_ms=settings.COMMENTS_FLUSH_BLOCK_MS,
+)
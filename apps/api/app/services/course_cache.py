@@ -0,0 +1,247 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.http_cache import compute_etag
+from app.core.redis import get_redis
+
+# Course content is versioned per course: every write bumps the version key and
+# readers only ever look up payloads stored under the current version, so stale
+# trees are never served from Redis and simply age out via their TTL.
+#
+# KEYS[1] = version key, KEYS[2] = payload key prefix, ARGV[1] = version the
+# caller already holds locally. Returns {version, payload-or-false}, skipping
+# the payload transfer when the local copy is still current.
+_READ_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+if version == ARGV[1] then
+    return {version, false}
+end
+return {version, redis.call('GET', KEYS[2] .. version)}
+"""
+
+# Random token rather than a counter, so a Redis flush can never hand out a
+# version (and therefore an ETag) that an earlier catalog already used
+CATALOG_VERSION_KEY = "catalog:v"
+
+CourseLoader = Callable[[], Awaitable[Optional[bytes]]]
+LessonLoader = Callable[[], Awaitable[Optional[Tuple[int, bytes]]]]
+
+
+def _version_key(course_id: int) -> str:
+    return f"{{course:{course_id}}}:v"
+
+
+def _tree_key(course_id: int) -> str:
+    return f"{{course:{course_id}}}:tree:"
+
+
+def _lesson_key(course_id: int, lesson_id: int) -> str:
+    return f"{{course:{course_id}}}:lesson:{lesson_id}:"
+
+
+def _lesson_course_key(lesson_id: int) -> str:
+    return f"lesson:{lesson_id}:course"
+
+
+class CachedPayload(NamedTuple):
+    payload: bytes
+    etag: str
+
+
+def _cached(payload: Optional[bytes]) -> Optional[CachedPayload]:
+    if payload is None:
+        return None
+    return CachedPayload(payload, compute_etag(payload))
+
+
+class _LocalEntry:
+    __slots__ = ("course_id", "version", "cached", "checked_at")
+
+    def __init__(self, course_id: int, version: str, cached: CachedPayload):
+        self.course_id = course_id
+        self.version = version
+        self.cached = cached
+        self.checked_at = time.monotonic()
+
+
+class CourseCache:
+    """
+    Read-through cache for serialized course trees and lessons.
+
+    A small per-process LRU sits in front of Redis; entries are trusted for
+    `local_ttl` seconds, after which a single round trip re-validates the
+    version (and only transfers the payload if it changed).
+    """
+
+    def __init__(self, ttl: int, local_size: int, local_ttl: float):
+        self.ttl = ttl
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self._local: OrderedDict[str, _LocalEntry] = OrderedDict()
+        self._lesson_courses: Dict[int, int] = {}
+        self._catalog: Optional[Tuple[str, float]] = None
+        self._script = None
+
+    def _local_get(self, key: str) -> Optional[_LocalEntry]:
+        entry = self._local.get(key)
+        if entry is not None:
+            self._local.move_to_end(key)
+        return entry
+
+    def _local_put(self, key: str, entry: _LocalEntry) -> None:
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def _remember_lesson(self, lesson_id: int, course_id: int) -> None:
+        if lesson_id not in self._lesson_courses and len(self._lesson_courses) >= 10_000:
+            self._lesson_courses.clear()
+        self._lesson_courses[lesson_id] = course_id
+
+    async def _read(
+        self,
+        course_id: int,
+        prefix: str,
+        known_version: str
+    ) -> Tuple[str, Optional[bytes]]:
+        redis = get_redis()
+        if self._script is None:
+            self._script = redis.register_script(_READ_SCRIPT)
+        version, payload = await self._script(
+            keys=[_version_key(course_id), prefix], args=[known_version]
+        )
+        return version.decode(), payload or None
+
+    async def _fetch(
+        self,
+        local_key: str,
+        course_id: int,
+        prefix: str,
+        loader: CourseLoader
+    ) -> Optional[CachedPayload]:
+        entry = self._local_get(local_key)
+        if entry is not None and time.monotonic() - entry.checked_at < self.local_ttl:
+            return entry.cached
+
+        try:
+            version, payload = await self._read(
+                course_id, prefix, entry.version if entry is not None else ""
+            )
+        except RedisError:
+            # Redis is unavailable, serve straight from the database
+            return _cached(await loader())
+
+        if entry is not None and payload is None and version == entry.version:
+            entry.checked_at = time.monotonic()
+            return entry.cached
+
+        if payload is None:
+            payload = await loader()
+            if payload is None:
+                return None
+            try:
+                await get_redis().set(prefix + version, payload, ex=self.ttl)
+            except RedisError:
+                pass
+
+        cached = CachedPayload(payload, compute_etag(payload))
+        self._local_put(local_key, _LocalEntry(course_id, version, cached))
+        return cached
+
+    async def get_course(self, course_id: int, loader: CourseLoader) -> Optional[CachedPayload]:
+        """
+        Return the serialized CourseDetail, loading and caching it on a miss
+        """
+        return await self._fetch(f"course:{course_id}", course_id, _tree_key(course_id), loader)
+
+    async def get_lesson(self, lesson_id: int, loader: LessonLoader) -> Optional[CachedPayload]:
+        """
+        Return the serialized LessonDetail, cached under its course's version
+        """
+        course_id = self._lesson_courses.get(lesson_id)
+        if course_id is None:
+            try:
+                cached = await get_redis().get(_lesson_course_key(lesson_id))
+            except RedisError:
+                cached = None
+            course_id = int(cached) if cached is not None else None
+
+        if course_id is None:
+            # First sighting of this lesson: learn its course from the database.
+            # The payload is not cached yet since it was read before the version.
+            result = await loader()
+            if result is None:
+                return None
+            course_id, payload = result
+            self._remember_lesson(lesson_id, course_id)
+            try:
+                await get_redis().set(_lesson_course_key(lesson_id), course_id, ex=self.ttl)
+            except RedisError:
+                pass
+            return _cached(payload)
+
+        async def load_payload() -> Optional[bytes]:
+            result = await loader()
+            return result[1] if result is not None else None
+
+        self._remember_lesson(lesson_id, course_id)
+        return await self._fetch(
+            f"lesson:{lesson_id}", course_id, _lesson_key(course_id, lesson_id), load_payload
+        )
+
+    async def catalog_version(self) -> Optional[str]:
+        """
+        Opaque token that changes whenever any catalog-visible course field does
+        """
+        if self._catalog is not None and time.monotonic() - self._catalog[1] < self.local_ttl:
+            return self._catalog[0]
+        try:
+            redis = get_redis()
+            version = await redis.get(CATALOG_VERSION_KEY)
+            if version is None:
+                await redis.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, nx=True)
+                version = await redis.get(CATALOG_VERSION_KEY)
+        except RedisError:
+            return None
+        self._catalog = (version.decode(), time.monotonic())
+        return self._catalog[0]
+
+    async def invalidate(self, course_id: int, catalog: bool = False) -> None:
+        """
+        Drop every cached payload for a course; call after the write commits.
+        Pass catalog=True when the change is visible on catalog cards too.
+        """
+        await self.invalidate_many([course_id], catalog=catalog)
+
+    async def invalidate_many(self, course_ids: Iterable[int], catalog: bool = False) -> None:
+        """
+        invalidate() for several courses at once, in a single round trip
+        """
+        course_ids = set(course_ids)
+        if not course_ids and not catalog:
+            return
+        for key in [k for k, e in self._local.items() if e.course_id in course_ids]:
+            del self._local[key]
+        if catalog:
+            self._catalog = None
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for course_id in course_ids:
+                    pipe.incr(_version_key(course_id))
+                if catalog:
+                    pipe.set(CATALOG_VERSION_KEY, uuid.uuid4().hex)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+course_cache = CourseCache(
+    ttl=settings.COURSE_CACHE_TTL,
+    local_size=settings.COURSE_CACHE_LOCAL_SIZE,
+    local_ttl=settings.COURSE_CACHE_LOCAL_TTL,
+)
@@ -0,0 +1,123 @@
+import json
+from typing import AsyncIterable, AsyncIterator, List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Course, Lesson, Module
+from app.schemas import CourseImport, CourseImportResult, ModuleImportResult
+from app.services import ordering
+
+
+async def ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Split a byte stream into lines as chunks arrive, holding at most one
+    partial line
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        # The held partial line has no newline; only search what just arrived
+        searched = len(buffer)
+        buffer += chunk
+        start = 0
+        end = buffer.find(b"\n", searched)
+        while end != -1:
+            yield bytes(buffer[start:end])
+            start = end + 1
+            end = buffer.find(b"\n", start)
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def parse_ndjson(lines: AsyncIterable[bytes]) -> CourseImport:
+    """
+    Assemble a CourseImport from NDJSON records.
+
+    The first record is the course, then each {"type": "module"} record opens a
+    module and the {"type": "lesson"} records after it belong to that module.
+    """
+    course = None
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            kind = record.pop("type")
+        except (ValueError, AttributeError, KeyError):
+            raise ValueError(f"line {number}: expected a JSON object with a 'type'") from None
+
+        if kind == "course" and course is None:
+            course = {**record, "modules": []}
+        elif kind == "module" and course is not None:
+            course["modules"].append({**record, "lessons": []})
+        elif kind == "lesson" and course is not None and course["modules"]:
+            course["modules"][-1]["lessons"].append(record)
+        else:
+            raise ValueError(f"line {number}: unexpected '{kind}' record")
+
+    if course is None:
+        raise ValueError("no course record found")
+    return CourseImport.model_validate(course)
+
+
+async def import_course(db: AsyncSession, tree: CourseImport) -> CourseImportResult:
+    """
+    Insert a validated course tree with one statement per level.
+
+    Module and lesson rows go through executemany with RETURNING, which
+    SQLAlchemy batches into multi-row INSERTs. The client's order_index only
+    ranks siblings; stored keys are spaced ORDER_GAP apart so later moves
+    have room. The caller owns the transaction.
+    """
+    course_id = await db.scalar(
+        insert(Course)
+        .values(**tree.model_dump(exclude={"modules"}))
+        .returning(Course.id)
+    )
+
+    module_keys = ordering.spaced_keys([m.order_index for m in tree.modules])
+    module_ids: List[int] = []
+    if tree.modules:
+        result = await db.execute(
+            insert(Module).returning(Module.id, sort_by_parameter_order=True),
+            [
+                {
+                    "course_id": course_id,
+                    "title": m.title,
+                    "description": m.description,
+                    "order_index": key,
+                }
+                for m, key in zip(tree.modules, module_keys, strict=True)
+            ],
+        )
+        module_ids = list(result.scalars())
+
+    lesson_rows = [
+        {**lesson.model_dump(), "module_id": module_id, "order_index": key}
+        for module_id, m in zip(module_ids, tree.modules, strict=True)
+        for lesson, key in zip(
+            m.lessons, ordering.spaced_keys([item.order_index for item in m.lessons]), strict=True
+        )
+    ]
+    lesson_ids: List[int] = []
+    if lesson_rows:
+        result = await db.execute(
+            insert(Lesson).returning(Lesson.id, sort_by_parameter_order=True),
+            lesson_rows,
+        )
+        lesson_ids = list(result.scalars())
+
+    modules = []
+    offset = 0
+    for module_id, m, key in zip(module_ids, tree.modules, module_keys, strict=True):
+        modules.append(ModuleImportResult(
+            id=module_id,
+            order_index=key,
+            lesson_ids=lesson_ids[offset:offset + len(m.lessons)],
+        ))
+        offset += len(m.lessons)
+
+    return CourseImportResult(course_id=course_id, modules=modules)
@@ -0,0 +1,224 @@
+import asyncio
+import time
+import uuid
+from collections import Counter
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import get_redis
+from app.services.course_cache import course_cache
+
+# Pending comment-count deltas, course_id -> delta. Comments are the hot write
+# path, so they are accumulated with HINCRBY and applied in periodic batches
+# rather than updating the course_stats row inside every comment transaction.
+PENDING_COMMENTS_KEY = "course_stats:pending:comments"
+# Batches being applied; one left behind means its flush died mid-way
+FLUSHING_PREFIX = f"{PENDING_COMMENTS_KEY}:flushing:"
+
+# Flushes and repairs both claim the buffered deltas, so they take turns.
+# Long enough for a full repair; a crashed holder just delays the next flush.
+LOCK_KEY = "course_stats:lock"
+LOCK_TTL_MS = 10 * 60 * 1000
+
+# KEYS[1] = lock, ARGV[1] = our token
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_APPLY_COMMENT_DELTAS = text("""
+    INSERT INTO course_stats (course_id, comments_count)
+    SELECT d.course_id, d.delta
+    FROM unnest(CAST(:course_ids AS integer[]), CAST(:deltas AS integer[])) AS d(course_id, delta)
+    JOIN courses c ON c.id = d.course_id
+    ON CONFLICT (course_id) DO UPDATE SET
+        comments_count = course_stats.comments_count + EXCLUDED.comments_count,
+        updated_at = now()
+""")
+
+_REPAIR = text("""
+    INSERT INTO course_stats (
+        course_id, enrollments_count, lessons_count, total_duration_sec, comments_count
+    )
+    SELECT
+        c.id,
+        (SELECT count(*) FROM enrollments e
+         WHERE e.course_id = c.id AND e.status IN ('ACTIVE', 'COMPLETED')),
+        (SELECT count(*) FROM lessons l JOIN modules m ON m.id = l.module_id
+         WHERE m.course_id = c.id),
+        (SELECT coalesce(sum(l.duration_sec), 0) FROM lessons l JOIN modules m ON m.id = l.module_id
+         WHERE m.course_id = c.id),
+        (SELECT count(*) FROM comments cm
+         JOIN lessons l ON l.id = cm.lesson_id JOIN modules m ON m.id = l.module_id
+         WHERE m.course_id = c.id AND NOT cm.is_deleted)
+    FROM courses c
+    WHERE CAST(:course_id AS integer) IS NULL OR c.id = :course_id
+    ON CONFLICT (course_id) DO UPDATE SET
+        enrollments_count = EXCLUDED.enrollments_count,
+        lessons_count = EXCLUDED.lessons_count,
+        total_duration_sec = EXCLUDED.total_duration_sec,
+        comments_count = EXCLUDED.comments_count,
+        updated_at = now()
+    WHERE (
+        course_stats.enrollments_count, course_stats.lessons_count,
+        course_stats.total_duration_sec, course_stats.comments_count
+    ) IS DISTINCT FROM (
+        EXCLUDED.enrollments_count, EXCLUDED.lessons_count,
+        EXCLUDED.total_duration_sec, EXCLUDED.comments_count
+    )
+    RETURNING course_id
+""")
+
+
+async def _apply_comment_deltas(db: AsyncSession, deltas: Dict[int, int]) -> None:
+    deltas = {course_id: delta for course_id, delta in deltas.items() if delta}
+    if deltas:
+        await db.execute(
+            _APPLY_COMMENT_DELTAS,
+            {"course_ids": list(deltas), "deltas": list(deltas.values())},
+        )
+
+
+@asynccontextmanager
+async def _batch_lock(redis, wait: float = 0.0) -> AsyncIterator[bool]:
+    """
+    Serialize flushes and repairs, yielding whether the lock was taken
+    within `wait` seconds
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not await redis.set(LOCK_KEY, token, nx=True, px=LOCK_TTL_MS):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        await asyncio.sleep(0.1)
+    try:
+        yield True
+    finally:
+        try:
+            await redis.register_script(_RELEASE_SCRIPT)(keys=[LOCK_KEY], args=[token])
+        except RedisError:
+            pass  # Expires on its own
+
+
+async def _claim_pending(redis) -> Tuple[List[str], Dict[int, int]]:
+    """
+    Move the buffered deltas to a batch key and collect every batch key,
+    including those a crashed flush left behind. Call under _batch_lock.
+    """
+    # RENAME is atomic: increments that arrive from now on land in a fresh hash
+    try:
+        await redis.rename(PENDING_COMMENTS_KEY, f"{FLUSHING_PREFIX}{uuid.uuid4().hex}")
+    except ResponseError as e:
+        if "no such key" not in str(e).lower():
+            raise
+
+    keys = [key async for key in redis.scan_iter(match=f"{FLUSHING_PREFIX}*")]
+    deltas: Counter = Counter()
+    for key in keys:
+        for course_id, delta in (await redis.hgetall(key)).items():
+            deltas[int(course_id)] += int(delta)
+    return keys, dict(deltas)
+
+
+async def _restore_pending(redis, keys: List[str], deltas: Dict[int, int]) -> None:
+    # Put the deltas back so the next flush retries them
+    async with redis.pipeline(transaction=True) as pipe:
+        for course_id, delta in deltas.items():
+            pipe.hincrby(PENDING_COMMENTS_KEY, str(course_id), delta)
+        pipe.delete(*keys)
+        await pipe.execute()
+
+
+async def record_comment_delta(db: AsyncSession, course_id: int, delta: int) -> None:
+    """
+    Count a comment being added (+1) or removed (-1) for a course.
+    Call after the comment write has committed.
+
+    Buffered in Redis when available; otherwise applied directly so the count
+    is never lost.
+    """
+    try:
+        await get_redis().hincrby(PENDING_COMMENTS_KEY, str(course_id), delta)
+    except RedisError:
+        await _apply_comment_deltas(db, {course_id: delta})
+        await db.commit()
+        await course_cache.invalidate(course_id)
+
+
+async def flush_comment_deltas(db: AsyncSession) -> int:
+    """
+    Apply buffered comment deltas in one statement and commit.
+    Returns the number of courses updated.
+
+    Batches orphaned by a flush that died before deleting its batch key are
+    applied too. A flush that dies after committing but before that delete
+    re-applies its batch on the next run; the nightly repair corrects it.
+    """
+    redis = get_redis()
+    async with _batch_lock(redis) as locked:
+        if not locked:
+            # A repair (or another flush) holds the batch; leave it to them
+            return 0
+
+        keys, deltas = await _claim_pending(redis)
+        if not keys:
+            return 0
+        try:
+            await _apply_comment_deltas(db, deltas)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            await _restore_pending(redis, keys, deltas)
+            raise
+        await redis.delete(*keys)
+
+    # Comment counts are part of cached course payloads, not catalog cards
+    await course_cache.invalidate_many(deltas)
+    return len(deltas)
+
+
+async def repair_course_stats(db: AsyncSession, course_id: Optional[int] = None) -> None:
+    """
+    Recompute counters from scratch for one course, or all courses, and commit.
+
+    Buffered comment deltas are claimed first and discarded for the repaired
+    courses once the recount commits, since it already includes those
+    comments; deltas for other courses are applied in the same transaction.
+    """
+    redis = get_redis()
+    async with AsyncExitStack() as stack:
+        keys: List[str] = []
+        deltas: Dict[int, int] = {}
+        try:
+            if not await stack.enter_async_context(_batch_lock(redis, wait=LOCK_TTL_MS / 1000)):
+                raise RuntimeError("Timed out waiting for the course stats lock")
+            keys, deltas = await _claim_pending(redis)
+        except RedisError:
+            # Without Redis nothing is buffered; the recount alone is exact
+            pass
+
+        try:
+            if course_id is not None:
+                await _apply_comment_deltas(
+                    db, {other: delta for other, delta in deltas.items() if other != course_id}
+                )
+            repaired = set((await db.execute(_REPAIR, {"course_id": course_id})).scalars())
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            if keys:
+                await _restore_pending(redis, keys, deltas)
+            raise
+        if keys:
+            await redis.delete(*keys)
+
+    if course_id is not None:
+        repaired |= set(deltas)
+    await course_cache.invalidate_many(repaired, catalog=True)
@@ -0,0 +1,107 @@
+from itertools import groupby
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Course, CourseStats, Lesson, Module, User
+from app.schemas import CourseDetail
+
+# Core tables rather than ORM entities: rows come back as plain tuples and never
+# enter the session identity map, which keeps large trees cheap to build.
+courses = Course.__table__
+users = User.__table__
+stats = CourseStats.__table__
+modules = Module.__table__
+lessons = Lesson.__table__
+
+
+async def load_course_detail(db: AsyncSession, course_id: int) -> Optional[CourseDetail]:
+    """
+    Load a course with its ordered module/lesson tree in two queries
+    """
+    # Counters are denormalized into course_stats, so no aggregates here
+    result = await db.execute(
+        select(
+            courses.c.id, courses.c.title, courses.c.slug, courses.c.summary,
+            courses.c.description, courses.c.price_inr, courses.c.thumbnail_url,
+            courses.c.preview_video_url, courses.c.duration_hours,
+            courses.c.difficulty_level, courses.c.tags, courses.c.is_published,
+            courses.c.is_featured, courses.c.owner_id, courses.c.created_at,
+            courses.c.updated_at,
+            users.c.name.label("owner_name"),
+            users.c.picture_url.label("owner_picture_url"),
+            users.c.role.label("owner_role"),
+            func.coalesce(stats.c.enrollments_count, 0).label("stats_enrollments_count"),
+            func.coalesce(stats.c.lessons_count, 0).label("stats_lessons_count"),
+            func.coalesce(stats.c.total_duration_sec, 0).label("stats_total_duration_sec"),
+            func.coalesce(stats.c.comments_count, 0).label("stats_comments_count"),
+        )
+        .join(users, users.c.id == courses.c.owner_id)
+        .outerjoin(stats, stats.c.course_id == courses.c.id)
+        .where(courses.c.id == course_id)
+    )
+    course = result.mappings().one_or_none()
+    if course is None:
+        return None
+
+    # One outer join walks idx_module_order then idx_lesson_order
+    result = await db.execute(
+        select(
+            modules.c.id, modules.c.course_id, modules.c.title, modules.c.description,
+            modules.c.order_index, modules.c.created_at, modules.c.updated_at,
+            lessons.c.id.label("lesson_id"),
+            lessons.c.title.label("lesson_title"),
+            lessons.c.order_index.label("lesson_order_index"),
+            lessons.c.duration_sec.label("lesson_duration_sec"),
+            lessons.c.free_preview.label("lesson_free_preview"),
+        )
+        .select_from(modules.outerjoin(lessons, lessons.c.module_id == modules.c.id))
+        .where(modules.c.course_id == course_id)
+        .order_by(modules.c.order_index, lessons.c.order_index)
+    )
+
+    tree = []
+    for _, rows in groupby(result.mappings(), key=lambda row: row["id"]):
+        rows = list(rows)
+        first = rows[0]
+        tree.append({
+            "id": first["id"],
+            "course_id": first["course_id"],
+            "title": first["title"],
+            "description": first["description"],
+            "order_index": first["order_index"],
+            "created_at": first["created_at"],
+            "updated_at": first["updated_at"],
+            "lessons": [
+                {
+                    "id": row["lesson_id"],
+                    "title": row["lesson_title"],
+                    "order_index": row["lesson_order_index"],
+                    "duration_sec": row["lesson_duration_sec"],
+                    "free_preview": row["lesson_free_preview"],
+                }
+                for row in rows
+                if row["lesson_id"] is not None
+            ],
+        })
+
+    return CourseDetail.model_validate({
+        **{
+            key: value for key, value in course.items()
+            if not key.startswith(("owner_", "stats_"))
+        },
+        "owner_id": course["owner_id"],
+        "owner": {
+            "id": course["owner_id"],
+            "name": course["owner_name"],
+            "picture_url": course["owner_picture_url"],
+            "role": course["owner_role"],
+        },
+        "modules": tree,
+        "enrollments_count": course["stats_enrollments_count"],
+        "stats": {
+            key.removeprefix("stats_"): value for key, value in course.items()
+            if key.startswith("stats_")
+        },
+    })
@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Course, CourseFacetCount
+from app.schemas import CatalogFacets, FacetCount
+
+# Must match course_price_bucket() in the courses facet trigger
+PRICE_BUCKETS = ["free", "under_500", "500_to_1999", "2000_plus"]
+
+
+def catalog_filters(
+    tags: Optional[List[str]] = None,
+    difficulty: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None
+) -> list:
+    """
+    WHERE clauses for the catalog filters, each backed by an index
+    """
+    filters = []
+    if tags:
+        # jsonb @> uses idx_course_tags; all requested tags must be present
+        filters.append(Course.tags.contains(tags))
+    if difficulty:
+        filters.append(Course.difficulty_level == difficulty)
+    if min_price is not None:
+        filters.append(Course.price_inr >= min_price)
+    if max_price is not None:
+        filters.append(Course.price_inr <= max_price)
+    return filters
+
+
+async def get_facets(db: AsyncSession, tag_limit: int = 50) -> CatalogFacets:
+    """
+    Read the trigger-maintained facet counts (a handful of rows, no GROUP BY)
+    """
+    result = await db.execute(
+        select(CourseFacetCount.facet, CourseFacetCount.value, CourseFacetCount.count)
+        .where(CourseFacetCount.count > 0)
+    )
+    grouped: Dict[str, List[FacetCount]] = {"difficulty": [], "price": [], "tag": []}
+    for facet, value, count in result:
+        grouped.setdefault(facet, []).append(FacetCount(value=value, count=count))
+
+    grouped["price"].sort(key=lambda f: PRICE_BUCKETS.index(f.value))
+    grouped["difficulty"].sort(key=lambda f: -f.count)
+    grouped["tag"].sort(key=lambda f: (-f.count, f.value))
+
+    return CatalogFacets(
+        difficulty=grouped["difficulty"],
+        price=grouped["price"],
+        tags=grouped["tag"][:tag_limit],
+    )
+
+
+async def rebuild_facet_counts(db: AsyncSession) -> None:
+    """
+    Recompute every facet count from scratch (repair job; the caller commits)
+    """
+    await db.execute(text("LOCK TABLE course_facet_counts IN EXCLUSIVE MODE"))
+    await db.execute(delete(CourseFacetCount))
+    await db.execute(text("""
+        INSERT INTO course_facet_counts (facet, value, count)
+        SELECT facet, value, count(*) FROM (
+            SELECT 'difficulty' AS facet, difficulty_level AS value
+            FROM courses WHERE is_published AND difficulty_level IS NOT NULL
+            UNION ALL
+            SELECT 'price', course_price_bucket(price_inr)
+            FROM courses WHERE is_published
+            UNION ALL
+            SELECT DISTINCT ON (c.id, t.tag) 'tag', t.tag
+            FROM courses c, jsonb_array_elements_text(coalesce(c.tags, '[]'::jsonb)) AS t(tag)
+            WHERE c.is_published
+        ) f
+        GROUP BY facet, value
+    """))
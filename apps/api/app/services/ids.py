@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 2024-01-01T00:00:00Z; 41 bits of milliseconds from here last until 2093
+EPOCH_MS = 1704067200000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+WORKER_IDS = 1 << WORKER_BITS
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# KEYS[1] = worker id lease, ARGV = our token, ttl ms
+# Extends the lease if we still hold it; returns 0 if it was lost
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] = worker id lease, ARGV[1] = our token
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _lease_key(worker_id: int) -> str:
+    return f"idgen:worker:{worker_id}"
+
+
+class LeaseLapsed(RuntimeError):
+    """
+    The worker id lease ran out unrenewed, so another process may hold the id
+    """
+
+
+class IdGenerator:
+    """
+    Snowflake-style 63-bit ids: milliseconds since EPOCH_MS, a 10-bit worker
+    id and a 12-bit per-millisecond sequence. Ids are handed out in-process
+    without any round trip, increase with time, and are unique across
+    processes as long as each holds a distinct worker id.
+
+    The worker id is leased from Redis (one key per id, renewed every third
+    of `lease_ttl`) unless `worker_id` pins it. A crashed process keeps its
+    id reserved until the lease expires, so a restart never reuses it while
+    its old ids could still be colliding within the same millisecond.
+    Likewise, once its own lease has run out unrenewed, next_id() raises
+    LeaseLapsed until a lease is held again.
+    """
+
+    def __init__(
+        self,
+        worker_id: Optional[int] = settings.IDGEN_WORKER_ID,
+        lease_ttl: int = settings.IDGEN_LEASE_TTL,
+        redis_factory: Callable = get_redis
+    ):
+        if worker_id is not None and not 0 <= worker_id < WORKER_IDS:
+            raise ValueError(f"worker_id must be in [0, {WORKER_IDS})")
+        self.worker_id = worker_id
+        self.lease_ttl = lease_ttl
+        self._pinned = worker_id is not None
+        self._leased = False
+        # Monotonic time our lease runs out; None while no lease was ever held
+        self._lease_deadline: Optional[float] = None
+        self._token = os.urandom(8).hex()
+        self._redis_factory = redis_factory
+        self._last_ms = 0
+        self._sequence = 0
+        # Ids may also be drawn from threadpool code
+        self._lock = threading.Lock()
+        self._renew_script = None
+        self._release_script = None
+        self._task: Optional[asyncio.Task] = None
+
+    def next_id(self) -> int:
+        if self.worker_id is None:
+            raise RuntimeError("IdGenerator has no worker id; call start() first")
+        if self._lease_deadline is not None and time.monotonic() >= self._lease_deadline:
+            raise LeaseLapsed(f"Lease on id worker {self.worker_id} lapsed")
+        with self._lock:
+            now = int(time.time() * 1000) - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                # Same millisecond, or the clock stepped back: keep counting
+                # from the last timestamp used so ids never repeat
+                self._sequence += 1
+            else:
+                # Sequence exhausted within a millisecond; borrow the next one
+                self._last_ms += 1
+                self._sequence = 0
+            return (
+                self._last_ms << (WORKER_BITS + SEQUENCE_BITS)
+                | self.worker_id << SEQUENCE_BITS
+                | self._sequence
+            )
+
+    def receipt(self) -> str:
+        """
+        Unique, time-ordered order receipt number (fits Razorpay's 40 chars)
+        """
+        return f"rcpt_{self.next_id()}"
+
+    async def _acquire(self) -> bool:
+        redis = self._redis_factory()
+        # Start at a random id so concurrent starters rarely race for one key
+        first = random.randrange(WORKER_IDS)
+        for offset in range(WORKER_IDS):
+            worker_id = (first + offset) % WORKER_IDS
+            # Measured before asking, so our deadline is never later than Redis'
+            deadline = time.monotonic() + self.lease_ttl
+            if await redis.set(_lease_key(worker_id), self._token, nx=True, px=self.lease_ttl * 1000):
+                if self.worker_id is not None and self.worker_id != worker_id:
+                    logger.info("Switched id worker %s -> %s", self.worker_id, worker_id)
+                self.worker_id = worker_id
+                self._leased = True
+                self._lease_deadline = deadline
+                return True
+        logger.error("All %s id worker leases are taken", WORKER_IDS)
+        return False
+
+    async def _renew(self) -> None:
+        if not self._leased:
+            await self._acquire()
+            return
+        if self._renew_script is None:
+            self._renew_script = self._redis_factory().register_script(_RENEW_SCRIPT)
+        deadline = time.monotonic() + self.lease_ttl
+        if await self._renew_script(keys=[_lease_key(self.worker_id)], args=[self._token, self.lease_ttl * 1000]):
+            self._lease_deadline = deadline
+        else:
+            logger.warning("Lost the lease on id worker %s", self.worker_id)
+            self._leased = False
+            self._lease_deadline = time.monotonic()
+            await self._acquire()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await self._renew()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Id worker lease renewal failed")
+
+    async def start(self) -> None:
+        """
+        Lease a worker id and keep it renewed; call from the app lifespan
+        """
+        if self._pinned or self._task is not None:
+            return
+        try:
+            await self._acquire()
+        except RedisError:
+            logger.warning("Could not lease an id worker", exc_info=True)
+        if self.worker_id is None:
+            # Keep serving checkouts; the renewal loop retries the lease and
+            # receipt_number's unique constraint still guards the rare clash
+            self.worker_id = random.randrange(WORKER_IDS)
+            logger.warning("Using unleased id worker %s", self.worker_id)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Free the worker id now rather than waiting for the lease to expire
+        if self._leased:
+            try:
+                if self._release_script is None:
+                    self._release_script = self._redis_factory().register_script(_RELEASE_SCRIPT)
+                await self._release_script(keys=[_lease_key(self.worker_id)], args=[self._token])
+            except RedisError:
+                logger.warning("Could not release id worker %s", self.worker_id, exc_info=True)
+            self._leased = False
+            self._lease_deadline = time.monotonic()
+
+
+id_generator = IdGenerator()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.http_cache import compute_etag
+from app.db.database import AsyncSessionLocal
+from app.models import Course, CourseStats
+from app.schemas import CoursePublic, LandingPage
+from app.services.course_cache import CachedPayload, course_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def build_landing_page(db: AsyncSession, limit: int) -> LandingPage:
+    """
+    Featured and most-enrolled published courses for the home page
+    """
+    published = (
+        select(Course)
+        .options(selectinload(Course.owner), selectinload(Course.stats))
+        .where(Course.is_published.is_(True))
+        .limit(limit)
+    )
+    featured = await db.scalars(
+        published.where(Course.is_featured.is_(True))
+        .order_by(Course.created_at.desc(), Course.id.desc())
+    )
+    popular = await db.scalars(
+        published.join(CourseStats, CourseStats.course_id == Course.id)
+        .order_by(CourseStats.enrollments_count.desc(), Course.id.desc())
+    )
+    return LandingPage(
+        featured=[CoursePublic.model_validate(course) for course in featured],
+        popular=[CoursePublic.model_validate(course) for course in popular],
+        generated_at=datetime.now(UTC),
+    )
+
+
+class LandingSnapshot:
+    """
+    Serialized landing payload held in memory by each worker.
+
+    Requests always get the bytes currently in memory; rebuilds happen in a
+    single background task (on a timer, or when the catalog version moves), so
+    a rebuild never blocks a request and concurrent expiries cannot stampede
+    the database. Only the very first request of a cold worker waits, and it
+    shares the one in-flight build with everyone else.
+    """
+
+    def __init__(self, refresh_interval: float, poll_interval: float, section_size: int):
+        self.refresh_interval = refresh_interval
+        self.poll_interval = poll_interval
+        self.section_size = section_size
+        self._current: Optional[CachedPayload] = None
+        self._built_at = 0.0
+        self._catalog_version: Optional[str] = None
+        self._build: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    async def _rebuild(self) -> CachedPayload:
+        # Read the version first: a change racing with the build is caught next poll
+        version = await course_cache.catalog_version()
+        async with AsyncSessionLocal() as db:
+            page = await build_landing_page(db, self.section_size)
+        payload = page.model_dump_json().encode()
+        self._current = CachedPayload(payload, compute_etag(payload))
+        self._built_at = time.monotonic()
+        self._catalog_version = version
+        return self._current
+
+    def _refresh(self) -> asyncio.Task:
+        if self._build is None or self._build.done():
+            self._build = asyncio.create_task(self._rebuild())
+            self._build.add_done_callback(self._log_failure)
+        return self._build
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            # Keep serving the previous snapshot; the next poll retries
+            logger.error("Landing snapshot rebuild failed", exc_info=task.exception())
+
+    def _is_stale(self, version: Optional[str]) -> bool:
+        if time.monotonic() - self._built_at >= self.refresh_interval:
+            return True
+        return version is not None and version != self._catalog_version
+
+    async def get(self) -> CachedPayload:
+        """
+        Return the current snapshot, only waiting if none was ever built
+        """
+        if self._current is None:
+            return await asyncio.shield(self._refresh())
+        if time.monotonic() - self._built_at >= self.refresh_interval:
+            # Refresher not running (or behind): serve stale, rebuild in background
+            self._refresh()
+        return self._current
+
+    def invalidate(self) -> None:
+        """
+        Rebuild in the background; readers keep the current bytes until it lands
+        """
+        self._refresh()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._is_stale(await course_cache.catalog_version()):
+                    await self._refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # Logged by the done callback
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """
+        Start the background refresher; call from the app lifespan
+        """
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        for task in (self._refresher, self._build):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._refresher = None
+        self._build = None
+
+
+landing_snapshot = LandingSnapshot(
+    refresh_interval=settings.LANDING_REFRESH_INTERVAL,
+    poll_interval=settings.LANDING_POLL_INTERVAL,
+    section_size=settings.LANDING_SECTION_SIZE,
+)
@@ -0,0 +1,257 @@
+import logging
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Boolean, Integer, String, cast, column, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Comment, Lesson, ModerationLabel, Module
+from app.schemas import WSMessage
+from app.services.broker import create_broker
+from app.services.course_stats import record_comment_delta
+
+logger = logging.getLogger(__name__)
+
+# Always rejected at submit time. Deployments extend this through
+# MODERATION_BLOCKLIST_PATH rather than by editing code.
+DEFAULT_BLOCKLIST = [
+    "buy followers",
+    "free bitcoin",
+    "crypto giveaway",
+    "dm me on telegram",
+    "whatsapp me",
+    "t.me/",
+    "earn money from home",
+    "leaked answers",
+]
+
+# Rude but not always abusive: left for a moderator to look at
+REVIEW_TERMS = ["dumb", "stupid", "idiot", "useless", "trash", "scam", "shut up"]
+
+_URL = re.compile(r"https?://|www\.", re.IGNORECASE)
+_REPEATED = re.compile(r"(.)\1{9,}|\b(\w+)(?:\W+\2\b){4,}", re.IGNORECASE)
+
+
+class ModerationVerdict(NamedTuple):
+    label: ModerationLabel
+    reasons: List[str]
+
+
+ALLOWED = ModerationVerdict(ModerationLabel.ALLOW, [])
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    # Alternatives sharing a prefix are merged ("free bitcoin|free money" ->
+    # "free (?:bitcoin|money)"), so the regex engine tries each character at
+    # a position once instead of once per term
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        ends_here = "" in node
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if ends_here else group
+
+    return build(trie)
+
+
+def compile_terms(terms: Iterable[str]) -> Optional[re.Pattern]:
+    """
+    One case-insensitive regex matching any of the terms as whole words.
+    Only a term's word-character ends need a boundary, so "t.me/" still
+    matches inside "t.me/channel".
+    """
+    normalized = {term.strip().lower() for term in terms if term.strip()}
+    if not normalized:
+        return None
+
+    # Terms are grouped by which ends need a boundary, one trie per group
+    groups: Dict[Tuple[bool, bool], List[str]] = {}
+    for term in normalized:
+        ends = (bool(re.match(r"\w", term[0])), bool(re.match(r"\w", term[-1])))
+        groups.setdefault(ends, []).append(term)
+
+    alternatives = [
+        (r"(?<!\w)" if starts_word else "")
+        + "(?:" + _trie_pattern(group) + ")"
+        + (r"(?!\w)" if ends_word else "")
+        for (starts_word, ends_word), group in sorted(groups.items())
+    ]
+    return re.compile("|".join(alternatives), re.IGNORECASE)
+
+
+def load_blocklist(path: str = settings.MODERATION_BLOCKLIST_PATH) -> List[str]:
+    """
+    Built-in terms plus any listed in `path` (one per line, # for comments)
+    """
+    terms = list(DEFAULT_BLOCKLIST)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            terms += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return terms
+
+
+class BlocklistPrefilter:
+    """
+    Stage one, inline on every submit: a single pass of one compiled regex,
+    however many terms are listed
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self._pattern = compile_terms(terms)
+
+    def check(self, body: str) -> ModerationVerdict:
+        if self._pattern is None:
+            return ALLOWED
+        matches = sorted({match.group(0).lower() for match in self._pattern.finditer(body)})
+        if not matches:
+            return ALLOWED
+        return ModerationVerdict(ModerationLabel.BLOCK, [f"blocked term: {term}" for term in matches])
+
+
+class ModerationClassifier(ABC):
+    """
+    Stage two, off the request path: labels comments in batches
+    """
+
+    @abstractmethod
+    async def classify(self, bodies: List[str]) -> List[ModerationVerdict]:
+        ...
+
+
+class HeuristicClassifier(ModerationClassifier):
+    """
+    Local stand-in for a model: flags insults, link spam, shouting and
+    repetition for review. Deterministic, so tests can rely on its labels.
+    """
+
+    def __init__(self, review_terms: Iterable[str] = REVIEW_TERMS, max_links: int = 2):
+        self._review = compile_terms(review_terms)
+        self.max_links = max_links
+
+    def _classify(self, body: str) -> ModerationVerdict:
+        reasons = []
+        if self._review is not None and self._review.search(body):
+            reasons.append("insult")
+        if len(_URL.findall(body)) > self.max_links:
+            reasons.append("links")
+        letters = [char for char in body if char.isalpha()]
+        if len(letters) >= 20 and sum(char.isupper() for char in letters) / len(letters) > 0.7:
+            reasons.append("shouting")
+        if _REPEATED.search(body):
+            reasons.append("repetition")
+        if not reasons:
+            return ALLOWED
+        return ModerationVerdict(ModerationLabel.REVIEW, reasons)
+
+    async def classify(self, bodies: List[str]) -> List[ModerationVerdict]:
+        return [self._classify(body) for body in bodies]
+
+
+def create_classifier(backend: str = settings.MODERATION_CLASSIFIER) -> ModerationClassifier:
+    """
+    Classifier for the configured backend ("local")
+    """
+    if backend == "local":
+        return HeuristicClassifier()
+    raise ValueError(f"Unknown moderation classifier: {backend}")
+
+
+prefilter = BlocklistPrefilter(load_blocklist())
+
+
+async def moderate_batch(
+    db: AsyncSession,
+    classifier: ModerationClassifier,
+    batch_size: int = settings.MODERATION_BATCH_SIZE
+) -> Tuple[int, List[Tuple[int, int, int]]]:
+    """
+    Claim up to `batch_size` unmoderated comments, classify them in one call
+    and store the labels; blocked comments are soft-deleted. Returns the
+    number claimed and the (id, lesson_id, course_id) of comments this
+    retracted. Caller commits.
+    """
+    # SKIP LOCKED lets several sweeps run at once without sharing rows
+    result = await db.execute(
+        select(Comment.id, Comment.lesson_id, Comment.body, Comment.is_deleted, Module.course_id)
+        .join(Lesson, Comment.lesson_id == Lesson.id)
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Comment.moderation_label.is_(None))
+        .order_by(Comment.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True, of=Comment)
+    )
+    rows = result.all()
+    if not rows:
+        return 0, []
+
+    verdicts = await classifier.classify([row.body for row in rows])
+    for row, verdict in zip(rows, verdicts, strict=True):
+        if verdict.label != ModerationLabel.ALLOW:
+            logger.warning(
+                "Comment %s labelled %s: %s", row.id, verdict.label.value, ", ".join(verdict.reasons)
+            )
+
+    labels = values(
+        column("id", Integer), column("label", String), column("blocked", Boolean), name="labels"
+    ).data([
+        (row.id, verdict.label.name, verdict.label == ModerationLabel.BLOCK)
+        for row, verdict in zip(rows, verdicts, strict=True)
+    ])
+    await db.execute(
+        update(Comment)
+        .where(Comment.id == labels.c.id)
+        .values(
+            moderation_label=cast(labels.c.label, Comment.moderation_label.type),
+            is_deleted=Comment.is_deleted | labels.c.blocked,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # Comments their author already deleted were uncounted back then
+    return len(rows), [
+        (row.id, row.lesson_id, row.course_id)
+        for row, verdict in zip(rows, verdicts, strict=True)
+        if verdict.label == ModerationLabel.BLOCK and not row.is_deleted
+    ]
+
+
+async def moderate_pending(
+    db: AsyncSession,
+    classifier: Optional[ModerationClassifier] = None,
+    batch_size: int = settings.MODERATION_BATCH_SIZE
+) -> int:
+    """
+    Drain the unmoderated backlog batch by batch, retracting blocked comments
+    from live lessons. Returns the number of comments moderated.
+    """
+    classifier = classifier or create_classifier()
+    broker = create_broker()
+    moderated = 0
+    try:
+        while True:
+            claimed, blocked = await moderate_batch(db, classifier, batch_size)
+            await db.commit()
+            for course_id, count in Counter(course_id for _, _, course_id in blocked).items():
+                await record_comment_delta(db, course_id, -count)
+            for comment_id, lesson_id, _ in blocked:
+                await broker.publish(
+                    str(lesson_id),
+                    WSMessage(type="comment_removed", data={"id": comment_id}).model_dump_json(),
+                )
+            moderated += claimed
+            if claimed < batch_size:
+                return moderated
+    finally:
+        await broker.close()
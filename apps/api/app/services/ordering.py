@@ -0,0 +1,172 @@
+from typing import List, Optional, Type
+
+from sqlalchemy import Integer, column, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Lesson, Module
+
+# Siblings are spaced ORDER_GAP apart so a move only rewrites the moved row:
+# its new key is the midpoint between its new neighbours. When a gap is used
+# up the parent is renumbered in one statement (uq_*_order are deferrable).
+ORDER_GAP = 1024
+# Below this gap a background rebalance is scheduled before moves run dry
+REBALANCE_THRESHOLD = 8
+
+Orderable = Type[Module] | Type[Lesson]
+
+
+class OrderingError(ValueError):
+    pass
+
+
+def _parent_column(model: Orderable):
+    return model.course_id if model is Module else model.module_id
+
+
+def spaced_keys(order_indexes: List[int]) -> List[int]:
+    """
+    ORDER_GAP-spaced keys for items given in any order, ranked by their
+    client-side order_index and returned in input order
+    """
+    ranked = sorted(range(len(order_indexes)), key=order_indexes.__getitem__)
+    keys = [0] * len(order_indexes)
+    for position, item in enumerate(ranked):
+        keys[item] = (position + 1) * ORDER_GAP
+    return keys
+
+
+async def append_key(db: AsyncSession, model: Orderable, parent_id: int) -> int:
+    """
+    Order key that places a new item after all of its current siblings
+    """
+    parent = _parent_column(model)
+    last = await db.scalar(select(func.max(model.order_index)).where(parent == parent_id))
+    return (last if last is not None else 0) + ORDER_GAP
+
+
+async def rebalance(db: AsyncSession, model: Orderable, parent_id: int) -> None:
+    """
+    Respace all siblings ORDER_GAP apart, keeping their current order
+    """
+    parent = _parent_column(model)
+    ranked = (
+        select(
+            model.id,
+            (func.row_number().over(order_by=(model.order_index, model.id)) * ORDER_GAP)
+            .label("key"),
+        )
+        .where(parent == parent_id)
+        .subquery()
+    )
+    await db.execute(
+        update(model)
+        .where(model.id == ranked.c.id)
+        .values(order_index=ranked.c.key)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _neighbour_keys(
+    db: AsyncSession,
+    model: Orderable,
+    parent_id: int,
+    item_id: int,
+    after_id: Optional[int]
+) -> tuple:
+    parent = _parent_column(model)
+    prev_key = None
+    if after_id is not None:
+        prev_key = await db.scalar(
+            select(model.order_index).where(model.id == after_id, parent == parent_id)
+        )
+        if prev_key is None:
+            raise OrderingError("after_id is not a sibling of this item")
+
+    next_query = select(func.min(model.order_index)).where(parent == parent_id, model.id != item_id)
+    if prev_key is not None:
+        next_query = next_query.where(model.order_index > prev_key)
+    next_key = await db.scalar(next_query)
+    return prev_key, next_key
+
+
+def _midpoint(prev_key: Optional[int], next_key: Optional[int], current: int) -> Optional[int]:
+    if prev_key is None and next_key is None:
+        return current
+    if next_key is None:
+        return prev_key + ORDER_GAP
+    low = prev_key if prev_key is not None else -1
+    if next_key - low < 2:
+        return None
+    return (low + next_key) // 2
+
+
+async def move_item(
+    db: AsyncSession,
+    model: Orderable,
+    item_id: int,
+    after_id: Optional[int]
+) -> tuple:
+    """
+    Place an item directly after `after_id` (or first when None), rewriting
+    only that row. Returns (new order_index, needs_rebalance). Caller commits.
+    """
+    if item_id == after_id:
+        raise OrderingError("Cannot move an item after itself")
+
+    parent = _parent_column(model)
+    row = (await db.execute(
+        select(parent, model.order_index).where(model.id == item_id)
+    )).one_or_none()
+    if row is None:
+        raise LookupError(item_id)
+    parent_id, current = row
+
+    prev_key, next_key = await _neighbour_keys(db, model, parent_id, item_id, after_id)
+    key = _midpoint(prev_key, next_key, current)
+    if key is None:
+        # Gap exhausted: respace siblings, then the midpoint is guaranteed to exist
+        await rebalance(db, model, parent_id)
+        prev_key, next_key = await _neighbour_keys(db, model, parent_id, item_id, after_id)
+        key = _midpoint(prev_key, next_key, current)
+
+    await db.execute(
+        update(model)
+        .where(model.id == item_id)
+        .values(order_index=key)
+        .execution_options(synchronize_session=False)
+    )
+
+    gaps = [key - k for k in (prev_key,) if k is not None]
+    gaps += [k - key for k in (next_key,) if k is not None]
+    return key, bool(gaps) and min(gaps) < REBALANCE_THRESHOLD
+
+
+async def apply_order(
+    db: AsyncSession,
+    model: Orderable,
+    parent_id: int,
+    ids: List[int]
+) -> None:
+    """
+    Apply a complete sibling ordering with a single UPDATE ... FROM (VALUES ...).
+    Caller commits.
+    """
+    if len(set(ids)) != len(ids):
+        raise OrderingError("Duplicate ids in ordering")
+
+    # Checked up front: a stray id would otherwise surface as a key collision
+    parent = _parent_column(model)
+    siblings = set(await db.scalars(select(model.id).where(parent == parent_id)))
+    if siblings != set(ids):
+        raise OrderingError("Ordering must list every item exactly once")
+
+    ordering = values(
+        column("id", Integer), column("key", Integer), name="ordering"
+    ).data([(item_id, (position + 1) * ORDER_GAP) for position, item_id in enumerate(ids)])
+
+    await db.execute(
+        update(model)
+        .where(model.id == ordering.c.id, parent == parent_id)
+        .values(order_index=ordering.c.key)
+        .execution_options(synchronize_session=False)
+    )
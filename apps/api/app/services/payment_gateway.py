@@ -0,0 +1,297 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import orjson
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Worth retrying: the provider is overloaded or briefly unreachable
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class ProviderError(Exception):
+    """
+    A provider call failed; status_code is None when no response came back
+    """
+
+    def __init__(self, provider: str, message: str, status_code: Optional[int] = None, body: Any = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status_code = status_code
+        self.body = body
+
+
+class ProviderUnavailable(ProviderError):
+    """
+    The circuit is open, so the call was not attempted
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after `threshold` consecutive failures. Once
+    `reset_timeout` has passed a single probe call is let through: success
+    closes the circuit, failure keeps it open for another timeout.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open":
+            # Re-arm the timeout so only this probe goes through; a probe that
+            # never reports back just delays the next one
+            self._opened_at = time.monotonic()
+        return state != "open"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            if self._opened_at is None:
+                logger.warning("Circuit opened after %s consecutive failures", self.failures)
+            self._opened_at = time.monotonic()
+
+
+class ProviderClient:
+    """
+    One long-lived, pooled HTTP client for a payment provider, so checkouts
+    reuse warm (TLS, HTTP/2) connections instead of handshaking per call.
+    Create it at startup with start() and close it with stop().
+
+    Idempotent calls are retried with jittered exponential backoff on
+    transport errors and 429/5xx responses. Other calls are only retried
+    when the request provably never reached the provider (connect failures).
+    Failures feed a circuit breaker that fails fast while the provider is down.
+    """
+
+    name = "provider"
+
+    def __init__(
+        self,
+        base_url: str,
+        http2: bool = settings.PROVIDER_HTTP2,
+        max_retries: int = settings.PROVIDER_MAX_RETRIES,
+        backoff: float = settings.PROVIDER_RETRY_BACKOFF,
+        backoff_max: float = settings.PROVIDER_RETRY_BACKOFF_MAX,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.base_url = base_url
+        self.http2 = http2
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(
+            settings.PROVIDER_BREAKER_THRESHOLD, settings.PROVIDER_BREAKER_RESET
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {}
+
+    def start(self) -> None:
+        """
+        Open the connection pool; call from the app lifespan
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                timeout=httpx.Timeout(
+                    settings.PROVIDER_READ_TIMEOUT,
+                    connect=settings.PROVIDER_CONNECT_TIMEOUT,
+                    pool=settings.PROVIDER_POOL_TIMEOUT,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.PROVIDER_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.PROVIDER_KEEPALIVE_EXPIRY,
+                ),
+                **self._client_options(),
+            )
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # Full jitter keeps retrying callers from stampeding in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        idempotent: Optional[bool] = None
+    ) -> Any:
+        """
+        Call the provider and return the decoded JSON body. Raises
+        ProviderError for error responses and exhausted retries, and
+        ProviderUnavailable while the circuit is open.
+        """
+        if self._client is None:
+            raise RuntimeError(f"{self.name} client is not started")
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        content = orjson.dumps(json) if json is not None else None
+        headers = {**(headers or {}), **({"Content-Type": "application/json"} if content else {})}
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise ProviderUnavailable(self.name, "circuit open")
+            response: Optional[httpx.Response] = None
+            try:
+                response = await self._client.request(method, path, content=content, headers=headers)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Nothing was sent, so even a non-idempotent call is safe to repeat
+                error, retryable = e, True
+            except httpx.TransportError as e:
+                error, retryable = e, idempotent
+            else:
+                if response.status_code < 500 and response.status_code != 429:
+                    self.breaker.record_success()
+                    if response.is_success:
+                        return response.json() if response.content else None
+                    raise ProviderError(self.name, f"HTTP {response.status_code}",
+                                        response.status_code, _body(response))
+                error = ProviderError(self.name, f"HTTP {response.status_code}",
+                                      response.status_code, _body(response))
+                retryable = idempotent and response.status_code in RETRYABLE_STATUSES
+
+            self.breaker.record_failure()
+            if not retryable or attempt >= self.max_retries:
+                if isinstance(error, ProviderError):
+                    raise error
+                raise ProviderError(self.name, repr(error)) from error
+            delay = self._delay(attempt, response)
+            attempt += 1
+            logger.info("%s %s %s failed (%r), retry %s in %.2fs", self.name, method, path, error, attempt, delay)
+            await asyncio.sleep(delay)
+
+
+def _body(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+class RazorpayGateway(ProviderClient):
+    """
+    Razorpay REST API (amounts in paise), authenticated with the key pair
+    """
+
+    name = "razorpay"
+
+    def __init__(self, base_url: str = settings.RAZORPAY_API_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {"auth": (settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)}
+
+    async def create_order(self, amount_paise: int, receipt: str, notes: Optional[Dict[str, str]] = None) -> dict:
+        return await self.request("POST", "/orders", json={
+            "amount": amount_paise,
+            "currency": "INR",
+            "receipt": receipt,
+            "notes": notes or {},
+        })
+
+    async def fetch_order(self, provider_order_id: str) -> dict:
+        return await self.request("GET", f"/orders/{provider_order_id}")
+
+    async def fetch_payment(self, provider_payment_id: str) -> dict:
+        return await self.request("GET", f"/payments/{provider_payment_id}")
+
+    async def refund(self, provider_payment_id: str, amount_paise: Optional[int] = None, receipt: Optional[str] = None) -> dict:
+        body: Dict[str, Any] = {"speed": "normal"}
+        if amount_paise is not None:
+            body["amount"] = amount_paise
+        if receipt:
+            body["receipt"] = receipt
+        return await self.request("POST", f"/payments/{provider_payment_id}/refund", json=body)
+
+
+class PhonePeGateway(ProviderClient):
+    """
+    PhonePe PG API. Requests carry a base64 payload and an X-VERIFY
+    checksum: sha256(payload + path + salt key) + "###" + salt index.
+    """
+
+    name = "phonepe"
+
+    def __init__(self, base_url: str = settings.PHONEPE_API_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    @staticmethod
+    def _checksum(data: str) -> str:
+        digest = hashlib.sha256((data + settings.PHONEPE_SALT_KEY).encode()).hexdigest()
+        return f"{digest}###{settings.PHONEPE_SALT_INDEX}"
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        encoded = base64.b64encode(orjson.dumps(payload)).decode()
+        return await self.request("POST", path, json={"request": encoded}, headers={
+            "X-VERIFY": self._checksum(encoded + path),
+        })
+
+    async def create_payment(self, transaction_id: str, amount_paise: int, user_id: int, redirect_url: str) -> dict:
+        return await self._post("/pg/v1/pay", {
+            "merchantId": settings.PHONEPE_MERCHANT_ID,
+            "merchantTransactionId": transaction_id,
+            "merchantUserId": str(user_id),
+            "amount": amount_paise,
+            "redirectUrl": redirect_url,
+            "redirectMode": "POST",
+            "paymentInstrument": {"type": "PAY_PAGE"},
+        })
+
+    async def payment_status(self, transaction_id: str) -> dict:
+        path = f"/pg/v1/status/{settings.PHONEPE_MERCHANT_ID}/{transaction_id}"
+        return await self.request("GET", path, headers={
+            "X-VERIFY": self._checksum(path),
+            "X-MERCHANT-ID": settings.PHONEPE_MERCHANT_ID,
+        })
+
+    async def refund(self, transaction_id: str, original_transaction_id: str, amount_paise: int) -> dict:
+        return await self._post("/pg/v1/refund", {
+            "merchantId": settings.PHONEPE_MERCHANT_ID,
+            "merchantTransactionId": transaction_id,
+            "originalTransactionId": original_transaction_id,
+            "amount": amount_paise,
+        })
+
+
+razorpay = RazorpayGateway()
+phonepe = PhonePeGateway()
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.schemas import LessonPresence, WSMessage
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = lesson viewers hash (worker -> "count:expires_ms"),
+# KEYS[2] = lesson typing zset (user id scored by expiry)
+# ARGV = worker, local count, now ms, viewer ttl ms, typing ttl ms, typing user ids...
+# Records this worker's heartbeat and returns {total viewers, typing user ids}
+_HEARTBEAT_SCRIPT = """
+local now = tonumber(ARGV[3])
+if tonumber(ARGV[2]) > 0 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. ':' .. (now + tonumber(ARGV[4])))
+    redis.call('PEXPIRE', KEYS[1], ARGV[4])
+else
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+local viewers = 0
+local fields = redis.call('HGETALL', KEYS[1])
+for i = 1, #fields, 2 do
+    local count, expires = string.match(fields[i + 1], '^(%d+):(%d+)$')
+    if tonumber(expires) > now then
+        viewers = viewers + tonumber(count)
+    else
+        redis.call('HDEL', KEYS[1], fields[i])
+    end
+end
+if #ARGV > 5 then
+    for i = 6, #ARGV do
+        redis.call('ZADD', KEYS[2], now + tonumber(ARGV[5]), ARGV[i])
+    end
+    redis.call('PEXPIRE', KEYS[2], ARGV[5])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+return {viewers, redis.call('ZRANGE', KEYS[2], 0, -1)}
+"""
+
+
+def _viewers_key(lesson_id: str) -> str:
+    return f"{{lesson:{lesson_id}}}:viewers"
+
+
+def _typing_key(lesson_id: str) -> str:
+    return f"{{lesson:{lesson_id}}}:typing"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class PresenceTracker:
+    """
+    Live viewer counts and typing indicators per lesson, across workers.
+
+    Joins, leaves and typing events only touch this worker's memory. Every
+    `interval` seconds each worker heartbeats its per-lesson socket counts to
+    Redis, reads back the totals and pushes a "presence" snapshot to its own
+    sockets when it changed. Heartbeats expire after `ttl`, so the viewers of
+    a crashed worker drop out without cleanup.
+    """
+
+    def __init__(
+        self,
+        local_counts: Callable[[], Dict[str, int]],
+        deliver: Callable[[str, str], Awaitable[None]],
+        interval: float = settings.COMMENTS_PRESENCE_INTERVAL,
+        ttl: int = settings.COMMENTS_PRESENCE_TTL,
+        typing_ttl: int = settings.COMMENTS_TYPING_TTL,
+        redis_factory: Callable = get_redis
+    ):
+        self.interval = interval
+        self.ttl = ttl
+        self.typing_ttl = typing_ttl
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._local_counts = local_counts
+        self._deliver = deliver
+        self._redis_factory = redis_factory
+        self._typing: Dict[str, Set[int]] = {}
+        # Lessons this worker has a heartbeat for, so it can withdraw it
+        self._reported: Set[str] = set()
+        self._last: Dict[str, LessonPresence] = {}
+        self._script = None
+        self._task: Optional[asyncio.Task] = None
+
+    def typing(self, lesson_id: str, user_id: int) -> None:
+        """
+        Note that a user is typing; shared with everyone on the next tick
+        """
+        self._typing.setdefault(lesson_id, set()).add(user_id)
+
+    def last(self, lesson_id: str) -> Optional[LessonPresence]:
+        """
+        Most recent snapshot pushed for a lesson, for sockets that just joined
+        """
+        return self._last.get(lesson_id)
+
+    async def _heartbeat(self, counts: Dict[str, int], typing: Dict[str, Set[int]]) -> List[LessonPresence]:
+        lessons = list(set(counts) | self._reported)
+        now = _now_ms()
+        redis = self._redis_factory()
+        if self._script is None:
+            self._script = redis.register_script(_HEARTBEAT_SCRIPT)
+        async with redis.pipeline(transaction=False) as pipe:
+            for lesson_id in lessons:
+                await self._script(
+                    keys=[_viewers_key(lesson_id), _typing_key(lesson_id)],
+                    args=[
+                        self.worker, counts.get(lesson_id, 0), now,
+                        self.ttl * 1000, self.typing_ttl * 1000,
+                        *typing.get(lesson_id, ()),
+                    ],
+                    client=pipe,
+                )
+            results = await pipe.execute()
+        self._reported = set(counts)
+
+        return [
+            LessonPresence(
+                lesson_id=int(lesson_id),
+                viewers=viewers,
+                typing=sorted(int(user_id) for user_id in typing_ids),
+            )
+            for lesson_id, (viewers, typing_ids) in zip(lessons, results, strict=True)
+            if lesson_id in counts
+        ]
+
+    async def tick(self) -> None:
+        """
+        Heartbeat once and push changed snapshots to this worker's sockets
+        """
+        counts = self._local_counts()
+        if not counts and not self._reported:
+            return
+        typing, self._typing = self._typing, {}
+        try:
+            snapshots = await self._heartbeat(counts, typing)
+        except RedisError:
+            # Degrade to what this worker can see on its own
+            logger.warning("Presence heartbeat failed, using local counts", exc_info=True)
+            snapshots = [
+                LessonPresence(
+                    lesson_id=int(lesson_id),
+                    viewers=count,
+                    typing=sorted(typing.get(lesson_id, ())),
+                )
+                for lesson_id, count in counts.items()
+            ]
+
+        for lesson_id in list(self._last):
+            if lesson_id not in counts:
+                del self._last[lesson_id]
+        for presence in snapshots:
+            lesson_id = str(presence.lesson_id)
+            if presence == self._last.get(lesson_id):
+                continue
+            self._last[lesson_id] = presence
+            await self._deliver(
+                lesson_id,
+                WSMessage(type="presence", data=presence.model_dump()).model_dump_json(),
+            )
+
+    async def snapshot(self, lesson_id: str) -> LessonPresence:
+        """
+        Current presence for a lesson, read without heartbeating
+        """
+        now = _now_ms()
+        try:
+            async with self._redis_factory().pipeline(transaction=False) as pipe:
+                pipe.hvals(_viewers_key(lesson_id))
+                pipe.zrangebyscore(_typing_key(lesson_id), now, "+inf")
+                values, typing = await pipe.execute()
+        except RedisError:
+            logger.warning("Could not read lesson %s presence", lesson_id, exc_info=True)
+            return LessonPresence(
+                lesson_id=int(lesson_id),
+                viewers=self._local_counts().get(lesson_id, 0),
+            )
+
+        viewers = 0
+        for value in values:
+            count, _, expires = value.decode().partition(":")
+            if int(expires) > now:
+                viewers += int(count)
+        return LessonPresence(
+            lesson_id=int(lesson_id),
+            viewers=viewers,
+            typing=sorted(int(user_id) for user_id in typing),
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Presence tick failed")
+
+    def start(self) -> None:
+        """
+        Start this worker's heartbeat loop; call from the app lifespan
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Withdraw our viewers now rather than waiting for the heartbeat to expire
+        if self._reported:
+            try:
+                async with self._redis_factory().pipeline(transaction=False) as pipe:
+                    for lesson_id in self._reported:
+                        pipe.hdel(_viewers_key(lesson_id), self.worker)
+                    await pipe.execute()
+            except RedisError:
+                logger.warning("Could not withdraw presence heartbeats", exc_info=True)
+            self._reported.clear()
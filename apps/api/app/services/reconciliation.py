@@ -0,0 +1,207 @@
+import csv
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+from itertools import islice
+from typing import Iterator, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Payment, PaymentStatus
+from app.schemas import ReconciliationSummary
+
+
+class MismatchKind(str, Enum):
+    # Settled by the provider, but no such payment here
+    UNKNOWN_PAYMENT = "unknown_payment"
+    AMOUNT_MISMATCH = "amount_mismatch"
+    # Settled, but not captured (or refunded) here
+    STATUS_MISMATCH = "status_mismatch"
+    DUPLICATE_SETTLEMENT = "duplicate_settlement"
+    INVALID_ROW = "invalid_row"
+    # Captured here within the window, but missing from the export
+    NOT_SETTLED = "not_settled"
+
+
+REPORT_COLUMNS = [
+    "kind", "line", "provider_payment_id", "settled_amount_paise",
+    "payment_id", "payment_amount_inr", "payment_status",
+]
+
+SETTLED_STATUSES = (PaymentStatus.CAPTURED, PaymentStatus.REFUNDED)
+
+
+class SettlementRow(NamedTuple):
+    line: int
+    entity_id: str
+    entity_type: str
+    # None when the amount could not be parsed
+    amount_paise: Optional[int]
+
+
+def _paise(amount) -> Optional[int]:
+    # Exports carry rupees with two decimals ("499.00"); compare in paise
+    try:
+        paise = Decimal(str(amount).strip()) * 100
+    except (InvalidOperation, ValueError):
+        return None
+    return int(paise) if paise == paise.to_integral_value() else None
+
+
+def read_settlement(path: str) -> Iterator[SettlementRow]:
+    """
+    Stream a settlement export row by row: CSV with a header row, or JSON
+    Lines (.jsonl / .ndjson) with one object per line. Rows need entity_id,
+    type and amount (in rupees), as in Razorpay's settlement recon report.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            records = ((line, json.loads(raw)) for line, raw in enumerate(f, 1) if raw.strip())
+        else:
+            records = enumerate(csv.DictReader(f), 2)
+        for line, record in records:
+            yield SettlementRow(
+                line=line,
+                entity_id=str(record.get("entity_id") or "").strip(),
+                entity_type=str(record.get("type") or "payment").strip().lower(),
+                amount_paise=_paise(record.get("amount")),
+            )
+
+
+# Settled ids seen so far; lives in the reconciliation transaction only
+_CREATE_STAGING = text(
+    "CREATE TEMP TABLE settled_payments (provider_payment_id varchar(255) PRIMARY KEY) ON COMMIT DROP"
+)
+
+# One round trip per chunk: the whole chunk goes over as three arrays, is
+# joined to payments through idx_payment_provider_id, and only rows that do
+# not reconcile come back. Ids staged by an earlier chunk are duplicates.
+_MATCH_CHUNK = text("""
+    WITH chunk AS (
+        SELECT *
+        FROM unnest(CAST(:lines AS integer[]), CAST(:ids AS varchar[]), CAST(:amounts AS bigint[]))
+            AS c(line, provider_payment_id, amount_paise)
+    ),
+    staged AS (
+        INSERT INTO settled_payments (provider_payment_id)
+        SELECT provider_payment_id FROM chunk
+        ON CONFLICT DO NOTHING
+        RETURNING provider_payment_id
+    )
+    SELECT
+        c.line, c.provider_payment_id, c.amount_paise,
+        p.id AS payment_id, p.amount_inr, p.status,
+        s.provider_payment_id IS NULL AS seen_before
+    FROM chunk c
+    LEFT JOIN payments p ON p.provider_payment_id = c.provider_payment_id
+    LEFT JOIN staged s ON s.provider_payment_id = c.provider_payment_id
+    WHERE s.provider_payment_id IS NULL
+       OR p.id IS NULL
+       OR p.amount_inr * 100 <> c.amount_paise
+       OR p.status NOT IN ('CAPTURED', 'REFUNDED')
+    ORDER BY c.line
+""").columns(status=Payment.__table__.c.status.type)
+
+_NOT_SETTLED = text("""
+    SELECT p.id, p.provider_payment_id, p.amount_inr, p.status
+    FROM payments p
+    WHERE p.status = 'CAPTURED'
+      AND p.created_at >= :since AND p.created_at < :until
+      AND NOT EXISTS (
+          SELECT 1 FROM settled_payments s WHERE s.provider_payment_id = p.provider_payment_id
+      )
+    ORDER BY p.id
+""").columns(status=Payment.__table__.c.status.type)
+
+
+async def reconcile_settlement(
+    db: AsyncSession,
+    path: str,
+    report_path: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = settings.RECONCILIATION_CHUNK_SIZE
+) -> ReconciliationSummary:
+    """
+    Match a settlement export against payments chunk by chunk and write
+    every discrepancy to a CSV report (default: next to the export). Memory
+    stays flat whatever the export size. With since/until, captured
+    payments in that window that were never settled are reported too.
+    Runs in its own transaction and changes nothing.
+    """
+    started = time.perf_counter()
+    report_path = report_path or f"{path}.mismatches.csv"
+    summary = ReconciliationSummary(report_path=report_path)
+    counts: Counter = Counter()
+
+    await db.execute(_CREATE_STAGING)
+    with open(report_path, "w", newline="", encoding="utf-8") as out:
+        report = csv.writer(out)
+        report.writerow(REPORT_COLUMNS)
+
+        def flag(kind: MismatchKind, line="", provider_payment_id="", settled="", payment_id="",
+                 amount="", status: Optional[PaymentStatus] = None) -> None:
+            counts[kind.value] += 1
+            report.writerow([
+                kind.value, line, provider_payment_id, settled, payment_id, amount,
+                status.value if status else "",
+            ])
+
+        rows = read_settlement(path)
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            summary.rows_read += len(batch)
+
+            chunk = []
+            in_chunk = set()
+            for row in batch:
+                if row.entity_type != "payment":
+                    summary.rows_skipped += 1
+                elif not row.entity_id or row.amount_paise is None:
+                    flag(MismatchKind.INVALID_ROW, row.line, row.entity_id)
+                elif row.entity_id in in_chunk:
+                    flag(MismatchKind.DUPLICATE_SETTLEMENT, row.line, row.entity_id, row.amount_paise)
+                else:
+                    in_chunk.add(row.entity_id)
+                    chunk.append(row)
+            if not chunk:
+                continue
+
+            result = await db.execute(_MATCH_CHUNK, {
+                "lines": [row.line for row in chunk],
+                "ids": [row.entity_id for row in chunk],
+                "amounts": [row.amount_paise for row in chunk],
+            })
+            unmatched = 0
+            for m in result:
+                unmatched += 1
+                settled = (m.line, m.provider_payment_id, m.amount_paise)
+                if m.seen_before:
+                    flag(MismatchKind.DUPLICATE_SETTLEMENT, *settled)
+                elif m.payment_id is None:
+                    flag(MismatchKind.UNKNOWN_PAYMENT, *settled)
+                else:
+                    found = (m.payment_id, m.amount_inr, m.status)
+                    if m.amount_inr * 100 != m.amount_paise:
+                        flag(MismatchKind.AMOUNT_MISMATCH, *settled, *found)
+                    if m.status not in SETTLED_STATUSES:
+                        flag(MismatchKind.STATUS_MISMATCH, *settled, *found)
+            summary.matched += len(chunk) - unmatched
+
+        if since is not None and until is not None:
+            result = await db.stream(_NOT_SETTLED, {"since": since, "until": until})
+            async for p in result:
+                flag(MismatchKind.NOT_SETTLED, "", p.provider_payment_id, "", p.id, p.amount_inr, p.status)
+
+    # Nothing to keep: this also drops the staging table
+    await db.rollback()
+    summary.mismatches = dict(counts)
+    summary.elapsed_sec = round(time.perf_counter() - started, 3)
+    return summary
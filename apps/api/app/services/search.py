@@ -0,0 +1,111 @@
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import Select, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import Course
+from app.schemas import CourseSearchResult
+
+SEARCH_CONFIG = "english"
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+
+def _published(filters: Sequence) -> Select:
+    return (
+        select(Course)
+        .options(selectinload(Course.owner), selectinload(Course.stats))
+        .where(Course.is_published.is_(True), *filters)
+    )
+
+
+def _headline(query) -> object:
+    document = func.concat_ws(" ", Course.summary, Course.description)
+    return func.ts_headline(SEARCH_CONFIG, document, query, HEADLINE_OPTIONS)
+
+
+async def _full_text(
+    db: AsyncSession,
+    q: str,
+    offset: int,
+    limit: int,
+    filters: Sequence
+) -> Tuple[List[CourseSearchResult], int]:
+    """
+    Ranked tsvector match served by idx_course_search
+    """
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    matches = _published(filters).where(Course.search_vector.op("@@")(query))
+
+    total = await db.scalar(
+        select(func.count()).select_from(matches.with_only_columns(Course.id).subquery())
+    )
+    if not total:
+        return [], 0
+
+    rank = func.ts_rank_cd(Course.search_vector, query)
+    result = await db.execute(
+        matches.add_columns(rank.label("rank"), _headline(query).label("headline"))
+        .order_by(literal_column("rank").desc(), Course.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    items = [
+        CourseSearchResult.model_validate(course).model_copy(
+            update={"rank": float(score), "headline": headline}
+        )
+        for course, score, headline in result.all()
+    ]
+    return items, total
+
+
+async def _trigram(
+    db: AsyncSession,
+    q: str,
+    offset: int,
+    limit: int,
+    filters: Sequence
+) -> Tuple[List[CourseSearchResult], int]:
+    """
+    Typo-tolerant title match served by idx_course_title_trgm
+    """
+    matches = _published(filters).where(Course.title.op("%")(q))
+
+    total = await db.scalar(
+        select(func.count()).select_from(matches.with_only_columns(Course.id).subquery())
+    )
+    if not total:
+        return [], 0
+
+    similarity = func.similarity(Course.title, q)
+    result = await db.execute(
+        matches.add_columns(similarity.label("rank"))
+        .order_by(literal_column("rank").desc(), Course.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    items = [
+        CourseSearchResult.model_validate(course).model_copy(
+            update={"rank": float(score), "headline": course.summary[:200]}
+        )
+        for course, score in result.all()
+    ]
+    return items, total
+
+
+async def search_courses(
+    db: AsyncSession,
+    q: str,
+    page: int,
+    page_size: int,
+    filters: Sequence = ()
+) -> Tuple[List[CourseSearchResult], int]:
+    """
+    Search published courses, falling back to trigram similarity when
+    full-text search finds nothing (typos, partial words)
+    """
+    offset = (page - 1) * page_size
+    items, total = await _full_text(db, q, offset, page_size, filters)
+    if total == 0:
+        items, total = await _trigram(db, q, offset, page_size, filters)
+    return items, total
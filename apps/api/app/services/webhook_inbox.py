@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import logging
+from datetime import UTC, datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models import (
+    Enrollment,
+    EnrollmentStatus,
+    Order,
+    OrderStatus,
+    Payment,
+    PaymentProvider,
+    PaymentStatus,
+    WebhookEvent,
+    WebhookEventStatus,
+)
+from app.schemas import RazorpayWebhookEvent
+from app.services.course_cache import course_cache
+
+logger = logging.getLogger(__name__)
+
+# Later states win; an out-of-order "authorized" never undoes a capture
+_PAYMENT_RANK = {
+    PaymentStatus.PENDING: 0,
+    PaymentStatus.AUTHORIZED: 1,
+    PaymentStatus.FAILED: 2,
+    PaymentStatus.CAPTURED: 3,
+    PaymentStatus.REFUNDED: 4,
+}
+
+
+def _entity(payload: dict, name: str) -> dict:
+    return (payload.get(name) or {}).get("entity") or {}
+
+
+def razorpay_references(event: RazorpayWebhookEvent) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (provider_order_id, provider_payment_id) an event refers to, if any
+    """
+    payment = _entity(event.payload, "payment")
+    order = _entity(event.payload, "order")
+    refund = _entity(event.payload, "refund")
+    return (
+        payment.get("order_id") or order.get("id"),
+        payment.get("id") or refund.get("payment_id"),
+    )
+
+
+async def record_razorpay_event(db: AsyncSession, body: bytes, event_id: Optional[str]) -> bool:
+    """
+    Store a verified webhook in the inbox; returns False for a redelivery.
+    Raises ValueError for a malformed body. Caller commits.
+    """
+    raw = orjson.loads(body)
+    event = RazorpayWebhookEvent.model_validate(raw)
+    order_id, payment_id = razorpay_references(event)
+    result = await db.execute(
+        insert(WebhookEvent)
+        .values(
+            provider=PaymentProvider.RAZORPAY,
+            # Razorpay sends X-Razorpay-Event-Id; fall back to the body itself
+            event_id=event_id or hashlib.sha256(body).hexdigest(),
+            event_type=event.event,
+            provider_order_id=order_id,
+            provider_payment_id=payment_id,
+            payload=raw,
+        )
+        .on_conflict_do_nothing()
+        .returning(WebhookEvent.id)
+    )
+    return result.scalar() is not None
+
+
+def _claim_query(batch_size: int):
+    # Only the oldest pending event of each order is claimable, so two workers
+    # can never apply one order's events concurrently or out of order; events
+    # without an order have no predecessor and are always claimable
+    earlier = aliased(WebhookEvent)
+    has_earlier_pending = exists().where(
+        earlier.provider_order_id == WebhookEvent.provider_order_id,
+        earlier.status == WebhookEventStatus.RECEIVED,
+        earlier.id < WebhookEvent.id,
+    )
+    return (
+        select(WebhookEvent)
+        .where(
+            WebhookEvent.status == WebhookEventStatus.RECEIVED,
+            WebhookEvent.next_attempt_at <= func.now(),
+            ~has_earlier_pending,
+        )
+        .order_by(WebhookEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def _record_payment(
+    db: AsyncSession,
+    order: Order,
+    payments: Dict[str, Payment],
+    entity: dict,
+    status: PaymentStatus
+) -> Payment:
+    payment = payments.get(entity["id"])
+    if payment is None:
+        payment = Payment(
+            order_id=order.id,
+            provider_payment_id=entity["id"],
+            status=status,
+            amount_inr=entity["amount"] // 100,
+            method=entity.get("method"),
+            meta_json=entity,
+        )
+        db.add(payment)
+        payments[payment.provider_payment_id] = payment
+    elif _PAYMENT_RANK[status] > _PAYMENT_RANK[payment.status]:
+        payment.status = status
+        payment.meta_json = entity
+    return payment
+
+
+async def _activate_enrollment(db: AsyncSession, order: Order) -> None:
+    stmt = insert(Enrollment).values(
+        user_id=order.user_id,
+        course_id=order.course_id,
+        status=EnrollmentStatus.ACTIVE,
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        constraint="uq_user_course_enrollment",
+        set_={"status": stmt.excluded.status},
+    ))
+
+
+async def _payment_authorized(db: AsyncSession, event: WebhookEvent, order: Order, payments: Dict[str, Payment]) -> None:
+    _record_payment(db, order, payments, _entity(event.payload["payload"], "payment"), PaymentStatus.AUTHORIZED)
+    if order.status in (OrderStatus.CREATED, OrderStatus.PENDING):
+        order.status = OrderStatus.PROCESSING
+
+
+async def _payment_captured(db: AsyncSession, event: WebhookEvent, order: Order, payments: Dict[str, Payment]) -> None:
+    entity = _entity(event.payload["payload"], "payment")
+    if entity:
+        _record_payment(db, order, payments, entity, PaymentStatus.CAPTURED)
+    if order.status != OrderStatus.REFUNDED:
+        order.status = OrderStatus.COMPLETED
+        await _activate_enrollment(db, order)
+
+
+async def _payment_failed(db: AsyncSession, event: WebhookEvent, order: Order, payments: Dict[str, Payment]) -> None:
+    _record_payment(db, order, payments, _entity(event.payload["payload"], "payment"), PaymentStatus.FAILED)
+    # The buyer may retry with another payment on the same order
+    if order.status not in (OrderStatus.COMPLETED, OrderStatus.REFUNDED):
+        order.status = OrderStatus.FAILED
+
+
+async def _refund_processed(db: AsyncSession, event: WebhookEvent, order: Order, payments: Dict[str, Payment]) -> None:
+    refund = _entity(event.payload["payload"], "refund")
+    if refund.get("amount", 0) < order.amount_inr * 100:
+        logger.info("Partial refund %s on order %s left the order active", refund.get("id"), order.id)
+        return
+    payment = payments.get(refund.get("payment_id"))
+    if payment is not None:
+        payment.status = PaymentStatus.REFUNDED
+    order.status = OrderStatus.REFUNDED
+    await db.execute(
+        update(Enrollment)
+        .where(Enrollment.user_id == order.user_id, Enrollment.course_id == order.course_id)
+        .values(status=EnrollmentStatus.REFUNDED)
+    )
+
+
+EventHandler = Callable[[AsyncSession, WebhookEvent, Order, Dict[str, Payment]], Awaitable[None]]
+
+_HANDLERS: Dict[str, EventHandler] = {
+    "payment.authorized": _payment_authorized,
+    "payment.captured": _payment_captured,
+    "order.paid": _payment_captured,
+    "payment.failed": _payment_failed,
+    "refund.processed": _refund_processed,
+}
+
+# Events whose handlers can change a course's enrollment count
+_ENROLLMENT_EVENTS = {"payment.captured", "order.paid", "refund.processed"}
+
+
+async def process_batch(db: AsyncSession, batch_size: int = settings.WEBHOOK_BATCH_SIZE) -> int:
+    """
+    Claim and apply one batch of inbox events, each in its own savepoint so
+    a bad event only fails itself. Returns the number of events claimed.
+    """
+    events = (await db.scalars(_claim_query(batch_size))).all()
+    if not events:
+        return 0
+
+    # One query each for the batch's orders and payments. Every order appears
+    # at most once per batch (see _claim_query), so a rolled-back savepoint
+    # never leaves a later event looking at its half-applied changes.
+    order_ids = {event.provider_order_id for event in events if event.provider_order_id}
+    payment_ids = {event.provider_payment_id for event in events if event.provider_payment_id}
+    orders = {
+        order.provider_order_id: order
+        for order in await db.scalars(select(Order).where(Order.provider_order_id.in_(order_ids)))
+    } if order_ids else {}
+    payments = {
+        payment.provider_payment_id: payment
+        for payment in await db.scalars(
+            select(Payment).where(Payment.provider_payment_id.in_(payment_ids))
+        )
+    } if payment_ids else {}
+
+    now = datetime.now(UTC)
+    enrollment_courses = set()
+    for event in events:
+        handler = _HANDLERS.get(event.event_type)
+        if handler is None:
+            event.status = WebhookEventStatus.IGNORED
+            event.processed_at = now
+            continue
+        try:
+            order = orders.get(event.provider_order_id)
+            if order is None:
+                raise LookupError(f"Unknown order {event.provider_order_id}")
+            async with db.begin_nested():
+                await handler(db, event, order, payments)
+        except Exception as e:
+            event.attempts += 1
+            event.last_error = repr(e)[:1000]
+            if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                # Stop holding back the rest of this order's events
+                event.status = WebhookEventStatus.FAILED
+                logger.error("Webhook event %s failed after %s attempts: %r", event.id, event.attempts, e)
+            else:
+                event.next_attempt_at = now + timedelta(seconds=2 ** event.attempts)
+                logger.warning("Webhook event %s failed, retrying: %r", event.id, e)
+            continue
+        event.status = WebhookEventStatus.PROCESSED
+        event.processed_at = now
+        if event.event_type in _ENROLLMENT_EVENTS:
+            enrollment_courses.add(order.course_id)
+
+    await db.commit()
+    # Enrollment counts are part of cached course payloads and catalog cards
+    await course_cache.invalidate_many(enrollment_courses, catalog=True)
+    return len(events)
+
+
+async def drain_inbox(
+    workers: int = settings.WEBHOOK_WORKERS,
+    batch_size: int = settings.WEBHOOK_BATCH_SIZE
+) -> int:
+    """
+    Run `workers` concurrent batch loops until nothing is claimable.
+    Returns the number of events handled.
+    """
+    async def worker() -> int:
+        handled = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                claimed = await process_batch(db, batch_size)
+                if not claimed:
+                    return handled
+                handled += claimed
+
+    return sum(await asyncio.gather(*(worker() for _ in range(workers))))
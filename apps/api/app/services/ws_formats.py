@@ -0,0 +1,57 @@
+from enum import Enum
+from typing import Iterable, List, NamedTuple, Optional
+
+import msgpack
+import orjson
+
+# Broadcasts travel between workers as JSON text; each process re-encodes them
+# once per wire format in use and shares the result across its sockets.
+# permessage-deflate is negotiated by the server itself (uvicorn enables it by
+# default) and applies on top of either format.
+
+
+class WireFormat(str, Enum):
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+
+class Protocol(NamedTuple):
+    subprotocol: Optional[str]
+    batched: bool
+    format: WireFormat
+
+
+# Offered by the client as WebSocket subprotocols; v2 coalesces broadcasts
+# into one array frame per tick, the .msgpack suffix switches to binary frames
+PROTOCOLS = {
+    "comments.v2.msgpack": Protocol("comments.v2.msgpack", True, WireFormat.MSGPACK),
+    "comments.v2": Protocol("comments.v2", True, WireFormat.JSON),
+    "comments.v1.msgpack": Protocol("comments.v1.msgpack", False, WireFormat.MSGPACK),
+    "comments.v1": Protocol("comments.v1", False, WireFormat.JSON),
+}
+DEFAULT_PROTOCOL = Protocol(None, False, WireFormat.JSON)
+
+Frame = str | bytes
+
+
+def negotiate(offered: Iterable[str]) -> Protocol:
+    """
+    First protocol the client offered that we speak, in the client's order
+    """
+    for subprotocol in offered:
+        if subprotocol in PROTOCOLS:
+            return PROTOCOLS[subprotocol]
+    return DEFAULT_PROTOCOL
+
+
+def encode(messages: List[str], format: WireFormat, batched: bool) -> Frame:
+    """
+    Encode JSON messages as one frame: a single message, or an array if batched
+    """
+    if format == WireFormat.MSGPACK:
+        if batched:
+            return msgpack.packb([orjson.loads(message) for message in messages])
+        return msgpack.packb(orjson.loads(messages[0]))
+    if batched:
+        return "[" + ",".join(messages) + "]"
+    return messages[0]
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from collections import deque
+from enum import Enum
+from typing import Callable, Coroutine, Deque, List, Optional, Set
+
+from fastapi import WebSocket, status
+
+from app.services.ws_formats import Frame, WireFormat
+
+logger = logging.getLogger(__name__)
+
+# The event loop only keeps weak references to tasks; fire-and-forget ones
+# live here until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _spawn(coroutine: Coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+class SlowConsumerPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+
+
+class SendQueueMetrics:
+    """
+    Process-wide counters shared by every queued connection
+    """
+
+    def __init__(self):
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.send_failures = 0
+
+
+class QueuedConnection:
+    """
+    A WebSocket with a bounded outgoing queue drained by its own writer task.
+
+    Broadcasting only appends to the queue, so a slow client delays nobody but
+    itself; once its queue is full the slow-consumer policy either discards its
+    oldest pending message or disconnects it.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_size: int,
+        policy: SlowConsumerPolicy,
+        metrics: SendQueueMetrics,
+        on_close: Callable[["QueuedConnection"], None],
+        batched: bool = False,
+        format: WireFormat = WireFormat.JSON
+    ):
+        self.websocket = websocket
+        # Negotiated the batching protocol: receives one array frame per tick
+        self.batched = batched
+        self.format = format
+        self.max_size = max_size
+        self.policy = policy
+        self.metrics = metrics
+        self._on_close = on_close
+        self._queue: Deque[Frame] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self.closed = False
+        # While a reconnect is being replayed, the manager parks live
+        # (still unencoded) messages here
+        self.held: Optional[List[str]] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write())
+
+    def enqueue(self, message: Frame) -> bool:
+        """
+        Queue a message without waiting; returns False if it was not accepted
+        """
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_size:
+            if self.policy == SlowConsumerPolicy.DISCONNECT:
+                self.metrics.evicted += 1
+                self._evict()
+                return False
+            self._queue.popleft()
+            self.metrics.dropped += 1
+        self._queue.append(message)
+        self.metrics.enqueued += 1
+        self._ready.set()
+        return True
+
+    async def _write(self) -> None:
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                message = self._queue.popleft()
+                try:
+                    if isinstance(message, bytes):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+                except Exception:
+                    logger.debug("WebSocket send failed, closing connection", exc_info=True)
+                    self.metrics.send_failures += 1
+                    self._shutdown()
+                    return
+                self.metrics.sent += 1
+            self._ready.clear()
+
+    def _shutdown(self, notify: bool = True) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.metrics.dropped += len(self._queue)
+        self._queue.clear()
+        if notify:
+            self._on_close(self)
+
+    def _evict(self) -> None:
+        self._shutdown()
+        if self._writer is not None:
+            self._writer.cancel()
+        _spawn(self._close_socket(status.WS_1013_TRY_AGAIN_LATER))
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        """
+        Stop the writer after the client went away; pending messages are dropped
+        """
+        self._shutdown(notify=False)
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,42 @@
+from celery import Celery
+
+from app.core.config import settings
+
+celery_app = Celery(
+    "byteboost",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["app.workers.tasks"],
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    result_serializer="json",
+    timezone="UTC",
+    enable_utc=True,
+    task_ignore_result=True,
+)
+
+celery_app.conf.beat_schedule = {
+    "flush-course-comment-counts": {
+        "task": "app.workers.tasks.flush_course_stats",
+        "schedule": float(settings.COURSE_STATS_FLUSH_INTERVAL),
+    },
+    "process-webhook-inbox": {
+        "task": "app.workers.tasks.process_webhook_inbox",
+        "schedule": float(settings.WEBHOOK_POLL_INTERVAL),
+    },
+    "moderate-comments": {
+        "task": "app.workers.tasks.moderate_comments",
+        "schedule": float(settings.MODERATION_INTERVAL),
+    },
+    "repair-course-stats": {
+        "task": "app.workers.tasks.repair_course_stats",
+        "schedule": 24 * 60 * 60.0,
+    },
+    "rebuild-facet-counts": {
+        "task": "app.workers.tasks.rebuild_facet_counts",
+        "schedule": 24 * 60 * 60.0,
+    },
+}
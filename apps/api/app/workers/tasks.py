@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import close_redis
+from app.db.database import AsyncSessionLocal, engine
+from app.models import Lesson, Module
+from app.services import course_stats, facets, moderation, ordering, reconciliation, webhook_inbox
+from app.services.course_cache import course_cache
+from app.workers.celery_app import celery_app
+
+T = TypeVar("T")
+
+
+def run_with_session(fn: Callable[[AsyncSession], Awaitable[T]]) -> T:
+    """
+    Run an async service function from a (sync) Celery task.
+
+    Each task gets its own event loop, so pooled connections are disposed
+    afterwards instead of leaking across loops.
+    """
+    async def runner() -> T:
+        try:
+            async with AsyncSessionLocal() as db:
+                return await fn(db)
+        finally:
+            await close_redis()
+            await engine.dispose()
+
+    return asyncio.run(runner())
+
+
+@celery_app.task(name="app.workers.tasks.flush_course_stats")
+def flush_course_stats() -> int:
+    """
+    Apply Redis-buffered comment counts to course_stats
+    """
+    return run_with_session(course_stats.flush_comment_deltas)
+
+
+@celery_app.task(name="app.workers.tasks.repair_course_stats")
+def repair_course_stats(course_id: Optional[int] = None) -> None:
+    """
+    Recompute course_stats from the source tables
+    """
+    run_with_session(lambda db: course_stats.repair_course_stats(db, course_id))
+
+
+@celery_app.task(name="app.workers.tasks.rebuild_facet_counts")
+def rebuild_facet_counts() -> None:
+    """
+    Recompute the catalog facet counts from published courses
+    """
+    async def rebuild(db: AsyncSession) -> None:
+        await facets.rebuild_facet_counts(db)
+        await db.commit()
+        # The facets ETag follows the catalog version
+        await course_cache.invalidate_many([], catalog=True)
+
+    run_with_session(rebuild)
+
+
+@celery_app.task(name="app.workers.tasks.rebalance_order")
+def rebalance_order(kind: str, parent_id: int) -> None:
+    """
+    Respace module (kind="modules", parent=course) or lesson (kind="lessons",
+    parent=module) order keys once moves have used up most of a gap
+    """
+    model = Module if kind == "modules" else Lesson
+
+    async def rebalance(db: AsyncSession) -> None:
+        await ordering.rebalance(db, model, parent_id)
+        await db.commit()
+
+    run_with_session(rebalance)
+
+
+@celery_app.task(name="app.workers.tasks.moderate_comments")
+def moderate_comments() -> int:
+    """
+    Classify comments the prefilter let through and retract blocked ones
+    """
+    return run_with_session(moderation.moderate_pending)
+
+
+@celery_app.task(name="app.workers.tasks.process_webhook_inbox")
+def process_webhook_inbox() -> int:
+    """
+    Apply stored provider webhooks to orders, payments and enrollments
+    """
+    async def drain(_: AsyncSession) -> int:
+        # The inbox workers open their own sessions
+        return await webhook_inbox.drain_inbox()
+
+    return run_with_session(drain)
+
+
+@celery_app.task(name="app.workers.tasks.reconcile_settlement")
+def reconcile_settlement(path: str, since: Optional[str] = None, until: Optional[str] = None) -> dict:
+    """
+    Match a provider settlement export against payments and write a
+    mismatch report next to it; since/until are ISO timestamps
+    """
+    async def reconcile(db: AsyncSession) -> dict:
+        summary = await reconciliation.reconcile_settlement(
+            db,
+            path,
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None,
+        )
+        return summary.model_dump()
+
+    return run_with_session(reconcile)
@@ -0,0 +1,125 @@
+"""
+Benchmark comment ingestion: one commit per comment vs the write-behind path.
+
+Posts COMMENTS comments to one lesson with CONCURRENCY concurrent writers,
+first as individual INSERT + COMMIT transactions, then through
+comment_writer.submit() followed by the stream flusher, and reports
+comments/sec for each until every row is durable in Postgres.
+Requires DATABASE_URL and REDIS_URL.
+
+    python -m benchmarks.bench_comment_writes --comments 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import func, select
+
+from app.core.redis import close_redis, get_redis
+from app.db.database import AsyncSessionLocal, engine
+from app.models import Base, Comment, Course, Lesson, Module, User, UserRole
+from app.schemas import CommentWSCreate
+from app.services.comment_writer import FLUSH_GROUP, STREAM_KEY, comment_writer
+
+
+async def seed() -> tuple:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.email == "bench@byteboost.com"))
+        if user is None:
+            user = User(email="bench@byteboost.com", name="Bench", role=UserRole.INSTRUCTOR)
+            db.add(user)
+            await db.flush()
+        suffix = uuid.uuid4().hex[:8]
+        course = Course(
+            title="Comment bench", slug=f"comment-bench-{suffix}", summary="bench",
+            price_inr=0, owner_id=user.id,
+        )
+        db.add(course)
+        await db.flush()
+        module = Module(course_id=course.id, title="Module", order_index=0)
+        db.add(module)
+        await db.flush()
+        lesson = Lesson(module_id=module.id, title="Lesson", order_index=0)
+        db.add(lesson)
+        await db.commit()
+        return user.id, lesson.id
+
+
+async def run_concurrently(total: int, concurrency: int, fn) -> None:
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker() -> None:
+        while not queue.empty():
+            await fn(queue.get_nowait())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def commit_per_comment(user_id: int, lesson_id: int, total: int, concurrency: int) -> float:
+    async def write(i: int) -> None:
+        async with AsyncSessionLocal() as db:
+            db.add(Comment(user_id=user_id, lesson_id=lesson_id, body=f"sync comment {i}"))
+            await db.commit()
+
+    started = time.perf_counter()
+    await run_concurrently(total, concurrency, write)
+    return time.perf_counter() - started
+
+
+async def write_behind(user_id: int, lesson_id: int, total: int, concurrency: int) -> tuple:
+    run = uuid.uuid4().hex
+
+    async def submit(i: int) -> None:
+        await comment_writer.submit(lesson_id, CommentWSCreate(
+            body=f"buffered comment {i}", client_msg_id=f"{run}-{i}", user_id=user_id,
+        ))
+
+    started = time.perf_counter()
+    comment_writer.start()
+    await run_concurrently(total, concurrency, submit)
+    accepted = time.perf_counter() - started
+
+    redis = get_redis()
+    while True:
+        pending = await redis.xpending(STREAM_KEY, FLUSH_GROUP)
+        if await redis.xlen(STREAM_KEY) == 0 and pending["pending"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    durable = time.perf_counter() - started
+    await comment_writer.stop()
+    return accepted, durable
+
+
+async def count(lesson_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).where(Comment.lesson_id == lesson_id))
+
+
+async def main(total: int, concurrency: int) -> None:
+    user_id, lesson_id = await seed()
+
+    elapsed = await commit_per_comment(user_id, lesson_id, total, concurrency)
+    print(f"commit per comment: {total} in {elapsed:.2f}s = {total / elapsed:,.0f}/s")
+
+    before = await count(lesson_id)
+    accepted, durable = await write_behind(user_id, lesson_id, total, concurrency)
+    written = await count(lesson_id) - before
+    print(f"write-behind: accepted {total} in {accepted:.2f}s = {total / accepted:,.0f}/s, "
+          f"durable {written} in {durable:.2f}s = {written / durable:,.0f}/s")
+
+    await close_redis()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.comments, args.concurrency))
@@ -0,0 +1,186 @@
+"""
+Benchmark payment provider calls through the shared gateway client.
+
+Starts benchmarks.mock_provider over TLS (self-signed) with LATENCY_MS of
+provider time, then makes CALLS Razorpay order creations at CONCURRENCY
+with a new httpx client per call (a TLS handshake each time) and with the
+long-lived pooled RazorpayGateway, and reports calls/sec and latency
+percentiles. It then repeats idempotent fetches against a mock failing
+FAIL_RATE of requests, with and without retries, and finally stops the
+mock to show the circuit breaker failing calls fast. Needs no external
+services.
+
+    python -m benchmarks.bench_gateway --calls 2000 --concurrency 64 --latency-ms 20
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from app.services.payment_gateway import (
+    CircuitBreaker,
+    ProviderError,
+    ProviderUnavailable,
+    RazorpayGateway,
+)
+
+
+def _ms(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+def self_signed(directory: str) -> tuple:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.UTC)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return certfile, keyfile
+
+
+def start_mock(port: int, latency_ms: float, fail_rate: float, certfile: str, keyfile: str) -> subprocess.Popen:
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.mock_provider", "--port", str(port),
+        "--latency-ms", str(latency_ms), "--fail-rate", str(fail_rate),
+        "--ssl-certfile", certfile, "--ssl-keyfile", keyfile,
+    ])
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("mock provider did not start")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BenchGateway(RazorpayGateway):
+    def __init__(self, base_url: str, verify: ssl.SSLContext, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.verify = verify
+
+    def _client_options(self) -> dict:
+        return {**super()._client_options(), "verify": self.verify}
+
+
+async def run(name: str, call, calls: int, concurrency: int) -> None:
+    remaining = iter(range(calls))
+    latencies, errors = [], 0
+
+    async def caller() -> None:
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            try:
+                await call(i)
+            except ProviderError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{name:<30}{calls / elapsed:>10,.0f}/s{_ms(latencies, 0.5):>10.1f}ms{_ms(latencies, 0.99):>10.1f}ms"
+          f"{errors:>8}")
+
+
+async def main(calls: int, concurrency: int, latency_ms: float, fail_rate: float, http2: bool) -> None:
+    certfile, keyfile = self_signed(tempfile.mkdtemp(prefix="mock-provider-"))
+    verify = ssl.create_default_context(cafile=certfile)
+    port = free_port()
+    base_url = f"https://127.0.0.1:{port}/v1"
+    mock = start_mock(port, latency_ms, 0.0, certfile, keyfile)
+    print(f"{'client':<30}{'throughput':>12}{'p50':>12}{'p99':>12}{'errors':>8}")
+    try:
+        async def per_call(i: int) -> None:
+            async with httpx.AsyncClient(base_url=base_url, verify=verify) as client:
+                response = await client.post("/orders", json={"amount": 49900, "currency": "INR", "receipt": f"r{i}"})
+                response.raise_for_status()
+
+        await run("new client per call", per_call, calls, concurrency)
+
+        gateway = BenchGateway(base_url, verify, http2=http2)
+        gateway.start()
+        await run("shared gateway client", lambda i: gateway.create_order(49900, f"r{i}"), calls, concurrency)
+        await gateway.stop()
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    port = free_port()
+    base_url = f"https://127.0.0.1:{port}/v1"
+    mock = start_mock(port, latency_ms, fail_rate, certfile, keyfile)
+    print(f"\nmock failing {fail_rate:.0%} of requests")
+    # A high threshold keeps the breaker out of the retry comparison
+    retrying = BenchGateway(base_url, verify, http2=http2, breaker=CircuitBreaker(10**9, 30))
+    single = BenchGateway(base_url, verify, http2=http2, max_retries=0, breaker=CircuitBreaker(10**9, 30))
+    for gateway in (retrying, single):
+        gateway.start()
+    await run("fetch with retries", lambda i: retrying.fetch_payment(f"pay_{i}"), calls, concurrency)
+    await run("fetch without retries", lambda i: single.fetch_payment(f"pay_{i}"), calls, concurrency)
+    for gateway in (retrying, single):
+        await gateway.stop()
+
+    gateway = BenchGateway(base_url, verify, http2=http2, max_retries=0)
+    gateway.start()
+    mock.terminate()
+    mock.wait()
+    rejected = 0
+    started = time.perf_counter()
+    for i in range(calls):
+        try:
+            await gateway.fetch_payment(f"pay_{i}")
+        except ProviderUnavailable:
+            rejected += 1
+        except ProviderError:
+            pass
+    elapsed = time.perf_counter() - started
+    print(f"\nprovider down: {calls} calls in {elapsed * 1000:.0f}ms, {rejected} failed fast "
+          f"by the open circuit ({gateway.breaker.state})")
+    await gateway.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--no-http2", action="store_true", help="the mock only speaks HTTP/1.1 either way")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency, args.latency_ms, args.fail_rate, not args.no_http2))
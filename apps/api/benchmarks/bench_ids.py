@@ -0,0 +1,132 @@
+"""
+Benchmark receipt number generation under checkout contention.
+
+Runs CONCURRENCY concurrent checkouts drawing ids from WORKERS in-process
+IdGenerators, reports ids/sec, and checks that no two ids collide and that
+each caller sees them increase. With --database it also inserts CHECKOUTS orders at CONCURRENCY,
+comparing a single insert carrying a generated receipt against the
+"insert a placeholder, read back the id, update the receipt" pattern it
+replaces. --database requires DATABASE_URL.
+
+    python -m benchmarks.bench_ids --ids 1000000 --concurrency 64
+    python -m benchmarks.bench_ids --database --checkouts 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import insert, select, update
+
+from app.db.database import AsyncSessionLocal, engine
+from app.models import Base, Course, Order, OrderStatus, PaymentProvider, User, UserRole
+from app.services.ids import SEQUENCE_BITS, WORKER_BITS, IdGenerator
+
+PRICE_INR = 499
+
+
+def _ms(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+async def generate(ids: int, concurrency: int, workers: int) -> None:
+    generators = [IdGenerator(worker_id=i) for i in range(workers)]
+    per_caller = ids // concurrency
+    issued = [[] for _ in range(concurrency)]
+
+    async def checkout(n: int) -> None:
+        generator = generators[n % workers]
+        out = issued[n]
+        for i in range(per_caller):
+            out.append(generator.next_id())
+            # Let the other checkouts interleave, as they would between requests
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(checkout(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    total = per_caller * concurrency
+    print(f"in-process: {total:,} ids from {workers} generators, {concurrency} concurrent callers, "
+          f"{elapsed:.2f}s = {total / elapsed:,.0f}/s ({elapsed / total * 1e9:.0f}ns per id)")
+
+    all_ids = [i for out in issued for i in out]
+    workers_seen = {i >> SEQUENCE_BITS & ((1 << WORKER_BITS) - 1) for i in all_ids}
+    print(f"unique: {len(set(all_ids)) == len(all_ids)}, increasing per caller: "
+          f"{all(out == sorted(out) for out in issued)}, worker ids seen: {len(workers_seen)}")
+
+
+async def seed() -> tuple:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    run = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        owner = await db.scalar(select(User).where(User.email == "bench@byteboost.com"))
+        if owner is None:
+            owner = User(email="bench@byteboost.com", name="Bench", role=UserRole.INSTRUCTOR)
+            db.add(owner)
+            await db.flush()
+        course = Course(
+            title="Checkout bench", slug=f"checkout-bench-{run}", summary="bench",
+            price_inr=PRICE_INR, owner_id=owner.id, is_published=True,
+        )
+        db.add(course)
+        await db.commit()
+        return owner.id, course.id
+
+
+async def checkouts(name: str, checkout, count: int, concurrency: int) -> None:
+    remaining = iter(range(count))
+    latencies = []
+
+    async def worker() -> None:
+        async with AsyncSessionLocal() as db:
+            for _ in remaining:
+                started = time.perf_counter()
+                await checkout(db)
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{name:<34}{count / elapsed:>10,.0f}/s{_ms(latencies, 0.5):>10.2f}ms{_ms(latencies, 0.99):>10.2f}ms")
+
+
+async def database(count: int, concurrency: int) -> None:
+    user_id, course_id = await seed()
+    generator = IdGenerator(worker_id=0)
+    values = {
+        "user_id": user_id, "course_id": course_id, "provider": PaymentProvider.RAZORPAY,
+        "amount_inr": PRICE_INR, "status": OrderStatus.CREATED,
+    }
+
+    async def generated(db) -> None:
+        await db.execute(insert(Order).values(**values, receipt_number=generator.receipt()))
+        await db.commit()
+
+    async def read_back(db) -> None:
+        # Placeholder receipt, then derive the real one from the new id
+        order_id = await db.scalar(
+            insert(Order).values(**values, receipt_number=f"tmp_{uuid.uuid4().hex}").returning(Order.id)
+        )
+        await db.execute(update(Order).where(Order.id == order_id).values(receipt_number=f"rcpt_{order_id}"))
+        await db.commit()
+
+    print(f"{'checkout':<34}{'throughput':>12}{'p50':>12}{'p99':>12}")
+    await checkouts("generated receipt, one insert", generated, count, concurrency)
+    await checkouts("insert, read back id, update", read_back, count, concurrency)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ids", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4, help="generators (distinct worker ids)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--database", action="store_true")
+    parser.add_argument("--checkouts", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(generate(args.ids, args.concurrency, args.workers))
+    if args.database:
+        asyncio.run(database(args.checkouts, args.concurrency))
@@ -0,0 +1,75 @@
+"""
+Benchmark bulk course import.
+
+Builds a course with MODULES x LESSONS lessons (default 100 x 100 = 10k) and
+times services.course_import.import_course in a single transaction against the
+database configured by DATABASE_URL.
+
+    python -m benchmarks.bench_import --modules 100 --lessons 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import select
+
+from app.db.database import AsyncSessionLocal, engine
+from app.models import Base, User, UserRole
+from app.schemas import CourseImport
+from app.services.course_import import import_course
+
+
+def build_tree(owner_id: int, modules: int, lessons: int) -> CourseImport:
+    return CourseImport.model_validate({
+        "title": "Bulk import benchmark",
+        "slug": f"bench-import-{uuid.uuid4().hex[:12]}",
+        "summary": "Generated course",
+        "price_inr": 0,
+        "owner_id": owner_id,
+        "modules": [
+            {
+                "title": f"Module {m}",
+                "order_index": m,
+                "lessons": [
+                    {"title": f"Lesson {m}.{n}", "order_index": n, "duration_sec": 600}
+                    for n in range(lessons)
+                ],
+            }
+            for m in range(modules)
+        ],
+    })
+
+
+async def main(modules: int, lessons: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        owner = await db.scalar(select(User).where(User.email == "bench@byteboost.com"))
+        if owner is None:
+            owner = User(email="bench@byteboost.com", name="Bench", role=UserRole.INSTRUCTOR)
+            db.add(owner)
+            await db.commit()
+
+        started = time.perf_counter()
+        tree = build_tree(owner.id, modules, lessons)
+        validated = time.perf_counter()
+        result = await import_course(db, tree)
+        await db.commit()
+        finished = time.perf_counter()
+
+    total = sum(len(m.lesson_ids) for m in result.modules)
+    print(
+        f"course={result.course_id} modules={len(result.modules)} lessons={total} "
+        f"validate={validated - started:.3f}s insert+commit={finished - validated:.3f}s"
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", type=int, default=100)
+    parser.add_argument("--lessons", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.modules, args.lessons))
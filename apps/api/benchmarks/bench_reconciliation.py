@@ -0,0 +1,141 @@
+"""
+Benchmark settlement reconciliation.
+
+Seeds PAYMENTS captured payments server-side, writes a settlement CSV for
+them with a small share of each mismatch kind injected (missing, unknown,
+wrong amount, duplicated) plus refund rows that are skipped, then
+reconciles it and reports rows/sec, the mismatch counts against what was
+injected, and peak RSS before and after. Requires DATABASE_URL.
+
+    python -m benchmarks.bench_reconciliation --payments 1000000 --chunk-size 5000
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select, text
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, engine
+from app.models import Base, Course, Order, OrderStatus, PaymentProvider, User, UserRole
+from app.services.reconciliation import MismatchKind, reconcile_settlement
+
+PRICE_INR = 499
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(payments: int) -> str:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    run = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        owner = await db.scalar(select(User).where(User.email == "bench@byteboost.com"))
+        if owner is None:
+            owner = User(email="bench@byteboost.com", name="Bench", role=UserRole.INSTRUCTOR)
+            db.add(owner)
+            await db.flush()
+        course = Course(
+            title="Reconciliation bench", slug=f"reconciliation-bench-{run}", summary="bench",
+            price_inr=PRICE_INR, owner_id=owner.id,
+        )
+        db.add(course)
+        await db.flush()
+        # Payments only need some order to hang off; one is enough
+        order = Order(
+            user_id=owner.id, course_id=course.id, provider=PaymentProvider.RAZORPAY,
+            amount_inr=PRICE_INR, status=OrderStatus.COMPLETED,
+            provider_order_id=f"order_{run}", receipt_number=f"rcpt_{run}",
+        )
+        db.add(order)
+        await db.flush()
+        await db.execute(
+            text("""
+                INSERT INTO payments (order_id, provider_payment_id, status, amount_inr)
+                SELECT :order_id, CAST(:prefix AS text) || g, 'CAPTURED', :amount
+                FROM generate_series(1, :n) AS g
+            """),
+            {"order_id": order.id, "prefix": f"pay_{run}_", "amount": PRICE_INR, "n": payments},
+        )
+        await db.commit()
+    return f"pay_{run}_"
+
+
+def write_settlement(path: str, prefix: str, payments: int, share: float, rng: random.Random) -> Counter:
+    injected = Counter()
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["entity_id", "type", "amount", "fee", "tax", "settlement_id", "settled_at"])
+
+        def row(entity_id: str, amount_inr: float, kind: str = "payment") -> None:
+            writer.writerow([entity_id, kind, f"{amount_inr:.2f}", "9.98", "1.80", "setl_bench", "1700000000"])
+
+        for i in range(1, payments + 1):
+            entity_id = f"{prefix}{i}"
+            roll = rng.random()
+            if roll < share:
+                injected[MismatchKind.NOT_SETTLED.value] += 1
+                continue
+            if roll < 2 * share:
+                injected[MismatchKind.AMOUNT_MISMATCH.value] += 1
+                row(entity_id, PRICE_INR - 1)
+            else:
+                row(entity_id, PRICE_INR)
+            if rng.random() < share:
+                injected[MismatchKind.DUPLICATE_SETTLEMENT.value] += 1
+                row(entity_id, PRICE_INR)
+            if rng.random() < share:
+                injected[MismatchKind.UNKNOWN_PAYMENT.value] += 1
+                row(f"pay_unknown_{uuid.uuid4().hex[:12]}", PRICE_INR)
+            if rng.random() < 10 * share:
+                row(f"rfnd_{i}", PRICE_INR, kind="refund")
+    return injected
+
+
+async def main(payments: int, chunk_size: int, share: float) -> None:
+    since = datetime.now(UTC)
+    started = time.perf_counter()
+    prefix = await seed(payments)
+    until = datetime.now(UTC) + timedelta(seconds=1)
+    print(f"seeded {payments:,} payments in {time.perf_counter() - started:.1f}s")
+
+    path = os.path.join(tempfile.mkdtemp(prefix="settlement-"), "settlement.csv")
+    started = time.perf_counter()
+    injected = write_settlement(path, prefix, payments, share, random.Random(42))
+    print(f"wrote {path} ({os.path.getsize(path) / 2**20:.0f} MiB) in {time.perf_counter() - started:.1f}s")
+
+    rss_before = _peak_rss_mb()
+    async with AsyncSessionLocal() as db:
+        summary = await reconcile_settlement(db, path, since=since, until=until, chunk_size=chunk_size)
+    rss_after = _peak_rss_mb()
+
+    print(f"reconciled {summary.rows_read:,} rows in {summary.elapsed_sec:.1f}s "
+          f"= {summary.rows_read / summary.elapsed_sec:,.0f} rows/s "
+          f"({summary.matched:,} matched, {summary.rows_skipped:,} skipped)")
+    print(f"peak RSS {rss_before:.0f} MiB before, {rss_after:.0f} MiB after")
+    print(f"{'mismatch':<24}{'found':>10}{'injected':>10}")
+    for kind in MismatchKind:
+        print(f"{kind.value:<24}{summary.mismatches.get(kind.value, 0):>10,}{injected.get(kind.value, 0):>10,}")
+    print(f"report: {summary.report_path}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payments", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=settings.RECONCILIATION_CHUNK_SIZE)
+    parser.add_argument("--share", type=float, default=0.001, help="share of each injected mismatch kind")
+    args = parser.parse_args()
+    asyncio.run(main(args.payments, args.chunk_size, args.share))
@@ -0,0 +1,115 @@
+"""
+Benchmark course search against a seeded catalog.
+
+Seeds COURSES published courses (default 100k) into the database configured by
+DATABASE_URL, then times naive ILIKE scans against the full-text/trigram search
+service for a fixed set of queries.
+
+    python -m benchmarks.bench_search --courses 100000 --rounds 20
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import func, insert, or_, select
+
+from app.db.database import AsyncSessionLocal, engine
+from app.models import Base, Course, User, UserRole
+from app.services.search import search_courses
+
+WORDS = (
+    "python javascript react fastapi django postgres redis docker kubernetes "
+    "algorithms data structures machine learning deep neural networks system "
+    "design interviews backend frontend typescript rust golang cloud aws linux "
+    "security testing devops microservices graphql sql statistics analytics"
+).split()
+
+QUERIES = ["python", "machine learning", "system design", "kubernetes docker", "pyhton", "reakt"]
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+async def seed(total: int, batch_size: int = 5000) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        existing = await db.scalar(select(func.count()).select_from(Course))
+        if existing >= total:
+            return
+
+        owner = await db.scalar(select(User).where(User.email == "bench@byteboost.com"))
+        if owner is None:
+            owner = User(email="bench@byteboost.com", name="Bench", role=UserRole.INSTRUCTOR)
+            db.add(owner)
+            await db.flush()
+
+        rng = random.Random(42)
+        for start in range(existing, total, batch_size):
+            rows = [
+                {
+                    "title": _sentence(rng, 4).title(),
+                    "slug": f"bench-course-{i}",
+                    "summary": _sentence(rng, 20),
+                    "description": _sentence(rng, 80),
+                    "price_inr": rng.randint(0, 5000),
+                    "is_published": True,
+                    "owner_id": owner.id,
+                    "tags": rng.sample(WORDS, 3),
+                }
+                for i in range(start, min(start + batch_size, total))
+            ]
+            await db.execute(insert(Course), rows)
+        await db.commit()
+
+
+async def _time(fn, rounds: int) -> dict:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2),
+    }
+
+
+async def main(total: int, rounds: int) -> None:
+    await seed(total)
+
+    async with AsyncSessionLocal() as db:
+        for q in QUERIES:
+            pattern = f"%{q}%"
+
+            async def naive(pattern=pattern):
+                await db.execute(
+                    select(Course.id)
+                    .where(Course.is_published.is_(True))
+                    .where(or_(
+                        Course.title.ilike(pattern),
+                        Course.summary.ilike(pattern),
+                        Course.description.ilike(pattern),
+                    ))
+                    .limit(20)
+                )
+
+            async def ranked(q=q):
+                await search_courses(db, q, 1, 20)
+
+            print(f"{q!r:22} ilike={await _time(naive, rounds)} search={await _time(ranked, rounds)}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--courses", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.courses, args.rounds))
@@ -0,0 +1,163 @@
+"""
+Benchmark Razorpay webhook ingestion through the inbox.
+
+Seeds ORDERS orders, then POSTs signed payment.authorized and
+payment.captured webhooks for each (plus a DUPLICATES share of
+redeliveries) to the webhook endpoint in-process over ASGI with CONCURRENCY
+concurrent senders, and reports acknowledged webhooks/sec with ack latency
+percentiles. It then drains the inbox with the worker pool and reports
+events applied/sec. Requires DATABASE_URL.
+
+    python -m benchmarks.bench_webhooks --orders 5000 --concurrency 64 --workers 4
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import time
+import uuid
+
+import httpx
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, engine
+from app.main import app
+from app.models import (
+    Base,
+    Course,
+    Enrollment,
+    EnrollmentStatus,
+    Order,
+    OrderStatus,
+    PaymentProvider,
+    User,
+    UserRole,
+)
+from app.services.webhook_inbox import drain_inbox
+
+PRICE_INR = 499
+
+
+def _ms(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+async def seed(orders: int) -> list:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    run = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        owner = await db.scalar(select(User).where(User.email == "bench@byteboost.com"))
+        if owner is None:
+            owner = User(email="bench@byteboost.com", name="Bench", role=UserRole.INSTRUCTOR)
+            db.add(owner)
+            await db.flush()
+        buyers = [
+            User(email=f"buyer-{run}-{i}@byteboost.com", name=f"Buyer {i}", role=UserRole.STUDENT)
+            for i in range(orders)
+        ]
+        course = Course(
+            title="Webhook bench", slug=f"webhook-bench-{run}", summary="bench",
+            price_inr=PRICE_INR, owner_id=owner.id,
+        )
+        db.add_all([course, *buyers])
+        await db.flush()
+        db.add_all([
+            Order(
+                user_id=buyer.id, course_id=course.id, provider=PaymentProvider.RAZORPAY,
+                amount_inr=PRICE_INR, status=OrderStatus.CREATED,
+                provider_order_id=f"order_{run}{i}", receipt_number=f"rcpt_{run}_{i}",
+            )
+            for i, buyer in enumerate(buyers)
+        ])
+        await db.commit()
+    return [f"order_{run}{i}" for i in range(orders)]
+
+
+def build_webhooks(order_ids: list, duplicates: float) -> list:
+    webhooks = []
+    for order_id in order_ids:
+        payment = {
+            "id": f"pay_{order_id[6:]}", "order_id": order_id, "amount": PRICE_INR * 100,
+            "currency": "INR", "method": "upi",
+        }
+        for event in ("payment.authorized", "payment.captured"):
+            status = event.split(".")[1]
+            body = json.dumps({
+                "entity": "event", "event": event,
+                "payload": {"payment": {"entity": {**payment, "status": status}}},
+            }).encode()
+            webhooks.append((f"evt_{order_id}_{status}", body))
+    webhooks += random.sample(webhooks, int(len(webhooks) * duplicates))
+    random.shuffle(webhooks)
+    return webhooks
+
+
+async def send_all(webhooks: list, concurrency: int) -> list:
+    secret = settings.RAZORPAY_WEBHOOK_SECRET.encode()
+    queue = asyncio.Queue()
+    for webhook in webhooks:
+        queue.put_nowait(webhook)
+    latencies = []
+
+    async def sender(client: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            event_id, body = queue.get_nowait()
+            signature = hmac.new(secret, body, hashlib.sha256).hexdigest()
+            started = time.perf_counter()
+            response = await client.post(
+                "/payments/razorpay/webhook", content=body,
+                headers={"X-Razorpay-Signature": signature, "X-Razorpay-Event-Id": event_id},
+            )
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(sender(client) for _ in range(concurrency)))
+    return sorted(latencies)
+
+
+async def main(orders: int, concurrency: int, workers: int, duplicates: float) -> None:
+    if not settings.RAZORPAY_WEBHOOK_SECRET:
+        settings.RAZORPAY_WEBHOOK_SECRET = "bench-webhook-secret"
+    order_ids = await seed(orders)
+    webhooks = build_webhooks(order_ids, duplicates)
+
+    started = time.perf_counter()
+    latencies = await send_all(webhooks, concurrency)
+    elapsed = time.perf_counter() - started
+    print(f"acked {len(webhooks)} webhooks in {elapsed:.2f}s = {len(webhooks) / elapsed:,.0f}/s  "
+          f"p50 {_ms(latencies, 0.5):.2f}ms  p99 {_ms(latencies, 0.99):.2f}ms")
+
+    started = time.perf_counter()
+    applied = await drain_inbox(workers=workers)
+    elapsed = time.perf_counter() - started
+    print(f"applied {applied} inbox events with {workers} workers in {elapsed:.2f}s "
+          f"= {applied / elapsed:,.0f}/s")
+
+    async with AsyncSessionLocal() as db:
+        completed = await db.scalar(
+            select(func.count()).where(Order.provider_order_id.in_(order_ids), Order.status == OrderStatus.COMPLETED)
+        )
+        active = await db.scalar(
+            select(func.count()).select_from(Enrollment).join(
+                Order, (Order.user_id == Enrollment.user_id) & (Order.course_id == Enrollment.course_id)
+            ).where(Order.provider_order_id.in_(order_ids), Enrollment.status == EnrollmentStatus.ACTIVE)
+        )
+    print(f"orders completed {completed}/{orders}, enrollments active {active}/{orders}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=settings.WEBHOOK_WORKERS)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of redelivered webhooks")
+    args = parser.parse_args()
+    asyncio.run(main(args.orders, args.concurrency, args.workers, args.duplicates))
@@ -0,0 +1,120 @@
+"""
+Benchmark cross-worker delivery latency of lesson broadcasts.
+
+Starts WORKERS processes (default 4), each holding SOCKETS fake sockets on one
+lesson behind its own ConnectionManager + RedisBroker, then publishes MESSAGES
+broadcasts from the parent and reports publish-to-delivery latency as seen by
+every worker. Requires the Redis server configured by REDIS_URL.
+
+    python -m benchmarks.bench_ws_fanout --workers 4 --sockets 250 --messages 2000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+
+from app.api.comments import ConnectionManager
+from app.core.redis import close_redis
+from app.services.broker import RedisBroker
+
+LESSON_ID = "bench"
+
+
+class FakeSocket:
+    scope = {"subprotocols": []}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message: str):
+        pass
+
+
+def _worker(sockets: int, messages: int, ready, results) -> None:
+    async def run() -> None:
+        manager = ConnectionManager(RedisBroker())
+        latencies = []
+        done = asyncio.Event()
+
+        async def handler(lesson_id: str, message: str) -> None:
+            await manager.send_local(lesson_id, message)
+            latencies.append(time.time() - json.loads(message)["sent_at"])
+            if len(latencies) == messages:
+                done.set()
+
+        manager.broker.set_handler(handler)
+        for _ in range(sockets):
+            await manager.connect(FakeSocket(), LESSON_ID)
+        ready.put(True)
+
+        try:
+            await asyncio.wait_for(done.wait(), timeout=120)
+        except TimeoutError:
+            pass
+        results.put(latencies)
+        await manager.close()
+        await close_redis()
+
+    asyncio.run(run())
+
+
+async def publish(messages: int, rate: int) -> float:
+    broker = RedisBroker()
+    started = time.perf_counter()
+    for i in range(messages):
+        await broker.publish(LESSON_ID, json.dumps({"seq": i, "sent_at": time.time()}))
+        if rate:
+            await asyncio.sleep(1 / rate)
+    elapsed = time.perf_counter() - started
+    await broker.close()
+    await close_redis()
+    return elapsed
+
+
+def _ms(values, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sockets", type=int, default=250, help="sockets per worker")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rate", type=int, default=500, help="messages/sec, 0 = unthrottled")
+    args = parser.parse_args()
+
+    ready, results = multiprocessing.Queue(), multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_worker, args=(args.sockets, args.messages, ready, results))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=30)
+    time.sleep(0.5)  # let SUBSCRIBE settle on every worker
+
+    elapsed = asyncio.run(publish(args.messages, args.rate))
+    per_worker = [sorted(results.get(timeout=180)) for _ in processes]
+    for process in processes:
+        process.join()
+
+    print(f"published {args.messages} messages in {elapsed:.2f}s "
+          f"to {args.workers} workers x {args.sockets} sockets")
+    for i, latencies in enumerate(per_worker):
+        if not latencies:
+            print(f"worker {i}: nothing delivered")
+            continue
+        print(f"worker {i}: delivered {len(latencies)}/{args.messages}  "
+              f"p50 {_ms(latencies, 0.5):.2f}ms  p95 {_ms(latencies, 0.95):.2f}ms  "
+              f"p99 {_ms(latencies, 0.99):.2f}ms")
+    merged = sorted(latency for latencies in per_worker for latency in latencies)
+    if merged:
+        print(f"all: mean {statistics.mean(merged) * 1000:.2f}ms  "
+              f"p99 {_ms(merged, 0.99):.2f}ms  max {merged[-1] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
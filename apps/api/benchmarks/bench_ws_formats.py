@@ -0,0 +1,95 @@
+"""
+Benchmark WebSocket comment frame encodings.
+
+Builds realistic comment broadcasts and reports, per wire format, the frame
+size (raw and after deflate, which approximates permessage-deflate) and the
+encode cost, for single messages and for BATCH-message array frames. Then
+compares encoding once per format and sharing the frame across SOCKETS
+recipients with encoding per recipient. Needs no external services.
+
+    python -m benchmarks.bench_ws_formats --batch 20 --sockets 1000
+"""
+import argparse
+import json
+import time
+import zlib
+from datetime import UTC, datetime
+
+import orjson
+
+from app.models import UserRole
+from app.schemas import CommentInDB, CommentWSMessage, UserPublic
+from app.services.broker import with_event_id
+from app.services.ws_formats import WireFormat, encode
+
+
+def build_messages(count: int) -> list:
+    now = datetime.now(UTC)
+    user = UserPublic(id=42, name="Asha Raman", picture_url="https://cdn.byteboost.com/u/42.png",
+                      role=UserRole.STUDENT)
+    return [
+        with_event_id(f"1729170000000-{i}", CommentWSMessage(data=CommentInDB(
+            id=100_000 + i, user_id=user.id, lesson_id=7, parent_id=None if i % 3 else 99_999,
+            body=f"Comment {i}: the recursion example in this lesson finally made memoization click.",
+            is_edited=False, is_deleted=False, client_msg_id=f"c-{i:08d}",
+            created_at=now, updated_at=now, user=user,
+        )).model_dump_json())
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def deflated(frame) -> int:
+    data = frame.encode() if isinstance(frame, str) else frame
+    compressor = zlib.compressobj(wbits=-15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+def main(batch: int, sockets: int, repeat: int) -> None:
+    messages = build_messages(batch)
+    objects = [json.loads(message) for message in messages]
+
+    # The broker hands each worker JSON text; these are the ways to put it on the wire
+    encoders = {
+        "json (stdlib dumps)": (lambda: json.dumps(objects[0]), lambda: json.dumps(objects)),
+        "json (orjson dumps)": (lambda: orjson.dumps(objects[0]), lambda: orjson.dumps(objects)),
+        "json (passthrough)": (
+            lambda: encode(messages[:1], WireFormat.JSON, batched=False),
+            lambda: encode(messages, WireFormat.JSON, batched=True),
+        ),
+        "msgpack": (
+            lambda: encode(messages[:1], WireFormat.MSGPACK, batched=False),
+            lambda: encode(messages, WireFormat.MSGPACK, batched=True),
+        ),
+    }
+
+    print(f"{'format':<22}{'single B':>10}{'deflate B':>11}{'us':>8}"
+          f"{f'batch({batch}) B':>16}{'deflate B':>11}{'us':>9}")
+    for name, (single, batched) in encoders.items():
+        one, many = single(), batched()
+        print(f"{name:<22}{len(one):>10}{deflated(one):>11}{timed(single, repeat):>8.2f}"
+              f"{len(many):>16}{deflated(many):>11}{timed(batched, repeat):>9.2f}")
+
+    print(f"\nbroadcast of one message to {sockets} sockets:")
+    for fmt in WireFormat:
+        shared = timed(lambda fmt=fmt: encode(messages[:1], fmt, batched=False), repeat) / 1000
+        per_recipient = timed(
+            lambda fmt=fmt: [encode(messages[:1], fmt, batched=False) for _ in range(sockets)],
+            max(1, repeat // sockets),
+        ) / 1000
+        print(f"  {fmt.value:<8} encode once {shared:8.3f}ms   per recipient {per_recipient:8.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.batch, args.sockets, args.repeat)
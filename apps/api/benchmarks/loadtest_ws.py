@@ -0,0 +1,358 @@
+"""
+Load-test the lesson comments WebSocket against a running server.
+
+Opens CLIENTS sockets spread over LESSONS lessons (at most CONNECT_RATE new
+connections/sec), then posts comments at RATE/sec for DURATION seconds,
+round-robin over the lessons, and waits DRAIN seconds for stragglers.
+Measures handshake time, post-to-delivery latency on every receiving socket,
+delivered vs expected broadcasts, and, given --server-pid, server RSS per
+connection. Everything lands in a JSON report (--report) meant to be diffed
+between releases.
+
+Needs an existing user and lessons (--user-id, --lesson-ids), or --seed to
+create them through DATABASE_URL. All clients run in this one process; check
+client_cpu_seconds in the report before blaming the server for latency.
+
+    python -m benchmarks.loadtest_ws --url ws://localhost:8000 --seed \\
+        --clients 5000 --lessons 50 --rate 200 --duration 30 --server-pid 1234
+"""
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import time
+import uuid
+from collections import Counter
+from datetime import UTC, datetime
+from typing import Dict, List, Optional
+
+import httpx
+import msgpack
+from websockets.asyncio.client import connect
+
+REPORT_VERSION = 1
+
+
+class Stats:
+    def __init__(self):
+        self.connect_times: List[float] = []
+        self.connect_failures: Counter = Counter()
+        self.latencies: List[float] = []
+        self.sent_at: Dict[str, float] = {}
+        # client_msg_id -> sockets on the lesson when it was posted
+        self.expected: Dict[str, int] = {}
+        self.delivered: Counter = Counter()
+        self.acked = 0
+        self.errors = 0
+        self.resets = 0
+        self.disconnects = 0
+
+
+def _percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+
+    return {
+        "count": len(values),
+        "p50_ms": at(0.50),
+        "p90_ms": at(0.90),
+        "p99_ms": at(0.99),
+        "p999_ms": at(0.999),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def _decode(frame) -> list:
+    message = msgpack.unpackb(frame) if isinstance(frame, bytes) else json.loads(frame)
+    return message if isinstance(message, list) else [message]
+
+
+class Client:
+    def __init__(self, url: str, lesson_id: int, protocol: Optional[str], stats: Stats, run_id: str):
+        self.url = url
+        self.lesson_id = lesson_id
+        self.protocol = protocol
+        self.stats = stats
+        self.run_id = run_id
+        self.socket = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def open(self) -> bool:
+        started = time.perf_counter()
+        try:
+            self.socket = await connect(
+                f"{self.url}/comments/ws/lesson/{self.lesson_id}",
+                subprotocols=[self.protocol] if self.protocol else None,
+                open_timeout=30,
+                max_queue=None,
+            )
+        except Exception as e:
+            self.stats.connect_failures[type(e).__name__] += 1
+            return False
+        self.stats.connect_times.append(time.perf_counter() - started)
+        self.task = asyncio.create_task(self.receive())
+        return True
+
+    async def receive(self) -> None:
+        stats = self.stats
+        try:
+            async for frame in self.socket:
+                received = time.perf_counter()
+                for message in _decode(frame):
+                    kind = message.get("type")
+                    if kind == "comment":
+                        msg_id = message["data"].get("client_msg_id") or ""
+                        if msg_id in stats.sent_at:
+                            stats.delivered[msg_id] += 1
+                            stats.latencies.append(received - stats.sent_at[msg_id])
+                    elif kind == "ack":
+                        stats.acked += 1
+                    elif kind == "error":
+                        stats.errors += 1
+                    elif kind == "reset":
+                        stats.resets += 1
+        except Exception:
+            pass
+        if self.socket.close_code != 1000:
+            stats.disconnects += 1
+
+    async def post(self, seq: int, user_id: int, sockets_on_lesson: int) -> None:
+        msg_id = f"{self.run_id}-{seq}"
+        self.stats.sent_at[msg_id] = time.perf_counter()
+        self.stats.expected[msg_id] = sockets_on_lesson
+        await self.socket.send(json.dumps({
+            "type": "comment",
+            "body": f"Load test comment {seq} on lesson {self.lesson_id}",
+            "client_msg_id": msg_id,
+            "user_id": user_id,
+        }))
+
+    async def close(self) -> None:
+        if self.socket is not None:
+            await self.socket.close()
+        if self.task is not None:
+            await self.task
+
+
+def _rss_bytes(pids: List[int]) -> Optional[int]:
+    if not pids:
+        return None
+    total = 0
+    for pid in pids:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+    return total
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(lessons: int) -> tuple:
+    from sqlalchemy import select
+
+    from app.db.database import AsyncSessionLocal, engine
+    from app.models import Base, Course, Lesson, Module, User, UserRole
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.email == "loadtest@byteboost.com"))
+        if user is None:
+            user = User(email="loadtest@byteboost.com", name="Load Test", role=UserRole.INSTRUCTOR)
+            db.add(user)
+            await db.flush()
+        course = Course(
+            title="WebSocket load test", slug=f"ws-loadtest-{uuid.uuid4().hex[:8]}",
+            summary="load test", price_inr=0, owner_id=user.id,
+        )
+        db.add(course)
+        await db.flush()
+        module = Module(course_id=course.id, title="Module", order_index=0)
+        db.add(module)
+        await db.flush()
+        rows = [Lesson(module_id=module.id, title=f"Lesson {i}", order_index=i) for i in range(lessons)]
+        db.add_all(rows)
+        await db.commit()
+        lesson_ids = [lesson.id for lesson in rows]
+    await engine.dispose()
+    return user.id, lesson_ids
+
+
+async def open_clients(args, lesson_ids: List[int], stats: Stats, run_id: str) -> List[Client]:
+    clients = [
+        Client(args.url, lesson_ids[i % len(lesson_ids)], args.protocol, stats, run_id)
+        for i in range(args.clients)
+    ]
+    interval = 1 / args.connect_rate
+    started = time.perf_counter()
+    pending = []
+    for i, client in enumerate(clients):
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pending.append(asyncio.create_task(client.open()))
+    opened = await asyncio.gather(*pending)
+    return [client for client, ok in zip(clients, opened, strict=True) if ok]
+
+
+async def post_comments(args, clients: List[Client], user_id: int, stats: Stats) -> int:
+    by_lesson: Dict[int, List[Client]] = {}
+    for client in clients:
+        by_lesson.setdefault(client.lesson_id, []).append(client)
+    lessons = list(by_lesson)
+    total = int(args.rate * args.duration)
+    started = time.perf_counter()
+    for seq in range(total):
+        delay = started + seq / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        members = by_lesson[lessons[seq % len(lessons)]]
+        poster = members[(seq // len(lessons)) % len(members)]
+        try:
+            await poster.post(seq, user_id, len(members))
+        except Exception:
+            stats.errors += 1
+    return total
+
+
+async def main(args) -> dict:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    if args.seed:
+        user_id, lesson_ids = await seed(args.lessons)
+    else:
+        user_id = args.user_id
+        lesson_ids = [int(i) for i in args.lesson_ids.split(",")][: args.lessons]
+
+    run_id = uuid.uuid4().hex[:12]
+    started_at = datetime.now(UTC).isoformat()
+    stats = Stats()
+    rss_before = _rss_bytes(args.server_pid)
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+
+    connect_started = time.perf_counter()
+    clients = await open_clients(args, lesson_ids, stats, run_id)
+    connect_elapsed = time.perf_counter() - connect_started
+    await asyncio.sleep(args.settle)
+    rss_connected = _rss_bytes(args.server_pid)
+    print(f"connected {len(clients)}/{args.clients} in {connect_elapsed:.1f}s")
+
+    posted = await post_comments(args, clients, user_id, stats) if clients else 0
+    await asyncio.sleep(args.drain)
+    rss_after = _rss_bytes(args.server_pid)
+
+    server_metrics = None
+    try:
+        http_url = args.url.replace("ws", "http", 1)
+        async with httpx.AsyncClient(timeout=5) as http:
+            server_metrics = (await http.get(f"{http_url}/comments/ws/metrics")).json()
+    except httpx.HTTPError:
+        pass
+
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    expected = sum(stats.expected.values())
+    delivered = sum(min(stats.delivered[msg_id], n) for msg_id, n in stats.expected.items())
+    report = {
+        "version": REPORT_VERSION,
+        "run_id": run_id,
+        "started_at": started_at,
+        "git_revision": _git_revision(),
+        "host": platform.node(),
+        "config": {
+            "url": args.url,
+            "clients": args.clients,
+            "lessons": len(lesson_ids),
+            "protocol": args.protocol,
+            "rate": args.rate,
+            "duration": args.duration,
+            "connect_rate": args.connect_rate,
+            "drain": args.drain,
+        },
+        "connect": {
+            "opened": len(clients),
+            "failed": dict(stats.connect_failures),
+            "elapsed_s": round(connect_elapsed, 3),
+            **_percentiles(stats.connect_times),
+        },
+        "messages": {
+            "posted": posted,
+            "acked": stats.acked,
+            "errors": stats.errors,
+            "expected_deliveries": expected,
+            "delivered": delivered,
+            "dropped": expected - delivered,
+            "drop_rate": round((expected - delivered) / expected, 6) if expected else 0.0,
+            "resets": stats.resets,
+        },
+        "fanout_latency": _percentiles(stats.latencies),
+        "disconnects": stats.disconnects,
+        "server_memory": {
+            "rss_before_bytes": rss_before,
+            "rss_connected_bytes": rss_connected,
+            "rss_after_bytes": rss_after,
+            "bytes_per_connection": (
+                round((rss_connected - rss_before) / len(clients))
+                if rss_before is not None and clients else None
+            ),
+        },
+        "server_queue_metrics": server_metrics,
+        "client_cpu_seconds": round(
+            (cpu_after.ru_utime + cpu_after.ru_stime) - (cpu_before.ru_utime + cpu_before.ru_stime), 3
+        ),
+    }
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    latency = report["fanout_latency"]
+    print(f"posted {posted}, delivered {delivered}/{expected} "
+          f"(dropped {expected - delivered}), disconnects {stats.disconnects}")
+    if latency["count"]:
+        print(f"fan-out latency p50 {latency['p50_ms']}ms  p99 {latency['p99_ms']}ms  "
+              f"max {latency['max_ms']}ms")
+    if report["server_memory"]["bytes_per_connection"] is not None:
+        print(f"server memory {report['server_memory']['bytes_per_connection']:,} bytes/connection")
+    print(f"report written to {args.report}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="ws://localhost:8000", help="server base URL")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--lessons", type=int, default=10)
+    parser.add_argument("--lesson-ids", default="", help="comma-separated existing lesson ids")
+    parser.add_argument("--user-id", type=int, default=1, help="existing user to post as")
+    parser.add_argument("--seed", action="store_true", help="create a user and LESSONS lessons first")
+    parser.add_argument("--protocol", default=None,
+                        help="subprotocol to offer, e.g. comments.v2 or comments.v1.msgpack")
+    parser.add_argument("--rate", type=float, default=100, help="comments posted per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of posting")
+    parser.add_argument("--connect-rate", type=float, default=500, help="new connections per second")
+    parser.add_argument("--settle", type=float, default=2, help="seconds between connecting and posting")
+    parser.add_argument("--drain", type=float, default=5, help="seconds to wait for late deliveries")
+    parser.add_argument("--server-pid", type=int, action="append", default=[],
+                        help="server process to sample RSS from (repeat for each worker)")
+    parser.add_argument("--report", default="ws_loadtest_report.json")
+    args = parser.parse_args()
+    if not args.seed and not args.lesson_ids:
+        parser.error("pass --lesson-ids or --seed")
+    asyncio.run(main(args))
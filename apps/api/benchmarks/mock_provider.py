@@ -0,0 +1,117 @@
+"""
+Local stand-in for the Razorpay and PhonePe APIs.
+
+Serves the endpoints the payment gateways call, under /v1 (Razorpay) and
+/apis/hermes (PhonePe), with LATENCY_MS of simulated provider time and a
+FAIL_RATE share of 503 responses. Point the gateways at it with
+
+    RAZORPAY_API_URL=http://127.0.0.1:9100/v1
+    PHONEPE_API_URL=http://127.0.0.1:9100/apis/hermes
+
+    python -m benchmarks.mock_provider --port 9100 --latency-ms 40 --fail-rate 0.02
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 0.0, fail_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Mock payment provider")
+    app.state.latency_ms = latency_ms
+    app.state.fail_rate = fail_rate
+    rng = random.Random(seed)
+    orders: dict = {}
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        if app.state.latency_ms:
+            # +-25% so latency percentiles are not a flat line
+            await asyncio.sleep(app.state.latency_ms / 1000 * rng.uniform(0.75, 1.25))
+        if rng.random() < app.state.fail_rate:
+            return JSONResponse({"error": {"code": "SERVER_ERROR"}}, status_code=503)
+        return await call_next(request)
+
+    @app.post("/v1/orders")
+    async def create_order(request: Request):
+        body = await request.json()
+        order = {
+            "id": f"order_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": body["amount"],
+            "amount_paid": 0,
+            "currency": body.get("currency", "INR"),
+            "receipt": body.get("receipt"),
+            "notes": body.get("notes") or {},
+            "status": "created",
+            "created_at": int(time.time()),
+        }
+        orders[order["id"]] = order
+        return order
+
+    @app.get("/v1/orders/{order_id}")
+    async def fetch_order(order_id: str):
+        if order_id not in orders:
+            raise HTTPException(status_code=400, detail="The id provided does not exist")
+        return orders[order_id]
+
+    @app.get("/v1/payments/{payment_id}")
+    async def fetch_payment(payment_id: str):
+        return {"id": payment_id, "entity": "payment", "amount": 49900, "currency": "INR", "status": "captured"}
+
+    @app.post("/v1/payments/{payment_id}/refund")
+    async def refund(payment_id: str, request: Request):
+        body = await request.json()
+        return {
+            "id": f"rfnd_{uuid.uuid4().hex[:14]}", "entity": "refund", "payment_id": payment_id,
+            "amount": body.get("amount", 49900), "status": "processed",
+        }
+
+    @app.post("/apis/hermes/pg/v1/pay")
+    async def phonepe_pay(request: Request):
+        payload = json.loads(base64.b64decode((await request.json())["request"]))
+        return {
+            "success": True, "code": "PAYMENT_INITIATED",
+            "data": {
+                "merchantId": payload.get("merchantId"),
+                "merchantTransactionId": payload.get("merchantTransactionId"),
+                "instrumentResponse": {"type": "PAY_PAGE", "redirectInfo": {"url": "http://mock/pay", "method": "GET"}},
+            },
+        }
+
+    @app.get("/apis/hermes/pg/v1/status/{merchant_id}/{transaction_id}")
+    async def phonepe_status(merchant_id: str, transaction_id: str):
+        return {
+            "success": True, "code": "PAYMENT_SUCCESS",
+            "data": {"merchantId": merchant_id, "merchantTransactionId": transaction_id, "state": "COMPLETED"},
+        }
+
+    @app.post("/apis/hermes/pg/v1/refund")
+    async def phonepe_refund(request: Request):
+        payload = json.loads(base64.b64decode((await request.json())["request"]))
+        return {"success": True, "code": "PAYMENT_SUCCESS", "data": {**payload, "state": "COMPLETED"}}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--ssl-certfile")
+    parser.add_argument("--ssl-keyfile")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.fail_rate),
+        host=args.host, port=args.port, log_level="warning",
+        ssl_certfile=args.ssl_certfile, ssl_keyfile=args.ssl_keyfile,
+    )
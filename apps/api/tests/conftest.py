@@ -0,0 +1,147 @@
+import os
+
+import fakeredis
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import UniqueConstraint, event
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+
+from app.core import redis as redis_client
+from app.db.database import get_db
+from app.models import Base, Course, Lesson, Module, User, UserRole
+from app.services.ordering import ORDER_GAP
+
+# Postgres when TEST_DATABASE_URL is set. Otherwise in-memory SQLite, which
+# covers everything but the Postgres-only triggers, which it skips.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite+aiosqlite://")
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@compiles(TSVECTOR, "sqlite")
+def _tsvector_on_sqlite(type_, compiler, **kw):
+    return "TEXT"
+
+
+@compiles(UniqueConstraint, "sqlite")
+def _unique_on_sqlite(constraint, compiler, **kw):
+    # SQLite only defers foreign keys; order swaps there are not under test
+    deferrable, initially = constraint.deferrable, constraint.initially
+    constraint.deferrable = constraint.initially = None
+    try:
+        return compiler.visit_unique_constraint(constraint, **kw)
+    finally:
+        constraint.deferrable, constraint.initially = deferrable, initially
+
+
+@pytest.fixture
+async def engine():
+    options = {"poolclass": StaticPool} if TEST_DATABASE_URL.startswith("sqlite") else {}
+    engine = create_async_engine(TEST_DATABASE_URL, **options)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.fixture
+def postgres(engine):
+    """
+    Skip the test unless it runs against Postgres
+    """
+    if engine.dialect.name != "postgresql":
+        pytest.skip("needs Postgres: set TEST_DATABASE_URL")
+
+
+@pytest.fixture
+async def db(engine):
+    async with async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+
+
+@pytest.fixture
+def seed_course(db):
+    """
+    seed_course(slug, modules, lessons_per_module): a course whose modules
+    and lessons are stored in reverse creation order; returns its id
+    """
+    async def seed(slug: str, modules: int, lessons_per_module: int) -> int:
+        owner = User(email=f"{slug}@byteboost.com", name="Owner", role=UserRole.INSTRUCTOR)
+        db.add(owner)
+        await db.flush()
+        course = Course(title=slug, slug=slug, summary="summary", price_inr=499, owner_id=owner.id)
+        db.add(course)
+        await db.flush()
+        for m in range(modules):
+            module = Module(course_id=course.id, title=f"Module {m}", order_index=(modules - m) * ORDER_GAP)
+            db.add(module)
+            await db.flush()
+            db.add_all([
+                Lesson(module_id=module.id, title=f"Lesson {m}.{n}", order_index=(lessons_per_module - n) * ORDER_GAP)
+                for n in range(lessons_per_module)
+            ])
+        await db.commit()
+        return course.id
+
+    return seed
+
+
+@pytest.fixture
+async def api(engine):
+    """
+    make(router, prefix): a client for a bare app serving just that router,
+    with get_db bound to the test database
+    """
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    clients = []
+
+    async def get_test_db():
+        async with sessions() as session:
+            yield session
+
+    def make(router, prefix: str = "") -> httpx.AsyncClient:
+        app = FastAPI()
+        app.include_router(router, prefix=prefix)
+        app.dependency_overrides[get_db] = get_test_db
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        await client.aclose()
+
+
+@pytest.fixture
+def statements(engine):
+    """
+    SQL statements executed on the test engine, in order
+    """
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+async def redis(monkeypatch):
+    """
+    In-memory Redis (with Lua) behind get_redis()
+    """
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(redis_client, "_client", client)
+    yield client
+    await client.aclose()
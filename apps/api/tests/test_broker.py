@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.broker import (
+    InMemoryBroker,
+    LessonBroker,
+    RedisBroker,
+    create_broker,
+    event_id_of,
+    with_event_id,
+)
+
+
+class Recorder:
+    def __init__(self):
+        self.received = []
+        self.arrived = asyncio.Event()
+
+    async def __call__(self, lesson_id: str, message: str) -> None:
+        self.received.append((lesson_id, message))
+        self.arrived.set()
+
+
+def test_broker_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LessonBroker()
+
+
+def test_event_id_stamping():
+    assert with_event_id("7", '{"a":1}') == '{"event_id":"7","a":1}'
+    assert with_event_id("7", "{}") == '{"event_id":"7"}'
+    assert json.loads(with_event_id("1-0", '{ "a": 1 }')) == {"event_id": "1-0", "a": 1}
+    assert event_id_of(with_event_id("12-3", '{"a":1}')) == "12-3"
+    assert event_id_of('{"a":1}') is None
+
+
+def test_create_broker_rejects_unknown_backend():
+    assert isinstance(create_broker("memory"), InMemoryBroker)
+    with pytest.raises(ValueError):
+        create_broker("carrier-pigeon")
+
+
+async def test_memory_broker_delivers_only_subscribed_lessons():
+    broker = InMemoryBroker()
+    recorder = Recorder()
+    broker.set_handler(recorder)
+    await broker.subscribe("1")
+
+    await broker.publish("1", '{"body":"hi"}')
+    await broker.publish("2", '{"body":"elsewhere"}')
+    await broker.unsubscribe("1")
+    await broker.publish("1", '{"body":"unheard"}')
+
+    assert recorder.received == [("1", '{"event_id":"1","body":"hi"}')]
+
+
+async def test_memory_broker_history_replays_after_position():
+    broker = InMemoryBroker(history_size=3)
+    for n in range(5):
+        await broker.publish("1", json.dumps({"n": n}))
+
+    assert [json.loads(m)["n"] for m in await broker.history("1", "3")] == [3, 4]
+    assert await broker.history("1", "5") == []
+    # Evicted, ahead of the broker, or not an event id at all
+    assert await broker.history("1", "0") is None
+    assert await broker.history("1", "9") is None
+    assert await broker.history("1", "abc") is None
+
+
+async def test_redis_broker_history(redis):
+    broker = RedisBroker(lambda: redis, history_size=10)
+    for n in range(3):
+        await broker.publish("1", json.dumps({"n": n}))
+
+    entries = await redis.xrange(broker._history_key("1"))
+    first = entries[0][0].decode()
+    replay = await broker.history("1", first)
+    assert [json.loads(m)["n"] for m in replay] == [1, 2]
+    assert event_id_of(replay[-1]) == entries[-1][0].decode()
+    # Nothing is known to come before a new stream's first entry
+    assert await broker.history("1", "0-0") is None
+    assert await broker.history("2", first) is None
+
+
+@pytest.fixture(params=["memory", "redis"])
+def bounded_broker(request):
+    """
+    A broker retaining three messages, and a way to read its newest event id
+    """
+    if request.param == "memory":
+        broker = InMemoryBroker(history_size=3)
+
+        async def newest(lesson_id: str) -> str:
+            return str(broker._sequences[lesson_id])
+    else:
+        redis = request.getfixturevalue("redis")
+        broker = RedisBroker(lambda: redis, history_size=3)
+
+        async def newest(lesson_id: str) -> str:
+            key = broker._history_key(lesson_id)
+            # MAXLEN ~ only trims whole stream nodes; trim exactly, as a full node would
+            await redis.xtrim(key, maxlen=broker.history_size, approximate=False)
+            [(entry_id, _)] = await redis.xrevrange(key, count=1)
+            return entry_id.decode()
+    return broker, newest
+
+
+async def test_history_replays_from_just_before_the_oldest_retained(bounded_broker):
+    broker, newest = bounded_broker
+    event_ids = []
+    for n in range(5):
+        await broker.publish("1", json.dumps({"n": n}))
+        event_ids.append(await newest("1"))
+
+    # 2, 3 and 4 are retained; 1 was trimmed, but nothing after it was
+    replay = await broker.history("1", event_ids[1])
+    assert [json.loads(m)["n"] for m in replay] == [2, 3, 4]
+    assert [json.loads(m)["n"] for m in await broker.history("1", event_ids[2])] == [3, 4]
+    assert await broker.history("1", event_ids[4]) == []
+    # A client that last saw 0 has lost 1 for good
+    assert await broker.history("1", event_ids[0]) is None
+
+
+async def test_redis_broker_delivers_to_subscribers(redis):
+    broker = RedisBroker(lambda: redis)
+    recorder = Recorder()
+    broker.set_handler(recorder)
+    try:
+        await broker.subscribe("1")
+        await broker.publish("1", '{"body":"hi"}')
+        await asyncio.wait_for(recorder.arrived.wait(), timeout=5)
+    finally:
+        await broker.close()
+
+    [(lesson_id, message)] = recorder.received
+    assert lesson_id == "1"
+    assert json.loads(message)["body"] == "hi"
+    assert event_id_of(message) is not None
@@ -0,0 +1,97 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.api import comments as comments_api
+from app.models import Comment, Lesson, User, UserRole
+from app.services.comment_threads import DELETED_BODY
+
+START = datetime(2025, 3, 1, 12, 0, tzinfo=UTC)
+
+
+@pytest.fixture
+async def thread(postgres, db, seed_course):
+    """
+    Three threads on one lesson. The newest has five replies; the first of
+    those has two of its own, and one of them a reply three levels down.
+    """
+    await seed_course("threads", modules=1, lessons_per_module=1)
+    lesson_id = await db.scalar(select(Lesson.id))
+    author = User(email="author@byteboost.com", name="Author", role=UserRole.STUDENT)
+    db.add(author)
+    await db.flush()
+    minutes = iter(range(100))
+
+    async def post(body: str, parent: Comment = None, deleted: bool = False) -> Comment:
+        created_at = START + timedelta(minutes=next(minutes))
+        comment = Comment(user_id=author.id, lesson_id=lesson_id, body=body, is_deleted=deleted,
+                          parent_id=parent.id if parent else None, created_at=created_at,
+                          updated_at=created_at)
+        db.add(comment)
+        await db.flush()
+        return comment
+
+    await post("oldest thread")
+    await post("middle thread", deleted=True)
+    newest = await post("newest thread")
+    replies = [await post(f"reply {n}", newest) for n in range(5)]
+    nested = await post("nested 0", replies[0])
+    await post("nested 1", replies[0])
+    await post("too deep", nested)
+    await db.commit()
+    return lesson_id, newest.id
+
+
+def bodies(comments) -> list:
+    return [c["body"] for c in comments]
+
+
+async def test_threads_page_newest_first_with_bounded_replies(api, thread):
+    lesson_id, _ = thread
+    client = api(comments_api.router, "/comments")
+
+    page = (await client.get(f"/comments/lesson/{lesson_id}/threads", params={
+        "limit": 2, "depth": 2, "replies_limit": 3,
+    })).json()
+
+    assert bodies(page["items"]) == ["newest thread", DELETED_BODY]
+    assert page["has_more"] and page["next_cursor"]
+    newest = page["items"][0]
+    # Three of five replies came back; the cursor continues after the last one
+    assert bodies(newest["replies"]) == ["reply 0", "reply 1", "reply 2"]
+    assert newest["has_more_replies"] and newest["replies_cursor"]
+    nested = newest["replies"][0]["replies"]
+    assert bodies(nested) == ["nested 0", "nested 1"]
+    assert not newest["replies"][0]["has_more_replies"]
+    # Below the depth limit nothing is fetched, so there is no cursor either
+    assert nested[0]["depth"] == 2
+    assert nested[0]["has_more_replies"] and nested[0]["replies_cursor"] is None
+
+    rest = (await client.get(f"/comments/lesson/{lesson_id}/threads", params={
+        "limit": 2, "cursor": page["next_cursor"],
+    })).json()
+    assert bodies(rest["items"]) == ["oldest thread"]
+    assert not rest["has_more"] and rest["next_cursor"] is None
+
+
+async def test_replies_cursor_continues_a_truncated_thread(api, thread):
+    lesson_id, newest_id = thread
+    client = api(comments_api.router, "/comments")
+    page = (await client.get(f"/comments/lesson/{lesson_id}/threads", params={"replies_limit": 3})).json()
+
+    more = (await client.get(f"/comments/{newest_id}/replies", params={
+        "cursor": page["items"][0]["replies_cursor"], "replies_limit": 3,
+    })).json()
+
+    assert bodies(more["items"]) == ["reply 3", "reply 4"]
+    assert [reply["depth"] for reply in more["items"]] == [0, 0]
+    assert not more["has_more"]
+
+
+async def test_malformed_cursor_is_a_bad_request(api):
+    client = api(comments_api.router, "/comments")
+
+    response = await client.get("/comments/lesson/1/threads", params={"cursor": "garbage"})
+
+    assert response.status_code == 400
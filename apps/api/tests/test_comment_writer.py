@@ -0,0 +1,175 @@
+import itertools
+import json
+
+import pytest
+from pydantic import ValidationError
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import func, select
+from sqlalchemy.exc import DataError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core import redis as redis_client
+from app.models import Comment, Lesson, User, UserRole
+from app.schemas import CommentWSCreate
+from app.services import comment_writer as writer_module
+from app.services.comment_writer import (
+    DEAD_LETTER_KEY,
+    MAX_ATTEMPTS,
+    RETRY_KEY,
+    STREAM_KEY,
+    CommentWriter,
+)
+
+
+class SequenceIds:
+    """
+    Stands in for the Postgres sequence the real allocator reserves from
+    """
+
+    def __init__(self, start: int = 1000):
+        self._ids = itertools.count(start)
+
+    async def next_id(self) -> int:
+        return next(self._ids)
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RedisConnectionError("Redis is down")
+        return fail
+
+
+@pytest.fixture
+async def lesson(db, seed_course):
+    course_id = await seed_course("comments", modules=2, lessons_per_module=1)
+    first, second = (await db.scalars(select(Lesson.id).order_by(Lesson.id))).all()
+    user = User(email="commenter@byteboost.com", name="Commenter", role=UserRole.STUDENT)
+    db.add(user)
+    await db.commit()
+    return {"course_id": course_id, "id": first, "other": second, "user_id": user.id}
+
+
+@pytest.fixture
+def writer(engine, monkeypatch):
+    monkeypatch.setattr(
+        writer_module, "AsyncSessionLocal",
+        async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    writer = CommentWriter(id_block_size=10, batch_size=10, block_ms=10)
+    writer.ids = SequenceIds()
+    return writer
+
+
+def message(lesson, client_msg_id="m1", body="hello", **fields) -> CommentWSCreate:
+    return CommentWSCreate(body=body, client_msg_id=client_msg_id, user_id=lesson["user_id"], **fields)
+
+
+async def test_submit_buffers_and_dedupes(redis, writer, lesson):
+    comment, is_new = await writer.submit(lesson["id"], message(lesson))
+    again, is_new_again = await writer.submit(lesson["id"], message(lesson))
+
+    assert is_new and not is_new_again
+    assert again.id == comment.id
+    assert await redis.xlen(STREAM_KEY) == 1
+
+
+async def test_submit_rejects_unknown_lesson_and_foreign_parent(redis, writer, lesson):
+    with pytest.raises(LookupError, match="Unknown lesson"):
+        await writer.submit(lesson["id"] + 100, message(lesson))
+
+    parent, _ = await writer.submit(lesson["other"], message(lesson, "parent"))
+    with pytest.raises(LookupError, match="Unknown parent"):
+        await writer.submit(lesson["id"], message(lesson, "reply", parent_id=parent.id))
+    with pytest.raises(LookupError, match="Unknown parent"):
+        await writer.submit(lesson["id"], message(lesson, "orphan", parent_id=99_999))
+    assert await redis.xlen(STREAM_KEY) == 1
+
+
+async def test_reply_to_a_comment_buffered_by_another_worker(redis, writer, lesson):
+    parent, _ = await writer.submit(lesson["id"], message(lesson, "parent"))
+
+    other_worker = CommentWriter(id_block_size=10, batch_size=10, block_ms=10)
+    other_worker.ids = SequenceIds(2000)
+    reply, is_new = await other_worker.submit(lesson["id"], message(lesson, "reply", parent_id=parent.id))
+
+    assert is_new and reply.parent_id == parent.id
+
+
+async def test_write_through_dedupes_by_client_msg_id(writer, lesson, db, monkeypatch):
+    monkeypatch.setattr(redis_client, "_client", DownRedis())
+    deltas = []
+
+    async def record_comment_delta(db, course_id, delta):
+        deltas.append((course_id, delta))
+
+    # The direct counter update is Postgres SQL; course_stats has its own tests
+    monkeypatch.setattr(writer_module, "record_comment_delta", record_comment_delta)
+
+    comment, is_new = await writer.submit(lesson["id"], message(lesson))
+    again, is_new_again = await writer.submit(lesson["id"], message(lesson))
+
+    assert is_new and not is_new_again
+    assert again.id == comment.id
+    assert await db.scalar(select(func.count()).select_from(Comment)) == 1
+    assert deltas == [(lesson["course_id"], 1)]
+
+
+async def test_failed_rows_back_off_then_dead_letter(redis, writer, lesson):
+    await writer._ensure_group()
+    await writer.submit(lesson["id"], message(lesson, "good"))
+    bad = (await writer.submit(lesson["id"], message(lesson, "bad")))[0]
+    entries = (await redis.xrange(STREAM_KEY))
+    # Corrupt the second row so only it fails to insert
+    row = json.loads(entries[1][1][b"comment"])
+    row["body"] = None
+    entries[1][1][b"comment"] = json.dumps(row).encode()
+
+    assert await writer.flush(entries) == 1
+    [(member, due)] = await redis.zrange(RETRY_KEY, 0, -1, withscores=True)
+    assert json.loads(member)["attempt"] == "1"
+
+    # Not due yet: nothing moves
+    assert await writer._requeue_due() == 0
+    await redis.zadd(RETRY_KEY, {member: 0})
+    assert await writer._requeue_due() == 1
+    # The flushed batch was deleted from the stream; only the retry is left
+    [(_, fields)] = await redis.xrange(STREAM_KEY)
+    assert fields[b"attempt"] == b"1"
+
+    retried = [(b"0-1", {b"comment": fields[b"comment"], b"attempt": str(MAX_ATTEMPTS - 1).encode()})]
+    assert await writer.flush(retried) == 0
+    [(_, dead)] = await redis.xrange(DEAD_LETTER_KEY)
+    assert json.loads(dead[b"comment"])["id"] == bad.id
+    assert dead[b"attempt"] == str(MAX_ATTEMPTS).encode()
+
+
+def test_nul_bodies_are_rejected_before_the_ack(lesson):
+    with pytest.raises(ValidationError, match="NUL"):
+        message(lesson, body="nul\x00byte")
+
+
+async def test_poisoned_row_does_not_hold_back_its_batch(redis, writer, lesson, db, monkeypatch):
+    insert = writer._insert
+
+    async def postgres_insert(db, rows):
+        # What Postgres raises for a NUL in a text column; SQLite stores it
+        if any("\x00" in row["body"] for row in rows):
+            raise DataError("INSERT", {}, Exception("invalid byte sequence"))
+        return await insert(db, rows)
+
+    monkeypatch.setattr(writer, "_insert", postgres_insert)
+    await writer._ensure_group()
+    for client_msg_id in ("before", "poisoned", "after"):
+        await writer.submit(lesson["id"], message(lesson, client_msg_id))
+    entries = await redis.xrange(STREAM_KEY)
+    row = json.loads(entries[1][1][b"comment"])
+    row["body"] = "nul\x00byte"
+    entries[1][1][b"comment"] = json.dumps(row).encode()
+
+    assert await writer.flush(entries) == 2
+    assert await db.scalar(select(func.count()).select_from(Comment)) == 2
+    [(member, _)] = await redis.zrange(RETRY_KEY, 0, -1, withscores=True)
+    assert json.loads(json.loads(member)["comment"])["id"] == row["id"]
+    # The whole batch was acknowledged, so nothing is left to be reclaimed
+    assert await redis.xlen(STREAM_KEY) == 0
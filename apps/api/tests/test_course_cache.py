@@ -0,0 +1,144 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services import course_cache as course_cache_module
+from app.services.course_cache import CourseCache, _tree_key, _version_key
+
+
+class Clock:
+    """
+    Stands in for the time module inside app.services.course_cache
+    """
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RedisConnectionError("Redis is down")
+        return fail
+
+
+class Loader:
+    """
+    Counts database loads and serves whatever `payload` currently is
+    """
+
+    def __init__(self, payload: bytes, course_id: int = 1):
+        self.payload = payload
+        self.course_id = course_id
+        self.calls = 0
+
+    async def course(self):
+        self.calls += 1
+        return self.payload
+
+    async def lesson(self):
+        self.calls += 1
+        return self.course_id, self.payload
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(course_cache_module, "time", clock)
+    return clock
+
+
+def new_cache() -> CourseCache:
+    return CourseCache(ttl=300, local_size=10, local_ttl=5)
+
+
+async def test_a_version_bump_invalidates_every_process(redis, clock):
+    ours, theirs = new_cache(), new_cache()
+    loader = Loader(b'{"title":"graphs"}')
+
+    first = await ours.get_course(1, loader.course)
+    # The other process finds it in Redis; ours still trusts its local copy
+    assert await theirs.get_course(1, loader.course) == first
+    assert await ours.get_course(1, loader.course) == first
+    assert loader.calls == 1
+
+    loader.payload = b'{"title":"graphs, revised"}'
+    await theirs.invalidate(1)
+    assert await redis.get(_version_key(1)) == b"1"
+
+    # The writer reloads at once; we notice once our local copy is due a check
+    assert (await theirs.get_course(1, loader.course)).payload == loader.payload
+    assert await ours.get_course(1, loader.course) == first
+    clock.elapsed += 5
+    revised = await ours.get_course(1, loader.course)
+    assert revised.payload == loader.payload
+    assert revised.etag != first.etag
+    assert loader.calls == 2
+
+
+async def test_local_copies_are_revalidated_after_their_ttl(redis, clock):
+    cache = new_cache()
+    loader = Loader(b'{"title":"graphs"}')
+    first = await cache.get_course(1, loader.course)
+
+    clock.elapsed += 4.9
+    await cache.get_course(1, loader.course)
+    entry = cache._local["course:1"]
+    assert entry.checked_at == 0
+
+    # Expired but unchanged: one version check, no reload
+    clock.elapsed += 0.1
+    assert await cache.get_course(1, loader.course) == first
+    assert entry.checked_at == 5
+    assert loader.calls == 1
+
+    # A payload dropped from Redis is rebuilt from the database
+    await redis.delete(_tree_key(1) + "0")
+    cache._local.clear()
+    assert await cache.get_course(1, loader.course) == first
+    assert loader.calls == 2
+
+
+async def test_lessons_are_cached_under_their_course_version(redis, clock):
+    cache = new_cache()
+    loader = Loader(b'{"title":"bfs"}', course_id=7)
+
+    # First sighting reads the course from the database, then caching starts
+    await cache.get_lesson(3, loader.lesson)
+    await cache.get_lesson(3, loader.lesson)
+    await cache.get_lesson(3, loader.lesson)
+    assert loader.calls == 2
+
+    await cache.invalidate(7)
+    clock.elapsed += 5
+    await cache.get_lesson(3, loader.lesson)
+    assert loader.calls == 3
+
+
+async def test_reads_fall_back_to_the_database_when_redis_is_down(clock, monkeypatch):
+    monkeypatch.setattr(course_cache_module, "get_redis", DownRedis)
+    cache = new_cache()
+    course_loader = Loader(b'{"title":"graphs"}')
+    lesson_loader = Loader(b'{"title":"bfs"}')
+
+    assert (await cache.get_course(1, course_loader.course)).payload == course_loader.payload
+    assert (await cache.get_course(1, course_loader.course)).payload == course_loader.payload
+    assert (await cache.get_lesson(3, lesson_loader.lesson)).payload == lesson_loader.payload
+    assert (await cache.get_lesson(3, lesson_loader.lesson)).payload == lesson_loader.payload
+    # Nothing is kept locally without a version to check it against
+    assert course_loader.calls == lesson_loader.calls == 2
+    assert await cache.catalog_version() is None
+    await cache.invalidate(1, catalog=True)
+
+
+def test_lesson_course_map_is_bounded():
+    cache = new_cache()
+    for lesson_id in range(10_000):
+        cache._remember_lesson(lesson_id, 1)
+    cache._remember_lesson(0, 2)
+    assert len(cache._lesson_courses) == 10_000
+
+    cache._remember_lesson(10_000, 1)
+    assert cache._lesson_courses == {10_000: 1}
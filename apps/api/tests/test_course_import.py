@@ -0,0 +1,133 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.api import courses as courses_api
+from app.models import Course, Lesson, Module, User, UserRole
+from app.schemas import CourseImport
+from app.services.course_import import import_course, ndjson_lines, parse_ndjson
+from app.services.ordering import ORDER_GAP
+
+RECORDS = [
+    {"type": "course", "title": "Graphs", "slug": "graphs", "summary": "BFS to Dijkstra", "price_inr": 999, "owner_id": 1},
+    {"type": "module", "title": "Traversal", "order_index": 0},
+    {"type": "lesson", "title": "BFS", "order_index": 0},
+    {"type": "lesson", "title": "DFS", "order_index": 1},
+    {"type": "module", "title": "Shortest paths", "order_index": 1},
+    {"type": "lesson", "title": "Dijkstra", "order_index": 0},
+]
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(lines) -> list:
+    return [line async for line in lines]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1 << 20])
+async def test_lines_are_split_across_chunk_boundaries(size):
+    data = b"first\nsecond line\n\nlast"
+
+    assert await collect(ndjson_lines(chunked(data, size))) == [b"first", b"second line", b"", b"last"]
+
+
+async def test_long_lines_arrive_whole_from_tiny_chunks():
+    line = json.dumps({"type": "lesson", "content": "x" * 100_000}).encode()
+
+    assert await collect(ndjson_lines(chunked(line + b"\n" + line, 3))) == [line, line]
+
+
+async def test_parse_streamed_tree():
+    data = "\n".join(json.dumps(record) for record in RECORDS).encode() + b"\n"
+
+    tree = await parse_ndjson(ndjson_lines(chunked(data, 13)))
+
+    assert tree.slug == "graphs"
+    assert [module.title for module in tree.modules] == ["Traversal", "Shortest paths"]
+    assert [lesson.title for lesson in tree.modules[0].lessons] == ["BFS", "DFS"]
+
+
+async def test_lesson_before_module_is_rejected():
+    data = "\n".join(json.dumps(record) for record in [RECORDS[0], RECORDS[2]]).encode()
+
+    with pytest.raises(ValueError, match="line 2"):
+        await parse_ndjson(ndjson_lines(chunked(data, 16)))
+
+
+async def test_import_spaces_order_keys(db):
+    owner = User(email="importer@byteboost.com", name="Importer", role=UserRole.INSTRUCTOR)
+    db.add(owner)
+    await db.flush()
+    tree = CourseImport.model_validate({
+        **RECORDS[0], "owner_id": owner.id,
+        "modules": [
+            {"title": "Later", "order_index": 7, "lessons": [
+                {"title": "Second", "order_index": 5}, {"title": "First", "order_index": 2},
+            ]},
+            {"title": "Earlier", "order_index": 3},
+        ],
+    })
+
+    result = await import_course(db, tree)
+    await db.commit()
+
+    assert [m.order_index for m in result.modules] == [2 * ORDER_GAP, ORDER_GAP]
+    modules = (await db.execute(
+        select(Module.title, Module.order_index).order_by(Module.order_index)
+    )).all()
+    assert modules == [("Earlier", ORDER_GAP), ("Later", 2 * ORDER_GAP)]
+    lessons = (await db.execute(
+        select(Lesson.title, Lesson.order_index).order_by(Lesson.order_index)
+    )).all()
+    assert lessons == [("First", ORDER_GAP), ("Second", 2 * ORDER_GAP)]
+
+
+@pytest.fixture
+async def import_client(api, db, redis, monkeypatch):
+    """
+    Client for the courses router, and the id of an instructor to own imports
+    """
+    monkeypatch.setattr(courses_api.landing_snapshot, "invalidate", lambda: None)
+    owner = User(email="importer@byteboost.com", name="Importer", role=UserRole.INSTRUCTOR)
+    db.add(owner)
+    await db.commit()
+    return api(courses_api.router, "/courses"), owner.id
+
+
+def ndjson_body(records, owner_id: int) -> bytes:
+    records = [{**records[0], "owner_id": owner_id}, *records[1:]]
+    return b"\n".join(
+        record if isinstance(record, bytes) else json.dumps(record).encode() for record in records
+    ) + b"\n"
+
+
+async def test_streamed_ndjson_import(import_client, db):
+    client, owner_id = import_client
+
+    response = await client.post(
+        "/courses/import", content=chunked(ndjson_body(RECORDS, owner_id), 11),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 201
+    assert len(response.json()["modules"]) == 2
+    titles = (await db.scalars(select(Lesson.title).order_by(Lesson.id))).all()
+    assert sorted(titles) == ["BFS", "DFS", "Dijkstra"]
+
+
+async def test_streamed_import_with_a_malformed_line_stores_nothing(import_client, db):
+    client, owner_id = import_client
+    records = [*RECORDS[:3], b'{"type": "lesson", "title": "DFS"', *RECORDS[4:]]
+
+    response = await client.post(
+        "/courses/import", content=chunked(ndjson_body(records, owner_id), 11),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 422
+    assert "line 4" in response.json()["detail"]
+    assert await db.scalar(select(func.count()).select_from(Course)) == 0
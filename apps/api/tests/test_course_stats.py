@@ -0,0 +1,119 @@
+import pytest
+
+from app.services import course_stats
+from app.services.course_cache import CATALOG_VERSION_KEY, _version_key
+from app.services.course_stats import FLUSHING_PREFIX, LOCK_KEY, PENDING_COMMENTS_KEY
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+
+class RecordingSession:
+    """
+    Stands in for the session: the counter SQL is Postgres-only, so these
+    tests check what reaches the database and when, not the SQL itself
+    """
+
+    def __init__(self, fail_commit=False, repaired=()):
+        self.fail_commit = fail_commit
+        self.repaired = list(repaired)
+        self.executed = []
+        self.committed = False
+        self.rolled_back = False
+
+    async def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+        return _Result(self.repaired)
+
+    async def commit(self):
+        if self.fail_commit:
+            raise RuntimeError("commit failed")
+        self.committed = True
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def _applied(db):
+    deltas = {}
+    for statement, params in db.executed:
+        if statement is course_stats._APPLY_COMMENT_DELTAS:
+            deltas.update(zip(params["course_ids"], params["deltas"], strict=True))
+    return deltas
+
+
+async def _pending(redis):
+    return {int(k): int(v) for k, v in (await redis.hgetall(PENDING_COMMENTS_KEY)).items()}
+
+
+async def test_flush_applies_pending_and_orphaned_batches(redis):
+    await redis.hincrby(PENDING_COMMENTS_KEY, "1", 2)
+    # Left behind by a flush that died between RENAME and commit
+    await redis.hset(f"{FLUSHING_PREFIX}dead", mapping={"1": 1, "2": -1})
+
+    db = RecordingSession()
+    assert await course_stats.flush_comment_deltas(db) == 2
+
+    assert _applied(db) == {1: 3, 2: -1}
+    assert db.committed
+    assert await redis.keys(f"{PENDING_COMMENTS_KEY}*") == []
+    assert await redis.get(_version_key(1)) == b"1"
+    # Catalog cards carry no comment counts, so catalog ETags stay valid
+    assert not await redis.exists(CATALOG_VERSION_KEY)
+
+
+async def test_failed_flush_puts_deltas_back(redis):
+    await redis.hincrby(PENDING_COMMENTS_KEY, "1", 2)
+    await redis.hset(f"{FLUSHING_PREFIX}dead", mapping={"1": 1})
+
+    db = RecordingSession(fail_commit=True)
+    with pytest.raises(RuntimeError):
+        await course_stats.flush_comment_deltas(db)
+
+    assert db.rolled_back
+    assert await _pending(redis) == {1: 3}
+    assert await redis.keys(f"{FLUSHING_PREFIX}*") == []
+    assert not await redis.exists(LOCK_KEY)
+
+
+async def test_flush_waits_for_the_lock_holder(redis):
+    await redis.hincrby(PENDING_COMMENTS_KEY, "1", 1)
+    await redis.set(LOCK_KEY, "someone-else")
+
+    db = RecordingSession()
+    assert await course_stats.flush_comment_deltas(db) == 0
+
+    assert db.executed == []
+    assert await _pending(redis) == {1: 1}
+
+
+async def test_repair_discards_deltas_only_for_the_repaired_course(redis):
+    await redis.hset(PENDING_COMMENTS_KEY, mapping={"1": 4, "2": 1})
+    await redis.hset(f"{FLUSHING_PREFIX}dead", mapping={"1": 1})
+
+    db = RecordingSession(repaired=[1])
+    await course_stats.repair_course_stats(db, course_id=1)
+
+    assert _applied(db) == {2: 1}
+    assert db.executed[-1][0] is course_stats._REPAIR
+    assert db.committed
+    assert await redis.keys(f"{PENDING_COMMENTS_KEY}*") == []
+    assert await redis.get(_version_key(1)) == b"1"
+    assert await redis.get(_version_key(2)) == b"1"
+
+
+async def test_failed_repair_keeps_buffered_deltas(redis):
+    await redis.hset(PENDING_COMMENTS_KEY, mapping={"1": 4})
+
+    db = RecordingSession(fail_commit=True)
+    with pytest.raises(RuntimeError):
+        await course_stats.repair_course_stats(db)
+
+    assert db.rolled_back
+    assert await _pending(redis) == {1: 4}
+    assert not await redis.exists(LOCK_KEY)
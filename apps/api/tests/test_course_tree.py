@@ -0,0 +1,30 @@
+from app.services.course_tree import load_course_detail
+
+
+async def test_query_count_is_independent_of_tree_size(db, statements, seed_course):
+    small = await seed_course("small", modules=1, lessons_per_module=1)
+    large = await seed_course("large", modules=40, lessons_per_module=8)
+
+    statements.clear()
+    await load_course_detail(db, small)
+    small_count = len(statements)
+
+    statements.clear()
+    detail = await load_course_detail(db, large)
+    assert len(statements) == small_count == 2
+
+    assert len(detail.modules) == 40
+    assert all(len(module.lessons) == 8 for module in detail.modules)
+
+
+async def test_tree_is_ordered_by_order_index(db, seed_course):
+    course_id = await seed_course("ordered", modules=3, lessons_per_module=3)
+
+    detail = await load_course_detail(db, course_id)
+
+    assert [module.title for module in detail.modules] == ["Module 2", "Module 1", "Module 0"]
+    assert [lesson.title for lesson in detail.modules[0].lessons] == ["Lesson 2.2", "Lesson 2.1", "Lesson 2.0"]
+
+
+async def test_missing_course_returns_none(db):
+    assert await load_course_detail(db, 12345) is None
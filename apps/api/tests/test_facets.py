@@ -0,0 +1,71 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models import Course, CourseFacetCount, User, UserRole
+from app.services.facets import catalog_filters, get_facets
+
+
+async def seed_catalog(db) -> None:
+    owner = User(email="catalog@byteboost.com", name="Owner", role=UserRole.INSTRUCTOR)
+    db.add(owner)
+    await db.flush()
+    db.add_all([
+        Course(title=slug, slug=slug, summary="summary", price_inr=price, difficulty_level=level,
+               owner_id=owner.id, is_published=True)
+        for slug, price, level in [
+            ("free-intro", 0, "beginner"),
+            ("graphs", 499, "intermediate"),
+            ("compilers", 2499, "advanced"),
+            ("dp", 1499, "intermediate"),
+        ]
+    ])
+    await db.commit()
+
+
+def test_no_filters_without_arguments():
+    assert catalog_filters() == []
+    assert catalog_filters(tags=[]) == []
+
+
+def test_tag_filter_uses_jsonb_containment():
+    [clause] = catalog_filters(tags=["python", "dsa"])
+
+    compiled = clause.compile(dialect=postgresql.dialect())
+    assert str(compiled).startswith("courses.tags @> ")
+    assert compiled.params == {"tags_1": ["python", "dsa"]}
+
+
+async def test_difficulty_and_price_filters_combine(db):
+    await seed_catalog(db)
+
+    async def slugs(**kwargs):
+        query = select(Course.slug).where(*catalog_filters(**kwargs)).order_by(Course.price_inr)
+        return (await db.scalars(query)).all()
+
+    assert await slugs(difficulty="intermediate") == ["graphs", "dp"]
+    assert await slugs(min_price=499, max_price=1499) == ["graphs", "dp"]
+    assert await slugs(max_price=0) == ["free-intro"]
+    assert await slugs(difficulty="intermediate", min_price=1000) == ["dp"]
+
+
+async def test_facets_are_ordered_and_empty_counts_hidden(db):
+    db.add_all([
+        CourseFacetCount(facet="difficulty", value="beginner", count=2),
+        CourseFacetCount(facet="difficulty", value="advanced", count=5),
+        CourseFacetCount(facet="difficulty", value="intermediate", count=0),
+        CourseFacetCount(facet="price", value="2000_plus", count=1),
+        CourseFacetCount(facet="price", value="free", count=3),
+        CourseFacetCount(facet="price", value="under_500", count=4),
+        CourseFacetCount(facet="tag", value="sql", count=2),
+        CourseFacetCount(facet="tag", value="dsa", count=2),
+        CourseFacetCount(facet="tag", value="python", count=7),
+    ])
+    await db.commit()
+
+    facets = await get_facets(db, tag_limit=2)
+
+    assert [(f.value, f.count) for f in facets.difficulty] == [("advanced", 5), ("beginner", 2)]
+    # Price buckets keep their natural order rather than sorting by count
+    assert [f.value for f in facets.price] == ["free", "under_500", "2000_plus"]
+    # Ties broken alphabetically, then cut at the limit
+    assert [f.value for f in facets.tags] == ["python", "dsa"]
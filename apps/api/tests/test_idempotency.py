@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Response
+
+from app.core.idempotency import IdempotencyMiddleware
+
+AUTH = {"Authorization": "Bearer alice"}
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+async def make_client(redis, calls):
+    clients = []
+
+    def make(lock_ttl: float = 60, on_call=None):
+        app = FastAPI()
+
+        @app.post("/orders")
+        async def create_order(payload: dict):
+            calls.append(payload)
+            if on_call is not None:
+                return await on_call(payload)
+            return {"order": len(calls)}
+
+        app.add_middleware(IdempotencyMiddleware, lock_ttl=lock_ttl, redis_factory=lambda: redis)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        await client.aclose()
+
+
+def post(client, key="k1", body=None, headers=AUTH):
+    return client.post("/orders", json=body or {"course": 1}, headers={**headers, "Idempotency-Key": key})
+
+
+async def test_repeat_is_replayed(make_client, calls):
+    client = make_client()
+
+    first = await post(client)
+    second = await post(client)
+
+    assert len(calls) == 1
+    assert second.json() == first.json() == {"order": 1}
+    assert second.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+
+
+async def test_anonymous_requests_are_not_deduplicated(make_client, calls):
+    client = make_client()
+
+    await post(client, headers={})
+    second = await post(client, headers={})
+
+    assert len(calls) == 2
+    assert "idempotent-replayed" not in second.headers
+
+
+async def test_keys_are_scoped_per_caller(make_client, calls):
+    client = make_client()
+
+    await post(client, headers=AUTH)
+    other = await post(client, headers={"Authorization": "Bearer mallory"})
+
+    assert len(calls) == 2
+    assert other.json() == {"order": 2}
+
+
+async def test_key_reuse_for_another_request_is_rejected(make_client, calls):
+    client = make_client()
+
+    await post(client, body={"course": 1})
+    response = await post(client, body={"course": 2})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+async def test_lease_is_renewed_while_the_handler_runs(make_client, redis, calls):
+    async def slow(payload):
+        await asyncio.sleep(0.5)
+        # Well past lock_ttl, yet this request still holds the key
+        assert len(await redis.keys("idem:*")) == 1
+        return {"order": 1}
+
+    client = make_client(lock_ttl=0.2, on_call=slow)
+    await post(client)
+    replay = await post(client)
+
+    assert len(calls) == 1
+    assert replay.headers["idempotent-replayed"] == "true"
+
+
+@pytest.mark.parametrize("status", [200, 500])
+async def test_expired_request_leaves_the_new_claim_alone(make_client, redis, calls, status):
+    async def outlived(payload):
+        # Our lease lapsed and another request claimed the key meanwhile
+        [key] = await redis.keys("idem:*")
+        await redis.set(key, b"someone else")
+        return Response(status_code=status)
+
+    client = make_client(on_call=outlived)
+    await post(client)
+
+    [key] = await redis.keys("idem:*")
+    assert await redis.get(key) == b"someone else"
@@ -0,0 +1,185 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.api import payments as payments_api
+from app.models import Course, User, UserRole
+from app.services import ids
+from app.services.ids import (
+    EPOCH_MS,
+    MAX_SEQUENCE,
+    SEQUENCE_BITS,
+    WORKER_BITS,
+    IdGenerator,
+    LeaseLapsed,
+    _lease_key,
+)
+
+
+class Clock:
+    """
+    Stands in for the time module inside app.services.ids
+    """
+
+    def __init__(self, now_ms: int = EPOCH_MS + 1_000_000):
+        self.now_ms = now_ms
+        self.elapsed = 0.0
+
+    def time(self) -> float:
+        # Mid-millisecond, so float rounding never lands on the one before
+        return (self.now_ms + 0.5) / 1000
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RedisConnectionError("Redis is down")
+        return fail
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ids, "time", clock)
+    return clock
+
+
+def parts(id_: int):
+    return (
+        id_ >> (WORKER_BITS + SEQUENCE_BITS),
+        (id_ >> SEQUENCE_BITS) & ((1 << WORKER_BITS) - 1),
+        id_ & MAX_SEQUENCE,
+    )
+
+
+def test_exhausted_sequence_borrows_the_next_millisecond(clock):
+    generator = IdGenerator(worker_id=5)
+
+    issued = [generator.next_id() for _ in range(MAX_SEQUENCE + 3)]
+
+    assert issued == sorted(set(issued))
+    assert parts(issued[0]) == (1_000_000, 5, 0)
+    assert parts(issued[MAX_SEQUENCE]) == (1_000_000, 5, MAX_SEQUENCE)
+    assert parts(issued[-1]) == (1_000_001, 5, 1)
+
+    # Once the clock catches up with the borrowed millisecond, counting goes on
+    clock.now_ms += 1
+    assert parts(generator.next_id()) == (1_000_001, 5, 2)
+    clock.now_ms += 1
+    assert parts(generator.next_id()) == (1_000_002, 5, 0)
+
+
+def test_ids_keep_increasing_when_the_clock_steps_back(clock):
+    generator = IdGenerator(worker_id=1)
+    before = generator.next_id()
+
+    clock.now_ms -= 5000
+    after = [generator.next_id() for _ in range(3)]
+
+    assert before < after[0] < after[1] < after[2]
+    assert parts(after[-1])[0] == parts(before)[0]
+
+
+def test_worker_id_must_fit_its_bits():
+    with pytest.raises(ValueError):
+        IdGenerator(worker_id=1 << WORKER_BITS)
+    with pytest.raises(RuntimeError):
+        IdGenerator(worker_id=None).next_id()
+
+
+async def test_lease_is_acquired_renewed_and_released(redis, clock, monkeypatch):
+    monkeypatch.setattr(ids.random, "randrange", lambda n: 7)
+    await redis.set(_lease_key(7), "someone else")
+    generator = IdGenerator(worker_id=None, lease_ttl=60, redis_factory=lambda: redis)
+
+    await generator.start()
+    try:
+        # 7 is taken, so the next free id is leased
+        assert generator.worker_id == 8
+        assert parts(generator.next_id())[1] == 8
+
+        await redis.pexpire(_lease_key(8), 1_000)
+        clock.elapsed += 30
+        await generator._renew()
+        assert await redis.pttl(_lease_key(8)) > 1_000
+    finally:
+        await generator.stop()
+
+    assert not await redis.exists(_lease_key(8))
+    assert await redis.get(_lease_key(7)) == b"someone else"
+
+
+async def test_lost_lease_switches_to_a_free_worker_id(redis, clock, monkeypatch):
+    monkeypatch.setattr(ids.random, "randrange", lambda n: 3)
+    generator = IdGenerator(worker_id=None, lease_ttl=60, redis_factory=lambda: redis)
+    await generator._acquire()
+    assert generator.worker_id == 3
+
+    # Our lease expired and another process took the id meanwhile
+    await redis.set(_lease_key(3), "another process")
+    await generator._renew()
+
+    assert generator.worker_id == 4
+    assert await redis.get(_lease_key(4)) == generator._token.encode()
+    assert await redis.get(_lease_key(3)) == b"another process"
+    assert parts(generator.next_id())[1] == 4
+
+    # Releasing only deletes a lease we still hold
+    await generator.stop()
+    assert await redis.get(_lease_key(3)) == b"another process"
+
+
+async def test_no_ids_while_the_lease_is_lapsed(redis, clock):
+    backend = {"redis": redis}
+    generator = IdGenerator(worker_id=None, lease_ttl=60, redis_factory=lambda: backend["redis"])
+    await generator._acquire()
+    generator.next_id()
+
+    backend["redis"] = DownRedis()
+    clock.elapsed += 20
+    with pytest.raises(RedisConnectionError):
+        await generator._renew()
+    # Renewals kept failing until the lease ran out: the id may be reused
+    clock.elapsed += 41
+    with pytest.raises(LeaseLapsed):
+        generator.next_id()
+
+    backend["redis"] = redis
+    await generator._renew()
+    generator.next_id()
+
+
+async def test_unleased_worker_id_when_redis_is_down(clock, monkeypatch):
+    monkeypatch.setattr(ids.random, "randrange", lambda n: 42)
+    generator = IdGenerator(worker_id=None, redis_factory=DownRedis)
+
+    await generator.start()
+    try:
+        # Checkouts keep working; the unique receipt constraint is the backstop
+        assert generator.worker_id == 42
+        assert generator.receipt().startswith("rcpt_")
+        clock.elapsed += 3600
+        generator.next_id()
+    finally:
+        await generator.stop()
+
+
+async def test_checkout_is_refused_while_the_lease_is_lapsed(api, db, clock, monkeypatch):
+    buyer = User(email="buyer@byteboost.com", name="Buyer", role=UserRole.STUDENT)
+    db.add(buyer)
+    await db.flush()
+    course = Course(title="graphs", slug="graphs", summary="summary", price_inr=499,
+                    owner_id=buyer.id, is_published=True)
+    db.add(course)
+    await db.commit()
+    generator = IdGenerator(worker_id=None)
+    generator.worker_id, generator._lease_deadline = 3, clock.elapsed
+    monkeypatch.setattr(payments_api, "id_generator", generator)
+
+    response = await api(payments_api.router, "/payments").post("/payments/razorpay/orders", json={
+        "course_id": course.id, "provider": "razorpay", "amount_inr": 499, "user_id": buyer.id,
+    })
+
+    assert response.status_code == 503
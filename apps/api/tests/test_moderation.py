@@ -0,0 +1,97 @@
+import pytest
+
+from app.models import ModerationLabel
+from app.services import moderation
+from app.services.moderation import (
+    BlocklistPrefilter,
+    HeuristicClassifier,
+    ModerationClassifier,
+    compile_terms,
+    create_classifier,
+)
+
+
+@pytest.mark.parametrize("body", [
+    "join t.me/cryptopump now",
+    "Free Bitcoin for everyone",
+    "please WhatsApp me",
+    "(buy followers)",
+])
+def test_prefilter_blocks_listed_terms(body):
+    assert moderation.prefilter.check(body).label == ModerationLabel.BLOCK
+
+
+@pytest.mark.parametrize("body", [
+    "freebitcoin is one word",
+    "at.me/ is not the telegram host",
+    "DFS before BFS",
+])
+def test_prefilter_allows_near_misses(body):
+    assert moderation.prefilter.check(body).label == ModerationLabel.ALLOW
+
+
+def test_boundaries_only_on_word_character_ends():
+    pattern = compile_terms(["scam", "t.me/", ".exe", "c++"])
+
+    assert pattern.search("a scam!")
+    assert not pattern.search("scampi")
+    assert pattern.search("see t.me/x")
+    assert pattern.search("run setup.exe")
+    assert not pattern.search("setup.exe2")
+    assert pattern.search("learn c++ today")
+    assert compile_terms(["  ", ""]) is None
+
+
+def test_prefilter_reports_each_term_once():
+    verdict = BlocklistPrefilter(["spam", "t.me/"]).check("spam spam t.me/a T.ME/b")
+
+    assert verdict.reasons == ["blocked term: spam", "blocked term: t.me/"]
+
+
+async def test_heuristic_classifier_labels():
+    verdicts = await HeuristicClassifier().classify([
+        "Thanks, the BFS explanation was clear",
+        "this course is useless",
+        "THIS IS THE BEST COURSE EVER MADE BY ANYONE",
+        "http://a http://b http://c",
+    ])
+
+    assert [v.label for v in verdicts] == [ModerationLabel.ALLOW] + [ModerationLabel.REVIEW] * 3
+    assert [v.reasons for v in verdicts[1:]] == [["insult"], ["shouting"], ["links"]]
+
+
+def test_classifier_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ModerationClassifier()
+    with pytest.raises(ValueError):
+        create_classifier("oracle")
+
+
+async def test_blocked_comments_are_uncounted(monkeypatch):
+    batches = [(2, [(10, 1, 7), (11, 2, 7)]), (1, [(12, 3, 8)])]
+    deltas, published = [], []
+
+    async def moderate_batch(db, classifier, batch_size):
+        return batches.pop(0)
+
+    async def record_comment_delta(db, course_id, delta):
+        deltas.append((course_id, delta))
+
+    class Broker:
+        async def publish(self, lesson_id, message):
+            published.append(lesson_id)
+
+        async def close(self):
+            pass
+
+    class Session:
+        async def commit(self):
+            pass
+
+    monkeypatch.setattr(moderation, "moderate_batch", moderate_batch)
+    monkeypatch.setattr(moderation, "record_comment_delta", record_comment_delta)
+    monkeypatch.setattr(moderation, "create_broker", Broker)
+
+    assert await moderation.moderate_pending(Session(), HeuristicClassifier(), batch_size=2) == 3
+    assert deltas == [(7, -2), (8, -1)]
+    assert published == ["1", "2", "3"]
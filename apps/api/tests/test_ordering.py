@@ -0,0 +1,152 @@
+import pytest
+from sqlalchemy import select, update
+
+from app.models import Lesson, Module
+from app.services import ordering
+from app.services.ordering import ORDER_GAP, OrderingError
+
+
+async def lessons(db):
+    """
+    (title, order_index) of every lesson, in order
+    """
+    result = await db.execute(select(Lesson.title, Lesson.order_index).order_by(Lesson.order_index))
+    return result.all()
+
+
+async def lesson_id(db, title: str) -> int:
+    return await db.scalar(select(Lesson.id).where(Lesson.title == title))
+
+
+async def set_keys(db, keys: dict) -> None:
+    # Row by row, through keys nothing uses, so no intermediate state collides
+    for parked, title in enumerate(keys, 1):
+        await db.execute(update(Lesson).where(Lesson.title == title).values(order_index=-parked))
+    for title, key in keys.items():
+        await db.execute(update(Lesson).where(Lesson.title == title).values(order_index=key))
+    await db.commit()
+
+
+def test_spaced_keys_rank_by_client_order():
+    assert ordering.spaced_keys([30, 10, 20]) == [3 * ORDER_GAP, ORDER_GAP, 2 * ORDER_GAP]
+    assert ordering.spaced_keys([]) == []
+
+
+async def test_append_key_goes_after_the_last_sibling(db, seed_course):
+    course_id = await seed_course("append", modules=3, lessons_per_module=0)
+
+    assert await ordering.append_key(db, Module, course_id) == 4 * ORDER_GAP
+    assert await ordering.append_key(db, Module, course_id + 1) == ORDER_GAP
+
+
+async def test_move_rewrites_only_the_moved_row(db, seed_course, statements):
+    await seed_course("move", modules=1, lessons_per_module=4)
+    # Stored order: 0.3, 0.2, 0.1, 0.0
+
+    statements.clear()
+    key, needs_rebalance = await ordering.move_item(
+        db, Lesson, await lesson_id(db, "Lesson 0.0"), await lesson_id(db, "Lesson 0.3"),
+    )
+    await db.commit()
+
+    assert (key, needs_rebalance) == (ORDER_GAP + ORDER_GAP // 2, False)
+    assert sum(s.lstrip().upper().startswith("UPDATE") for s in statements) == 1
+    assert [title for title, _ in await lessons(db)] == ["Lesson 0.3", "Lesson 0.0", "Lesson 0.2", "Lesson 0.1"]
+
+    # To the front, then to the back
+    await ordering.move_item(db, Lesson, await lesson_id(db, "Lesson 0.1"), None)
+    await ordering.move_item(db, Lesson, await lesson_id(db, "Lesson 0.3"), await lesson_id(db, "Lesson 0.2"))
+    await db.commit()
+    assert await lessons(db) == [
+        ("Lesson 0.1", (ORDER_GAP - 1) // 2),
+        ("Lesson 0.0", ORDER_GAP + ORDER_GAP // 2),
+        ("Lesson 0.2", 2 * ORDER_GAP),
+        ("Lesson 0.3", 3 * ORDER_GAP),
+    ]
+
+
+async def test_move_rejects_bad_targets(db, seed_course):
+    await seed_course("bad-moves", modules=2, lessons_per_module=2)
+    item = await lesson_id(db, "Lesson 0.0")
+
+    with pytest.raises(OrderingError):
+        await ordering.move_item(db, Lesson, item, item)
+    with pytest.raises(OrderingError):
+        await ordering.move_item(db, Lesson, item, await lesson_id(db, "Lesson 1.0"))
+    with pytest.raises(LookupError):
+        await ordering.move_item(db, Lesson, 99_999, None)
+
+
+async def test_narrow_gaps_ask_for_a_rebalance(db, seed_course):
+    await seed_course("narrow", modules=1, lessons_per_module=3)
+    await set_keys(db, {"Lesson 0.2": 1000, "Lesson 0.1": 1010, "Lesson 0.0": 5000})
+
+    key, needs_rebalance = await ordering.move_item(
+        db, Lesson, await lesson_id(db, "Lesson 0.0"), await lesson_id(db, "Lesson 0.2"),
+    )
+
+    assert (key, needs_rebalance) == (1005, True)
+
+
+async def test_exhausted_gap_is_respaced_in_one_statement(postgres, db, seed_course):
+    await seed_course("exhausted", modules=1, lessons_per_module=3)
+    await set_keys(db, {"Lesson 0.2": 1, "Lesson 0.1": 2, "Lesson 0.0": 3})
+
+    key, _ = await ordering.move_item(
+        db, Lesson, await lesson_id(db, "Lesson 0.0"), await lesson_id(db, "Lesson 0.2"),
+    )
+    await db.commit()
+
+    # No key between 1 and 2: siblings were respaced (0.0 landing on 0.1's old
+    # key mid-statement, which the deferrable constraint allows), then split
+    assert await lessons(db) == [
+        ("Lesson 0.2", ORDER_GAP),
+        ("Lesson 0.0", key),
+        ("Lesson 0.1", 2 * ORDER_GAP),
+    ]
+    assert key == ORDER_GAP + ORDER_GAP // 2
+
+
+async def test_rebalance_keeps_order_through_colliding_keys(postgres, db, seed_course):
+    await seed_course("rebalance", modules=1, lessons_per_module=3)
+    # The first row's new key is the second row's current one
+    await set_keys(db, {"Lesson 0.2": 5, "Lesson 0.1": ORDER_GAP, "Lesson 0.0": 7000})
+    module_id = await db.scalar(select(Module.id))
+
+    await ordering.rebalance(db, Lesson, module_id)
+    await db.commit()
+
+    assert await lessons(db) == [
+        ("Lesson 0.2", ORDER_GAP), ("Lesson 0.1", 2 * ORDER_GAP), ("Lesson 0.0", 3 * ORDER_GAP),
+    ]
+
+
+async def test_apply_order_swaps_keys_in_one_update(postgres, db, seed_course, statements):
+    course_id = await seed_course("apply", modules=3, lessons_per_module=0)
+    module_ids = (await db.scalars(select(Module.id).order_by(Module.id))).all()
+
+    statements.clear()
+    # Module 0 currently sorts last; every new key is some other module's old one
+    await ordering.apply_order(db, Module, course_id, module_ids)
+    await db.commit()
+
+    assert sum(s.lstrip().upper().startswith("UPDATE") for s in statements) == 1
+    result = await db.execute(select(Module.title, Module.order_index).order_by(Module.order_index))
+    assert result.all() == [("Module 0", ORDER_GAP), ("Module 1", 2 * ORDER_GAP), ("Module 2", 3 * ORDER_GAP)]
+
+
+async def test_apply_order_needs_every_sibling_once(postgres, db, seed_course):
+    course_id = await seed_course("apply-bad", modules=2, lessons_per_module=0)
+    other_course = await seed_course("apply-other", modules=1, lessons_per_module=0)
+    first, _ = (await db.scalars(
+        select(Module.id).where(Module.course_id == course_id).order_by(Module.id)
+    )).all()
+    foreign = await db.scalar(select(Module.id).where(Module.course_id == other_course))
+
+    with pytest.raises(OrderingError, match="Duplicate"):
+        await ordering.apply_order(db, Module, course_id, [first, first])
+    with pytest.raises(OrderingError, match="every item"):
+        await ordering.apply_order(db, Module, course_id, [first])
+    # Right length, but one of them belongs to another course
+    with pytest.raises(OrderingError, match="every item"):
+        await ordering.apply_order(db, Module, course_id, [first, foreign])
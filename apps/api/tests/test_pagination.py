@@ -0,0 +1,29 @@
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models import Course
+from app.services.pagination import _Explain, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 1, 12, 30, tzinfo=UTC)
+
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_explain_keeps_tag_filter_as_bound_parameter():
+    stmt = select(Course.id).where(Course.is_published.is_(True), Course.tags.contains(["python"]))
+
+    compiled = _Explain(stmt).compile(dialect=postgresql.psycopg.dialect())
+
+    assert compiled.string.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "@> %(tags_1)s::JSONB" in compiled.string
+    assert compiled.params["tags_1"] == ["python"]
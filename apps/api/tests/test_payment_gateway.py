@@ -0,0 +1,139 @@
+import time
+
+import httpx
+import pytest
+
+from app.services.payment_gateway import (
+    CircuitBreaker,
+    PhonePeGateway,
+    ProviderError,
+    ProviderUnavailable,
+    RazorpayGateway,
+)
+from benchmarks.mock_provider import create_app
+
+
+class FlakyTransport(httpx.AsyncBaseTransport):
+    """
+    The mock provider in-process, failing the first calls as scripted:
+    an int is returned as that HTTP status, an exception is raised
+    """
+
+    def __init__(self, app, failures=()):
+        self.inner = httpx.ASGITransport(app=app)
+        self.failures = list(failures)
+        self.calls = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return httpx.Response(failure, json={"error": {"code": "SERVER_ERROR"}})
+        return await self.inner.handle_async_request(request)
+
+
+# Where the mock provider serves each API
+BASE_URLS = {RazorpayGateway: "http://mock/v1", PhonePeGateway: "http://mock/apis/hermes"}
+
+
+def gateway(cls, transport, **kwargs):
+    class InProcess(cls):
+        def _client_options(self):
+            return {**super()._client_options(), "transport": transport}
+
+    client = InProcess(BASE_URLS[cls], http2=False, backoff=0, backoff_max=0, **kwargs)
+    client.start()
+    return client
+
+
+@pytest.fixture
+def provider():
+    return create_app()
+
+
+async def test_razorpay_order_round_trip(provider):
+    razorpay = gateway(RazorpayGateway, FlakyTransport(provider))
+    try:
+        order = await razorpay.create_order(49900, "rcpt_1", {"course": "graphs"})
+        fetched = await razorpay.fetch_order(order["id"])
+    finally:
+        await razorpay.stop()
+
+    assert fetched == order
+    assert order["amount"] == 49900 and order["receipt"] == "rcpt_1"
+
+
+async def test_phonepe_pay_round_trip(provider):
+    phonepe = gateway(PhonePeGateway, FlakyTransport(provider))
+    try:
+        response = await phonepe.create_payment("txn_1", 49900, 7, "http://localhost/return")
+    finally:
+        await phonepe.stop()
+
+    assert response["data"]["merchantTransactionId"] == "txn_1"
+
+
+async def test_idempotent_calls_retry_server_errors(provider):
+    transport = FlakyTransport(provider, [503, 502])
+    razorpay = gateway(RazorpayGateway, transport, max_retries=2)
+    try:
+        payment = await razorpay.fetch_payment("pay_1")
+    finally:
+        await razorpay.stop()
+
+    assert payment["id"] == "pay_1"
+    assert transport.calls == 3
+    assert razorpay.breaker.state == "closed"
+
+
+async def test_non_idempotent_calls_only_retry_unsent_requests(provider):
+    transport = FlakyTransport(provider, [httpx.ConnectError("refused"), 503])
+    razorpay = gateway(RazorpayGateway, transport, max_retries=3)
+    try:
+        with pytest.raises(ProviderError) as raised:
+            await razorpay.create_order(49900, "rcpt_1")
+    finally:
+        await razorpay.stop()
+
+    # The connect failure is retried; the 503 may have created the order
+    assert raised.value.status_code == 503
+    assert transport.calls == 2
+
+
+async def test_client_errors_are_not_retried(provider):
+    transport = FlakyTransport(provider)
+    razorpay = gateway(RazorpayGateway, transport, max_retries=3)
+    try:
+        with pytest.raises(ProviderError) as raised:
+            await razorpay.fetch_order("order_missing")
+    finally:
+        await razorpay.stop()
+
+    assert raised.value.status_code == 400
+    assert transport.calls == 1
+
+
+async def test_breaker_fails_fast_then_probes(provider):
+    transport = FlakyTransport(provider, [503] * 3)
+    razorpay = gateway(
+        RazorpayGateway, transport, max_retries=0, breaker=CircuitBreaker(threshold=3, reset_timeout=60),
+    )
+    try:
+        for _ in range(3):
+            with pytest.raises(ProviderError):
+                await razorpay.fetch_payment("pay_1")
+        with pytest.raises(ProviderUnavailable):
+            await razorpay.fetch_payment("pay_1")
+        assert transport.calls == 3
+
+        # Once the reset timeout has passed a single probe goes through
+        razorpay.breaker._opened_at = time.monotonic() - 61
+        assert razorpay.breaker.state == "half_open"
+        await razorpay.fetch_payment("pay_1")
+    finally:
+        await razorpay.stop()
+
+    assert razorpay.breaker.state == "closed"
+    assert transport.calls == 4
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services import presence as presence_module
+from app.services.presence import PresenceTracker, _viewers_key
+
+NOW_MS = 1_700_000_000_000
+
+
+class Worker:
+    """
+    One process's view: its local socket counts and what it pushed to them
+    """
+
+    def __init__(self, name: str, redis, counts=None):
+        self.counts = dict(counts or {})
+        self.pushed = []
+
+        async def deliver(lesson_id: str, message: str) -> None:
+            self.pushed.append((lesson_id, json.loads(message)["data"]))
+
+        self.tracker = PresenceTracker(
+            lambda: self.counts, deliver, ttl=10, typing_ttl=3, redis_factory=lambda: redis,
+        )
+        self.tracker.worker = name
+
+    def last_pushed(self, lesson_id: str = "1"):
+        data = [pushed for lesson, pushed in self.pushed if lesson == lesson_id][-1]
+        return data["viewers"], data["typing"]
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RedisConnectionError("Redis is down")
+        return fail
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {"ms": NOW_MS}
+    monkeypatch.setattr(presence_module, "_now_ms", lambda: clock["ms"])
+    return clock
+
+
+async def test_viewers_are_summed_across_workers(redis, clock):
+    a = Worker("a", redis, {"1": 2})
+    b = Worker("b", redis, {"1": 3, "2": 1})
+
+    await a.tracker.tick()
+    await b.tracker.tick()
+    await a.tracker.tick()
+
+    assert a.last_pushed() == (5, [])
+    assert b.last_pushed() == (5, [])
+    assert b.last_pushed("2") == (1, [])
+    assert (await a.tracker.snapshot("1")).viewers == 5
+
+
+async def test_unchanged_presence_is_not_pushed_again(redis, clock):
+    worker = Worker("a", redis, {"1": 2})
+
+    await worker.tracker.tick()
+    await worker.tracker.tick()
+    assert len(worker.pushed) == 1
+
+    worker.counts["1"] = 3
+    await worker.tracker.tick()
+    assert worker.last_pushed() == (3, [])
+    assert worker.tracker.last("1").viewers == 3
+
+
+async def test_typing_users_expire_after_their_ttl(redis, clock):
+    a = Worker("a", redis, {"1": 1})
+    b = Worker("b", redis, {"1": 1})
+
+    a.tracker.typing("1", 7)
+    await a.tracker.tick()
+    await b.tracker.tick()
+    assert b.last_pushed() == (2, [7])
+
+    # Not typing again; still shown within typing_ttl, gone after it
+    clock["ms"] += 2_999
+    await b.tracker.tick()
+    assert b.last_pushed() == (2, [7])
+    clock["ms"] += 1
+    await b.tracker.tick()
+    assert b.last_pushed() == (2, [])
+
+
+async def test_a_crashed_workers_viewers_expire(redis, clock):
+    a = Worker("a", redis, {"1": 2})
+    crashed = Worker("crashed", redis, {"1": 4})
+    await crashed.tracker.tick()
+    await a.tracker.tick()
+    assert a.last_pushed() == (6, [])
+
+    # The crashed worker stops heartbeating; its entry outlives it by the ttl
+    clock["ms"] += 9_999
+    await a.tracker.tick()
+    assert a.last_pushed() == (6, [])
+    clock["ms"] += 1
+    await a.tracker.tick()
+    assert a.last_pushed() == (2, [])
+    assert await redis.hkeys(_viewers_key("1")) == [b"a"]
+
+
+async def test_leaving_and_stopping_withdraw_the_heartbeat(redis, clock):
+    a = Worker("a", redis, {"1": 2, "2": 1})
+    b = Worker("b", redis, {"1": 3})
+    await a.tracker.tick()
+    await b.tracker.tick()
+
+    # Every socket on lesson 2 left; the next tick removes our entry at once
+    del a.counts["2"]
+    await a.tracker.tick()
+    assert not await redis.exists(_viewers_key("2"))
+    assert a.tracker.last("2") is None
+
+    await a.tracker.stop()
+    await b.tracker.tick()
+    assert b.last_pushed() == (3, [])
+
+
+async def test_local_counts_when_redis_is_down(clock):
+    worker = Worker("a", DownRedis(), {"1": 2})
+    worker.tracker.typing("1", 7)
+
+    await worker.tracker.tick()
+
+    assert worker.last_pushed() == (2, [7])
+    assert (await worker.tracker.snapshot("1")).viewers == 2
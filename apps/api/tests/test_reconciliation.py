@@ -0,0 +1,140 @@
+import csv
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.models import (
+    Course,
+    Order,
+    OrderStatus,
+    Payment,
+    PaymentProvider,
+    PaymentStatus,
+    User,
+    UserRole,
+)
+from app.services.reconciliation import SettlementRow, read_settlement, reconcile_settlement
+
+
+def write_csv(path, rows) -> str:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["entity_id", "type", "amount"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def report(summary) -> list:
+    with open(summary.report_path, newline="", encoding="utf-8") as f:
+        return [(r["kind"], r["line"], r["provider_payment_id"]) for r in csv.DictReader(f)]
+
+
+def test_csv_rows_are_numbered_from_the_header(tmp_path):
+    path = write_csv(tmp_path / "settlement.csv", [
+        {"entity_id": " pay_1 ", "type": "Payment", "amount": "499.00"},
+        {"entity_id": "rfnd_1", "type": "refund", "amount": "10"},
+        {"entity_id": "pay_2", "type": "", "amount": "4.995"},
+        {"entity_id": "pay_3", "type": "payment", "amount": "n/a"},
+    ])
+
+    assert list(read_settlement(path)) == [
+        SettlementRow(2, "pay_1", "payment", 49900),
+        SettlementRow(3, "rfnd_1", "refund", 1000),
+        # Fractions of a paisa and garbage are not amounts
+        SettlementRow(4, "pay_2", "payment", None),
+        SettlementRow(5, "pay_3", "payment", None),
+    ]
+
+
+def test_jsonl_skips_blank_lines(tmp_path):
+    path = tmp_path / "settlement.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"entity_id": "pay_1", "type": "payment", "amount": 499}),
+        "",
+        json.dumps({"entity_id": "pay_2", "amount": "0.50"}),
+    ]) + "\n")
+
+    assert list(read_settlement(str(path))) == [
+        SettlementRow(1, "pay_1", "payment", 49900),
+        SettlementRow(3, "pay_2", "payment", 50),
+    ]
+
+
+@pytest.fixture
+async def payments(db):
+    buyer = User(email="buyer@byteboost.com", name="Buyer", role=UserRole.STUDENT)
+    db.add(buyer)
+    await db.flush()
+    course = Course(title="graphs", slug="graphs", summary="summary", price_inr=499, owner_id=buyer.id)
+    db.add(course)
+    await db.flush()
+    order = Order(user_id=buyer.id, course_id=course.id, provider=PaymentProvider.RAZORPAY, amount_inr=499,
+                  status=OrderStatus.COMPLETED, provider_order_id="order_1", receipt_number="rcpt_1")
+    db.add(order)
+    await db.flush()
+    db.add_all([
+        Payment(order_id=order.id, provider_payment_id=payment_id, status=status, amount_inr=499)
+        for payment_id, status in [
+            ("pay_ok", PaymentStatus.CAPTURED),
+            ("pay_refunded", PaymentStatus.REFUNDED),
+            ("pay_short", PaymentStatus.CAPTURED),
+            ("pay_authorized", PaymentStatus.AUTHORIZED),
+            ("pay_unsettled", PaymentStatus.CAPTURED),
+        ]
+    ])
+    await db.commit()
+
+
+async def test_reconciliation_reports_every_mismatch_across_chunks(postgres, db, payments, tmp_path):
+    path = write_csv(tmp_path / "settlement.csv", [
+        {"entity_id": "pay_ok", "type": "payment", "amount": "499.00"},            # line 2
+        {"entity_id": "pay_short", "type": "payment", "amount": "399.00"},         # line 3
+        {"entity_id": "pay_ok", "type": "payment", "amount": "499.00"},            # line 4
+        {"entity_id": "pay_authorized", "type": "payment", "amount": "499.00"},    # line 5
+        {"entity_id": "rfnd_1", "type": "refund", "amount": "499.00"},             # line 6
+        {"entity_id": "pay_unknown", "type": "payment", "amount": "10.00"},        # line 7
+        {"entity_id": "pay_refunded", "type": "payment", "amount": "499"},         # line 8
+        {"entity_id": "", "type": "payment", "amount": "1.00"},                    # line 9
+        # Settled again three chunks later: only the staging table can tell
+        {"entity_id": "pay_short", "type": "payment", "amount": "399.00"},         # line 10
+    ])
+
+    summary = await reconcile_settlement(db, path, chunk_size=3)
+
+    assert summary.rows_read == 9
+    assert summary.rows_skipped == 1
+    assert summary.matched == 2
+    assert report(summary) == [
+        ("duplicate_settlement", "4", "pay_ok"),
+        ("amount_mismatch", "3", "pay_short"),
+        ("status_mismatch", "5", "pay_authorized"),
+        ("unknown_payment", "7", "pay_unknown"),
+        ("invalid_row", "9", ""),
+        ("duplicate_settlement", "10", "pay_short"),
+    ]
+    assert summary.mismatches == {
+        "duplicate_settlement": 2, "amount_mismatch": 1, "status_mismatch": 1,
+        "unknown_payment": 1, "invalid_row": 1,
+    }
+
+
+async def test_captured_but_unsettled_payments_in_the_window(postgres, db, payments, tmp_path):
+    path = write_csv(tmp_path / "settlement.csv", [
+        {"entity_id": "pay_ok", "type": "payment", "amount": "499.00"},
+        {"entity_id": "pay_short", "type": "payment", "amount": "499.00"},
+    ])
+    now = datetime.now(UTC)
+
+    inside = await reconcile_settlement(
+        db, path, since=now - timedelta(hours=1), until=now + timedelta(hours=1),
+    )
+    before = await reconcile_settlement(
+        db, path, report_path=str(tmp_path / "before.csv"),
+        since=now - timedelta(hours=2), until=now - timedelta(hours=1),
+    )
+
+    # Refunded and authorized payments are not expected in a settlement
+    assert report(inside) == [("not_settled", "", "pay_unsettled")]
+    assert report(before) == []
+    assert inside.matched == before.matched == 2
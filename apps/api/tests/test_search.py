@@ -0,0 +1,49 @@
+import pytest
+
+from app.models import Course, User, UserRole
+from app.services.search import search_courses
+
+
+@pytest.fixture
+async def catalog(postgres, db):
+    owner = User(email="search@byteboost.com", name="Owner", role=UserRole.INSTRUCTOR)
+    db.add(owner)
+    await db.flush()
+    db.add_all([
+        Course(slug=slug, title=title, summary=summary, description=description, price_inr=499,
+               owner_id=owner.id, is_published=published)
+        for slug, title, summary, description, published in [
+            ("graphs", "Graph Algorithms", "Traversals, shortest paths and flows.",
+             "Dynamic programming shows up once, in the chapter on DAGs.", True),
+            ("dp", "Dynamic Programming", "Memoization and tabulation, from scratch.",
+             "Knapsack, edit distance and more.", True),
+            ("dp-draft", "Dynamic Programming II", "Advanced dynamic programming.", "", False),
+            ("sql", "SQL for Analysts", "Joins, windows and query plans.", "", True),
+        ]
+    ])
+    await db.commit()
+
+
+async def test_full_text_ranks_title_matches_first(db, catalog):
+    items, total = await search_courses(db, "dynamic programming", page=1, page_size=10)
+
+    # The unpublished sequel matches too, but is never shown
+    assert total == 2
+    assert [item.slug for item in items] == ["dp", "graphs"]
+    assert items[0].rank > items[1].rank > 0
+    assert "<mark>" in items[1].headline
+
+
+async def test_typos_fall_back_to_title_similarity(db, catalog):
+    # No word of "algoritms" stems to anything in the index
+    items, total = await search_courses(db, "Graph Algoritms", page=1, page_size=10)
+
+    assert total == 1
+    [item] = items
+    assert item.slug == "graphs"
+    assert 0 < item.rank < 1
+    assert item.headline == "Traversals, shortest paths and flows."
+
+
+async def test_no_match_either_way(db, catalog):
+    assert await search_courses(db, "kubernetes", page=1, page_size=10) == ([], 0)
@@ -0,0 +1,229 @@
+import hashlib
+import hmac
+from datetime import UTC, datetime, timedelta
+
+import orjson
+import pytest
+from sqlalchemy import func, select
+
+from app.api import payments as payments_api
+from app.core.config import settings
+from app.models import (
+    Course,
+    Enrollment,
+    EnrollmentStatus,
+    Order,
+    OrderStatus,
+    Payment,
+    PaymentProvider,
+    PaymentStatus,
+    User,
+    UserRole,
+    WebhookEvent,
+    WebhookEventStatus,
+)
+from app.schemas import RazorpayWebhookEvent
+from app.services import webhook_inbox
+from app.services.course_cache import CATALOG_VERSION_KEY, _version_key
+from app.services.webhook_inbox import _claim_query, process_batch, record_razorpay_event
+
+SECRET = "whsec_test"
+
+
+def payment_event(event: str, order_id: str = "order_1", payment_id: str = "pay_1", amount: int = 49900) -> dict:
+    entity = {"id": payment_id, "order_id": order_id, "amount": amount, "method": "upi"}
+    return {"event": event, "payload": {"payment": {"entity": entity}}}
+
+
+def refund_event(amount: int, payment_id: str = "pay_1", refund_id: str = "rfnd_1") -> dict:
+    entity = {"id": refund_id, "payment_id": payment_id, "amount": amount}
+    # Refund events carry the payment too, which names the order
+    return {
+        "event": "refund.processed",
+        "payload": {
+            "refund": {"entity": entity},
+            "payment": {"entity": {"id": payment_id, "order_id": "order_1", "amount": 49900}},
+        },
+    }
+
+
+@pytest.fixture
+async def order(db):
+    buyer = User(email="buyer@byteboost.com", name="Buyer", role=UserRole.STUDENT)
+    db.add(buyer)
+    await db.flush()
+    course = Course(title="graphs", slug="graphs", summary="summary", price_inr=499, owner_id=buyer.id)
+    db.add(course)
+    await db.flush()
+    orders = [
+        Order(user_id=buyer.id, course_id=course.id, provider=PaymentProvider.RAZORPAY, amount_inr=499,
+              status=OrderStatus.CREATED, provider_order_id=f"order_{n}", receipt_number=f"rcpt_{n}")
+        for n in (1, 2)
+    ]
+    db.add_all(orders)
+    await db.commit()
+    return orders[0]
+
+
+async def store(db, *events: dict) -> None:
+    for n, event in enumerate(events):
+        body = orjson.dumps(event)
+        await record_razorpay_event(db, body, f"evt_{n}_{hashlib.sha256(body).hexdigest()[:8]}")
+    await db.commit()
+
+
+async def drain(db) -> int:
+    handled = 0
+    while claimed := await process_batch(db):
+        handled += claimed
+    return handled
+
+
+async def test_webhooks_are_acked_and_redeliveries_stored_once(api, db, monkeypatch):
+    monkeypatch.setattr(settings, "RAZORPAY_WEBHOOK_SECRET", SECRET)
+    client = api(payments_api.router, "/payments")
+
+    async def deliver(event: dict, event_id: str):
+        body = orjson.dumps(event)
+        signature = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+        return await client.post(
+            "/payments/razorpay/webhook", content=body,
+            headers={"X-Razorpay-Signature": signature, "X-Razorpay-Event-Id": event_id},
+        )
+
+    captured = payment_event("payment.captured")
+    responses = [
+        await deliver(captured, "evt_1"),
+        # A provider retry of the same event
+        await deliver(captured, "evt_1"),
+        # The same capture resent under a new event id
+        await deliver(captured, "evt_2"),
+        await deliver(payment_event("payment.failed"), "evt_3"),
+    ]
+
+    assert [r.status_code for r in responses] == [200] * 4
+    stored = (await db.execute(select(WebhookEvent.event_id, WebhookEvent.event_type))).all()
+    assert sorted(stored) == [("evt_1", "payment.captured"), ("evt_3", "payment.failed")]
+
+
+async def test_bad_signatures_are_rejected_unstored(api, db, monkeypatch):
+    monkeypatch.setattr(settings, "RAZORPAY_WEBHOOK_SECRET", SECRET)
+    client = api(payments_api.router, "/payments")
+
+    response = await client.post(
+        "/payments/razorpay/webhook", content=orjson.dumps(payment_event("payment.captured")),
+        headers={"X-Razorpay-Signature": "0" * 64},
+    )
+
+    assert response.status_code == 400
+    assert await db.scalar(select(func.count()).select_from(WebhookEvent)) == 0
+
+
+def test_references_come_from_payment_order_or_refund():
+    assert webhook_inbox.razorpay_references(
+        RazorpayWebhookEvent.model_validate(payment_event("payment.captured"))
+    ) == ("order_1", "pay_1")
+    assert webhook_inbox.razorpay_references(RazorpayWebhookEvent.model_validate(
+        {"event": "order.paid", "payload": {"order": {"entity": {"id": "order_9"}}}}
+    )) == ("order_9", None)
+    assert webhook_inbox.razorpay_references(RazorpayWebhookEvent.model_validate(
+        {"event": "refund.created", "payload": {"refund": {"entity": {"payment_id": "pay_9"}}}}
+    )) == (None, "pay_9")
+
+
+async def test_only_the_oldest_pending_event_per_order_is_claimable(db, order):
+    await store(
+        db,
+        payment_event("payment.authorized"),
+        payment_event("payment.captured"),
+        payment_event("payment.authorized", order_id="order_2", payment_id="pay_2"),
+        {"event": "account.updated", "payload": {}},
+    )
+    first, second, other_order, orderless = (await db.scalars(select(WebhookEvent).order_by(WebhookEvent.id))).all()
+
+    claimed = (await db.scalars(_claim_query(10))).all()
+    assert claimed == [first, other_order, orderless]
+
+    # Once the first is applied, the next event for that order is up
+    first.status = WebhookEventStatus.PROCESSED
+    await db.commit()
+    assert (await db.scalars(_claim_query(10))).all() == [second, other_order, orderless]
+
+
+async def test_failed_events_back_off_then_park(db, order):
+    await store(db, payment_event("payment.captured", order_id="order_missing"))
+
+    assert await process_batch(db) == 1
+    event = await db.scalar(select(WebhookEvent))
+    assert event.status == WebhookEventStatus.RECEIVED
+    assert event.attempts == 1
+    assert "Unknown order" in event.last_error
+    # Not claimable until the backoff has passed
+    assert await process_batch(db) == 0
+
+    event.attempts = settings.WEBHOOK_MAX_ATTEMPTS - 1
+    event.next_attempt_at = datetime.now(UTC) - timedelta(seconds=1)
+    await db.commit()
+    assert await process_batch(db) == 1
+    await db.refresh(event)
+    assert event.status == WebhookEventStatus.FAILED
+
+
+async def test_a_failing_handler_only_rolls_back_its_own_event(db, order, monkeypatch):
+    async def half_applied(db, event, order, payments):
+        order.status = OrderStatus.PROCESSING
+        await db.flush()
+        raise RuntimeError("provider sent garbage")
+
+    monkeypatch.setitem(webhook_inbox._HANDLERS, "payment.authorized", half_applied)
+    await store(
+        db,
+        payment_event("payment.authorized"),
+        payment_event("payment.failed", order_id="order_2", payment_id="pay_2"),
+    )
+
+    assert await process_batch(db) == 2
+
+    statuses = dict((await db.execute(select(Order.provider_order_id, Order.status))).all())
+    assert statuses == {"order_1": OrderStatus.CREATED, "order_2": OrderStatus.FAILED}
+    events = (await db.scalars(select(WebhookEvent).order_by(WebhookEvent.id))).all()
+    assert [e.status for e in events] == [WebhookEventStatus.RECEIVED, WebhookEventStatus.PROCESSED]
+    assert events[0].attempts == 1
+
+
+async def test_payment_state_only_moves_forward(db, order, redis):
+    # Delivered out of order: the capture arrives before the authorization
+    await store(db, payment_event("payment.captured"), payment_event("payment.authorized"))
+
+    assert await drain(db) == 2
+
+    payment = await db.scalar(select(Payment))
+    await db.refresh(order)
+    assert payment.status == PaymentStatus.CAPTURED
+    assert order.status == OrderStatus.COMPLETED
+    enrollment = await db.scalar(select(Enrollment))
+    assert enrollment.status == EnrollmentStatus.ACTIVE
+    # The new enrollment shows in the course's counts
+    assert await redis.get(_version_key(order.course_id)) == b"1"
+    assert await redis.exists(CATALOG_VERSION_KEY)
+
+
+@pytest.mark.parametrize("amount, order_status, enrollment_status", [
+    (20000, OrderStatus.COMPLETED, EnrollmentStatus.ACTIVE),
+    (49900, OrderStatus.REFUNDED, EnrollmentStatus.REFUNDED),
+])
+async def test_only_a_full_refund_revokes_the_enrollment(db, order, redis, amount, order_status, enrollment_status):
+    await store(db, payment_event("payment.captured"))
+    await drain(db)
+    await store(db, refund_event(amount))
+
+    assert await drain(db) == 1
+
+    await db.refresh(order)
+    payment = await db.scalar(select(Payment))
+    await db.refresh(payment)
+    enrollment = await db.scalar(select(Enrollment))
+    await db.refresh(enrollment)
+    assert order.status == order_status
+    assert enrollment.status == enrollment_status
+    assert (payment.status == PaymentStatus.REFUNDED) == (order_status == OrderStatus.REFUNDED)
@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import msgpack
+import pytest
+from fastapi import status
+
+from app.api.comments import ConnectionManager
+from app.services import ws_queue
+from app.services.broker import InMemoryBroker
+from app.services.ws_queue import QueuedConnection, SendQueueMetrics, SlowConsumerPolicy
+
+
+class FakeWebSocket:
+    """
+    Records what was sent; while `stalled`, sends block like a client that
+    stopped reading
+    """
+
+    def __init__(self, subprotocols=()):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.sent = []
+        self.close_code = None
+        self.stalled = False
+        self._unstalled = asyncio.Event()
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def _send(self, frame):
+        if self.stalled:
+            await self._unstalled.wait()
+        self.sent.append(frame)
+
+    async def send_text(self, frame: str):
+        await self._send(frame)
+
+    async def send_bytes(self, frame: bytes):
+        await self._send(frame)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+    def unstall(self):
+        self.stalled = False
+        self._unstalled.set()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture(autouse=True)
+async def no_leftover_tasks():
+    yield
+    await settle()
+    assert not ws_queue._background_tasks
+
+
+def stalled_connection(policy: SlowConsumerPolicy, closed: list):
+    websocket = FakeWebSocket()
+    websocket.stalled = True
+    connection = QueuedConnection(
+        websocket, max_size=2, policy=policy, metrics=SendQueueMetrics(), on_close=closed.append,
+    )
+    connection.start()
+    return websocket, connection
+
+
+async def test_drop_oldest_keeps_the_newest_messages():
+    closed = []
+    websocket, connection = stalled_connection(SlowConsumerPolicy.DROP_OLDEST, closed)
+
+    # The writer takes the first message and blocks sending it
+    connection.enqueue("m1")
+    await settle()
+    assert [connection.enqueue(m) for m in ("m2", "m3", "m4")] == [True, True, True]
+    assert connection.depth == 2
+
+    websocket.unstall()
+    await settle()
+    assert websocket.sent == ["m1", "m3", "m4"]
+    assert (connection.metrics.sent, connection.metrics.dropped) == (3, 1)
+    assert not connection.closed and closed == []
+    await connection.close()
+
+
+async def test_disconnect_closes_a_full_queue_with_try_again_later():
+    closed = []
+    websocket, connection = stalled_connection(SlowConsumerPolicy.DISCONNECT, closed)
+
+    connection.enqueue("m1")
+    await settle()
+    assert connection.enqueue("m2") and connection.enqueue("m3")
+    assert not connection.enqueue("m4")
+
+    assert connection.closed and closed == [connection]
+    assert (connection.metrics.evicted, connection.metrics.dropped) == (1, 2)
+    # The close runs in the background, held until it finishes
+    assert len(ws_queue._background_tasks) == 1
+    await settle()
+    assert websocket.close_code == status.WS_1013_TRY_AGAIN_LATER
+    assert not ws_queue._background_tasks
+    assert not connection.enqueue("m5")
+    assert websocket.sent == []
+
+
+async def test_evicted_sockets_are_unregistered():
+    manager = ConnectionManager(InMemoryBroker(), queue_size=1, policy=SlowConsumerPolicy.DISCONNECT)
+    slow, fast = FakeWebSocket(), FakeWebSocket()
+    slow.stalled = True
+    await manager.connect(slow, "1")
+    await manager.connect(fast, "1")
+
+    for n in range(3):
+        await manager.broadcast_to_lesson("1", f'{{"n":{n}}}')
+        await settle()
+
+    assert slow.close_code == status.WS_1013_TRY_AGAIN_LATER
+    assert list(manager.active_connections["1"]) == [fast]
+    assert len(fast.sent) == 3
+    assert not manager._disconnects
+    assert manager.metrics().evicted == 1
+    await manager.close()
+
+
+
+async def test_broadcasts_in_one_tick_share_a_single_frame():
+    manager = ConnectionManager(InMemoryBroker(), batch_window=0.05)
+    batched = [FakeWebSocket(["comments.v2"]), FakeWebSocket(["comments.v2"])]
+    binary = FakeWebSocket(["comments.v2.msgpack"])
+    legacy = FakeWebSocket()
+    for websocket in (*batched, binary, legacy):
+        await manager.connect(websocket, "1")
+
+    for n in range(3):
+        await manager.broadcast_to_lesson("1", f'{{"n":{n}}}')
+    await settle()
+    # Unbatched sockets get each message at once; batched ones wait for the tick
+    assert len(legacy.sent) == 3
+    assert batched[0].sent == binary.sent == []
+
+    await asyncio.sleep(0.1)
+    [frame], [other] = batched[0].sent, batched[1].sent
+    assert frame is other
+    assert [m["n"] for m in json.loads(frame)] == [0, 1, 2]
+    assert [m["n"] for m in msgpack.unpackb(binary.sent[0])] == [0, 1, 2]
+
+    # A quiet lesson has no tick pending; the next message opens a new one
+    assert not manager._flushes
+    await manager.broadcast_to_lesson("1", '{"n":3}')
+    await asyncio.sleep(0.1)
+    assert [m["n"] for m in json.loads(batched[0].sent[-1])] == [3]
+    assert len(batched[0].sent) == 2
+    await manager.close()
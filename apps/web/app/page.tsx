@@ -1,7 +1,88 @@
 import Link from 'next/link';
 import { ArrowRight, BookOpen, Users, Video, Award, Clock, Globe } from 'lucide-react';
 
-export default function HomePage() {
+const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+
+interface LandingCourse {
+  id: number;
+  title: string;
+  summary: string;
+  price_inr: number;
+  thumbnail_url: string | null;
+  difficulty_level: string | null;
+  owner: {
+    name: string;
+  };
+  stats: {
+    enrollments_count: number;
+  } | null;
+}
+
+interface LandingPage {
+  featured: LandingCourse[];
+  popular: LandingCourse[];
+}
+
+// The API serves this from an in-memory snapshot, so a short revalidate is cheap
+async function getLandingPage(): Promise<LandingPage | null> {
+  try {
+    const res = await fetch(`${API_URL}/courses/landing`, { next: { revalidate: 30 } });
+    if (!res.ok) return null;
+    return await res.json();
+  } catch {
+    return null;
+  }
+}
+
+function CourseRow({ title, courses }: { title: string; courses: LandingCourse[] }) {
+  if (courses.length === 0) return null;
+
+  return (
+    <div className="mb-12">
+      <h2 className="text-2xl font-bold text-gray-900 mb-6">{title}</h2>
+      <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-6">
+        {courses.map((course) => (
+          <Link key={course.id} href={`/courses/${course.id}`}>
+            <div className="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-lg transition-shadow cursor-pointer">
+              <div className="h-36 bg-gradient-to-br from-blue-400 to-blue-600">
+                {course.thumbnail_url ? (
+                  <img
+                    src={course.thumbnail_url}
+                    alt={course.title}
+                    className="w-full h-full object-cover"
+                  />
+                ) : (
+                  <div className="flex items-center justify-center h-full">
+                    <span className="text-white text-4xl font-bold">
+                      {course.title.charAt(0)}
+                    </span>
+                  </div>
+                )}
+              </div>
+              <div className="p-4">
+                <h3 className="font-semibold mb-1 line-clamp-2">{course.title}</h3>
+                <p className="text-sm text-gray-500 mb-3">by {course.owner?.name || 'Unknown'}</p>
+                <div className="flex items-center justify-between text-sm">
+                  <span className="font-bold text-blue-600">
+                    {course.price_inr === 0 ? 'Free' : `₹${course.price_inr}`}
+                  </span>
+                  <span className="flex items-center text-gray-500">
+                    <Users className="h-4 w-4 mr-1" />
+                    {course.stats?.enrollments_count || 0}
+                  </span>
+                </div>
+              </div>
+            </div>
+          </Link>
+        ))}
+      </div>
+    </div>
+  );
+}
+
+export default async function HomePage() {
+  const landing = await getLandingPage();
+
   return (
     <div className="bg-white">
       {/* Hero Section */}
@@ -34,6 +115,16 @@ export default function HomePage() {
         </div>
       </section>
 
+      {/* Featured Courses Section */}
+      {landing && (landing.featured.length > 0 || landing.popular.length > 0) && (
+        <section className="py-16">
+          <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8">
+            <CourseRow title="Featured Courses" courses={landing.featured} />
+            <CourseRow title="Popular Courses" courses={landing.popular} />
+          </div>
+        </section>
+      )}
+
       {/* Features Section */}
       <section className="py-16 bg-gray-50">
         <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8">